@@ -1 +1,7 @@
-# Empty init
+import os
+import sys
+
+# shared/ sits at the repo root in a checkout (Docker copies it next to the app as /app/shared)
+_repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if os.path.isdir(os.path.join(_repo_root, "shared")) and _repo_root not in sys.path:
+    sys.path.append(_repo_root)
@@ -0,0 +1,309 @@
+"""
+Bulk upload path into sales_master: COPY FROM STDIN and database-side line deduplication.
+
+DataFrame.to_sql sends the rows as batched INSERT statements; COPY streams them as CSV in one round trip
+per chunk, which is what keeps large monthly Excel uploads inside the request timeout. Chunks of
+COPY_CHUNK_ROWS rows (default 50000) are encoded one at a time so memory stays bounded. Missing values
+are sent as unquoted empty fields (NULL), so empty strings are stored as NULL too.
+
+Every sales line carries LINE_KEY: a hash of its invoice, date, customer, item, quantity, rate and amount,
+plus the occurrence number among identical lines of the same upload. A unique index on
+(tenant_id, LINE_KEY) lets insert_new_lines stage an upload in a temp table and keep only unseen lines
+with INSERT ... ON CONFLICT DO NOTHING, so an upload costs the same whatever the tenant's history.
+The column and index are added by ensure_line_key_index at startup (and again before the first upload
+if the table was created or replaced since): a metadata-only ALTER and CREATE UNIQUE INDEX CONCURRENTLY
+on an autocommit connection, so reads and writes continue during the build. Rows written without a key
+(older uploads, the legacy ETL) are keyed by backfill_line_keys first.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+
+from shared.dict_encoding import map_unique
+
+LINE_KEY_COLUMN = "LINE_KEY"
+LINE_KEY_INDEX = "uq_sales_master_tenant_line_key"
+# Prefix of the key given to stored rows that repeat an already keyed line (see backfill_line_keys)
+DUPLICATE_KEY_PREFIX = "dup:"
+# Source fields only: enrichment (STATE/CITY/material group/taxes) may change when a file is re-processed
+LINE_KEY_FIELDS = ["INVOICE_NO", "DATE", "CUSTOMER_NAME", "ITEMNAME", "QTY", "RATE", "AMOUNT"]
+_NUMERIC_FIELDS = {"QTY", "RATE", "AMOUNT"}
+_INTEGER_TYPES = {"smallint", "integer", "bigint"}
+_INTEGRAL_DECIMAL = re.compile(r"^([+-]?\d+)\.0*$")
+
+# The ALTER needs a brief ACCESS EXCLUSIVE lock: give up rather than queue every reader behind a long query
+INDEX_LOCK_TIMEOUT = "5s"
+
+_index_ready = False
+_index_lock = threading.Lock()
+
+
+def copy_chunk_rows() -> int:
+    try:
+        return max(1, int(os.environ.get("COPY_CHUNK_ROWS", "50000")))
+    except ValueError:
+        return 50000
+
+
+def _column_types(eng, table: str) -> dict:
+    with eng.connect() as conn:
+        rows = conn.execute(
+            text("SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = 'public' AND table_name = :t"),
+            {"t": table},
+        ).fetchall()
+    return {name: dtype for name, dtype in rows}
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _prepare(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    """Match the text form COPY expects: integer columns as integers (to_sql relied on INSERT casts for 1.0)."""
+    unknown = [c for c in df.columns if c not in types]
+    if unknown:
+        raise ValueError(f"columns not in sales_master: {unknown}")
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if types.get(col) in _INTEGER_TYPES and not pd.api.types.is_integer_dtype(s):
+            s = pd.to_numeric(s, errors="coerce").round().astype("Int64")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def _copy(cur, table: str, df: pd.DataFrame) -> None:
+    sql = (
+        f"COPY {_quote_ident(table)} ({', '.join(_quote_ident(c) for c in df.columns)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '')"
+    )
+    chunk = copy_chunk_rows()
+    for start in range(0, len(df), chunk):
+        buf = io.StringIO()
+        df.iloc[start:start + chunk].to_csv(buf, index=False, header=False, na_rep="", date_format="%Y-%m-%d %H:%M:%S.%f")
+        buf.seek(0)
+        cur.copy_expert(sql, buf)
+
+
+def _key_label(value):
+    """
+    Text key field in canonical form: stripped, upper case, integral numbers as integers. pandas reads an
+    invoice column as int or float depending on whether any cell is blank, so 1001, 1001.0 and "1001.0"
+    must all key as "1001".
+    """
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    label = str(value).strip().upper()
+    return _INTEGRAL_DECIMAL.sub(r"\1", label)
+
+
+def _line_text(df: pd.DataFrame) -> pd.Series:
+    """One canonical string per row over LINE_KEY_FIELDS, identical for a freshly cleaned upload and a DB read."""
+    parts = []
+    for col in LINE_KEY_FIELDS:
+        if col not in df.columns:
+            continue
+        s = df[col]
+        if col == "DATE":
+            s = pd.to_datetime(s, errors="coerce").dt.strftime("%Y-%m-%d")
+        elif col in _NUMERIC_FIELDS:
+            s = pd.to_numeric(s, errors="coerce").astype("float64").round(4)
+        else:
+            s = map_unique(s, _key_label)
+        parts.append(s.astype("string").fillna(""))
+    if not parts:
+        return pd.Series("", index=df.index, dtype="string")
+    joined = parts[0]
+    for s in parts[1:]:
+        joined = joined + "\x1f" + s
+    return joined
+
+
+def _digests(df: pd.DataFrame) -> pd.Series:
+    return pd.Series([hashlib.md5(s.encode("utf-8")).hexdigest() for s in _line_text(df)], index=df.index, dtype=object)
+
+
+def line_keys(df: pd.DataFrame) -> pd.Series:
+    """LINE_KEY per row: md5 of the canonical line plus its occurrence among identical lines in df."""
+    digests = _digests(df)
+    return digests + ":" + digests.groupby(digests, sort=False).cumcount().astype(str)
+
+
+class LineKeyer:
+    """line_keys over the chunks of one upload: occurrence numbers continue from the earlier chunks."""
+
+    def __init__(self):
+        # Lines seen so far, by the first 64 bits of their digest (compact; collisions only shift a count)
+        self._seen = pd.Series(dtype="int64")
+
+    def __call__(self, df: pd.DataFrame) -> pd.Series:
+        digests = _digests(df)
+        occurrence = digests.groupby(digests, sort=False).cumcount()
+        prefix = pd.Series([int(d[:16], 16) for d in digests], index=df.index, dtype="uint64")
+        if len(self._seen):
+            occurrence = occurrence + prefix.map(self._seen).fillna(0).astype("int64")
+        self._seen = self._seen.add(prefix.value_counts(), fill_value=0).astype("int64")
+        return digests + ":" + occurrence.astype(str)
+
+
+def _line_key_index_state(eng):
+    """(has LINE_KEY column, unique index usable): an interrupted CONCURRENTLY build leaves an invalid index."""
+    with eng.connect() as conn:
+        has_column = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'public' "
+            "AND table_name = 'sales_master' AND column_name = :col)"
+        ), {"col": LINE_KEY_COLUMN}).scalar()
+        valid = conn.execute(text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'public' AND c.relname = :idx"
+        ), {"idx": LINE_KEY_INDEX}).scalar()
+    return bool(has_column), bool(valid)
+
+
+def _has_sales_master(eng) -> bool:
+    with eng.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'sales_master')"
+        )).scalar())
+
+
+def _migrate_line_key_index(eng) -> None:
+    """Add LINE_KEY (nullable, no default: metadata only) and build the unique index CONCURRENTLY."""
+    key = _quote_ident(LINE_KEY_COLUMN)
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"SET lock_timeout = '{INDEX_LOCK_TIMEOUT}'"))
+        conn.execute(text(f"ALTER TABLE sales_master ADD COLUMN IF NOT EXISTS {key} TEXT"))
+        # An interrupted CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS would keep
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {LINE_KEY_INDEX}"))
+        conn.execute(text(f"CREATE UNIQUE INDEX CONCURRENTLY {LINE_KEY_INDEX} ON sales_master (tenant_id, {key})"))
+
+
+def ensure_line_key_index(eng) -> bool:
+    """
+    Make sure sales_master has LINE_KEY and a valid unique (tenant_id, LINE_KEY) index, adding them when
+    missing; checked once per process. False when there is no sales_master yet (the first upload creates
+    it and calls this again). Raises if the migration fails.
+    """
+    global _index_ready
+    if _index_ready:
+        return True
+    with _index_lock:
+        if _index_ready:
+            return True
+        if not _has_sales_master(eng):
+            return False
+        has_column, valid = _line_key_index_state(eng)
+        if not (has_column and valid):
+            logging.info("bulk_copy: adding %s and building %s on sales_master", LINE_KEY_COLUMN, LINE_KEY_INDEX)
+            _migrate_line_key_index(eng)
+            has_column, valid = _line_key_index_state(eng)
+        if not (has_column and valid):
+            raise RuntimeError(f"sales_master still lacks {LINE_KEY_COLUMN} or a valid {LINE_KEY_INDEX} index after migrating")
+        _index_ready = True
+        return True
+
+
+def forget_line_key_index() -> None:
+    """The table was recreated: re-check the column and index on next use."""
+    global _index_ready
+    _index_ready = False
+
+
+def backfill_line_keys(eng, tenant_id: str) -> int:
+    """
+    Key the tenant's rows that have no LINE_KEY yet (one-time per tenant, plus rows from writers that do
+    not set it), in one transaction. Rows are addressed by ctid, locked FOR UPDATE while they are keyed.
+    A row repeating a line that is already keyed gets a unique "dup:" key instead, so every row ends up
+    with a key and later uploads find nothing left to do. Returns rows keyed (duplicates included);
+    raises if any row could not be keyed (nothing is committed then).
+    """
+    key = _quote_ident(LINE_KEY_COLUMN)
+    present = _column_types(eng, "sales_master")
+    fields = [c for c in LINE_KEY_FIELDS if c in present]
+    select = ", ".join(["ctid::text"] + [_quote_ident(c) for c in fields])
+    raw = eng.raw_connection()
+    try:
+        cur = raw.cursor()
+        # The (tenant_id, LINE_KEY) index answers IS NULL, so a fully keyed tenant costs one index probe
+        cur.execute(
+            f"SELECT {select} FROM sales_master WHERE tenant_id = %(tid)s AND {key} IS NULL ORDER BY ctid FOR UPDATE",
+            {"tid": tenant_id},
+        )
+        rows = pd.DataFrame(cur.fetchall(), columns=["tid"] + fields)
+        if rows.empty:
+            raw.commit()
+            cur.close()
+            return 0
+        keyed = pd.DataFrame({"tid": rows["tid"], "line_key": line_keys(rows[fields])})
+        cur.execute("CREATE TEMP TABLE _line_key_backfill (tid TID, line_key TEXT) ON COMMIT DROP")
+        _copy(cur, "_line_key_backfill", keyed)
+        cur.execute(
+            f"UPDATE sales_master s SET {key} = b.line_key FROM _line_key_backfill b "
+            f"WHERE s.ctid = b.tid AND s.tenant_id = %(tid)s AND NOT EXISTS ("
+            f"SELECT 1 FROM sales_master k WHERE k.tenant_id = %(tid)s AND k.{key} = b.line_key)",
+            {"tid": tenant_id},
+        )
+        updated = cur.rowcount
+        # Still NULL = duplicate of a keyed line; transaction id + ctid keeps the marker unique
+        cur.execute(
+            f"UPDATE sales_master s SET {key} = %(dup)s || b.line_key || ':' || txid_current()::text || ':' || s.ctid::text "
+            f"FROM _line_key_backfill b WHERE s.ctid = b.tid AND s.tenant_id = %(tid)s AND s.{key} IS NULL",
+            {"tid": tenant_id, "dup": DUPLICATE_KEY_PREFIX},
+        )
+        duplicates = cur.rowcount
+        if updated + duplicates != len(keyed):
+            raise RuntimeError(
+                f"keyed {updated + duplicates} of {len(keyed)} unkeyed sales_master rows for tenant {tenant_id}"
+            )
+        raw.commit()
+        cur.close()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    logging.info(
+        "bulk_copy: keyed %d existing rows for tenant %s (%d marked as duplicates of keyed lines)",
+        updated + duplicates, tenant_id, duplicates,
+    )
+    return updated + duplicates
+
+
+def insert_new_lines(eng, table: str, df: pd.DataFrame) -> set:
+    """
+    Stage df (which must carry LINE_KEY and tenant_id) in a temp table with COPY and insert the lines the
+    unique index has not seen, in one transaction. Returns the LINE_KEYs actually inserted; raises on
+    failure (nothing is committed).
+    """
+    if df is None or df.empty:
+        return set()
+    df = _prepare(df, _column_types(eng, table))
+    cols = ", ".join(_quote_ident(c) for c in df.columns)
+    key = _quote_ident(LINE_KEY_COLUMN)
+    raw = eng.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(f"CREATE TEMP TABLE _sales_stage ON COMMIT DROP AS SELECT {cols} FROM {_quote_ident(table)} WITH NO DATA")
+        _copy(cur, "_sales_stage", df)
+        cur.execute(
+            f"INSERT INTO {_quote_ident(table)} ({cols}) SELECT {cols} FROM _sales_stage "
+            f"ON CONFLICT (tenant_id, {key}) DO NOTHING RETURNING {key}"
+        )
+        inserted = {row[0] for row in cur.fetchall()}
+        raw.commit()
+        cur.close()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    logging.info("bulk_copy: %d of %d rows new in %s", len(inserted), len(df), table)
+    return inserted
@@ -58,7 +58,7 @@ class SalesQueryEngine:
 
     def process_query(self, query):
         query = query.lower().strip()
-        df_filtered = self.df.copy()
+        df_filtered = self.df
         
         # 1. Apply Filters
         detected_filters = self.extract_filters(query)
@@ -102,9 +102,9 @@ class SalesQueryEngine:
             
             # Aggregation
             if metric == "INVOICE_NO":
-                res = df_filtered.groupby(group_col)[metric].nunique().sort_values(ascending=False).head(limit)
+                res = df_filtered.groupby(group_col, observed=True)[metric].nunique().sort_values(ascending=False).head(limit)
             else:
-                res = df_filtered.groupby(group_col)[metric].sum().sort_values(ascending=False).head(limit)
+                res = df_filtered.groupby(group_col, observed=True)[metric].sum().sort_values(ascending=False).head(limit)
                 
             response = f"🏆 **Top {limit} {group_col.replace('_', ' ').title()}**"
             if filter_desc: response += f" ({', '.join(filter_desc)})"
@@ -0,0 +1,211 @@
+"""
+Customer master per tenant (CUSTOMER_NAME -> STATE / CITY), persisted in Postgres.
+
+POST /upload/customer-master replaces the tenant's rows in the customer_master table, so the master
+survives restarts and every API worker (and upload pool process) sees the same one. Each process keeps a
+lookup frame indexed by customer name, re-read from the table CUSTOMER_MASTER_TTL_SECONDS (default 300)
+after it was loaded or as soon as this process saves a new master. enrich() resolves the distinct
+customer names of an upload against that index and broadcasts STATE / CITY back by code, instead of a
+pd.merge of every row. reenrich_sales() applies the master to rows already in sales_master with one
+UPDATE ... FROM join (taxes follow the new STATE), run as a background job by the routes, so historical
+data no longer has to be cleared and uploaded again.
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from cachetools import TTLCache
+from sqlalchemy import bindparam, text
+
+from . import tenant_snapshot
+from .db import get_engine, invalidate_tenant_cache
+
+MASTER_COLUMNS = ["STATE", "CITY"]
+_TAX_COLUMNS = ["IGST", "CGST", "SGST", "TAX", "TOTALAMOUNT"]
+
+
+def _ttl_seconds() -> int:
+    try:
+        return max(1, int(os.environ.get("CUSTOMER_MASTER_TTL_SECONDS", "300")))
+    except ValueError:
+        return 300
+
+
+_lookups = TTLCache(maxsize=100, ttl=_ttl_seconds())
+_lock = threading.Lock()
+_MISSING = object()
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _ensure_table(conn) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS customer_master (
+            tenant_id VARCHAR(128) NOT NULL,
+            customer_name VARCHAR(512) NOT NULL,
+            state TEXT,
+            city TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tenant_id, customer_name)
+        )
+    """))
+    conn.commit()
+
+
+def _master_records(master: pd.DataFrame, tenant_id: str) -> list:
+    """One row per customer (the last one wins), blank STATE / CITY as NULL."""
+    df = master.dropna(subset=["CUSTOMER_NAME"]).drop_duplicates("CUSTOMER_NAME", keep="last")
+    records = []
+    for row in df.to_dict("records"):
+        rec = {"tid": tenant_id, "name": str(row["CUSTOMER_NAME"])}
+        for col in MASTER_COLUMNS:
+            value = row.get(col)
+            rec[col.lower()] = None if value is None or pd.isna(value) else (str(value).strip() or None)
+        records.append(rec)
+    return records
+
+
+def save_master(tenant_id: str, master: pd.DataFrame) -> int:
+    """Replace the tenant's customer master (standardized frame with CUSTOMER_NAME). Returns rows stored; raises on failure."""
+    if "CUSTOMER_NAME" not in master.columns or not any(c in master.columns for c in MASTER_COLUMNS):
+        raise ValueError("Customer master needs CUSTOMER_NAME and STATE and/or CITY columns.")
+    eng = get_engine()
+    if eng is None:
+        raise RuntimeError("Database engine not initialized.")
+    records = _master_records(master[[c for c in ["CUSTOMER_NAME", *MASTER_COLUMNS] if c in master.columns]], tenant_id)
+    with eng.connect() as conn:
+        _ensure_table(conn)
+    with eng.begin() as conn:
+        conn.execute(text("DELETE FROM customer_master WHERE tenant_id = :tid"), {"tid": tenant_id})
+        if records:
+            conn.execute(
+                text("INSERT INTO customer_master (tenant_id, customer_name, state, city) VALUES (:tid, :name, :state, :city)"),
+                records,
+            )
+    with _lock:
+        _lookups.pop(tenant_id, None)
+    return len(records)
+
+
+def _load_lookup(tenant_id: str) -> Optional[pd.DataFrame]:
+    eng = get_engine()
+    if eng is None:
+        return None
+    with eng.connect() as conn:
+        _ensure_table(conn)
+        df = pd.read_sql(
+            text("SELECT customer_name, state, city FROM customer_master WHERE tenant_id = :tid"),
+            conn, params={"tid": tenant_id},
+        )
+    if df.empty:
+        return None
+    df.columns = ["CUSTOMER_NAME", *MASTER_COLUMNS]
+    return df.set_index("CUSTOMER_NAME")
+
+
+def get_lookup(tenant_id: str) -> Optional[pd.DataFrame]:
+    """STATE / CITY indexed by customer name for the tenant, or None without a master (or on DB errors)."""
+    with _lock:
+        cached = _lookups.get(tenant_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    try:
+        lookup = _load_lookup(tenant_id)
+    except Exception as e:
+        logging.error("customer_master: lookup for tenant %s failed: %s", tenant_id, e)
+        return None
+    with _lock:
+        _lookups[tenant_id] = lookup
+    return lookup
+
+
+def enrich(df: pd.DataFrame, tenant_id: str) -> pd.DataFrame:
+    """Fill STATE / CITY from the tenant's customer master where it knows the customer (master value wins)."""
+    if df is None or df.empty or "CUSTOMER_NAME" not in df.columns:
+        return df
+    lookup = get_lookup(tenant_id)
+    if lookup is None or lookup.empty:
+        return df
+    codes, names = pd.factorize(df["CUSTOMER_NAME"])
+    if len(names) == 0:
+        return df
+    found = lookup.index.get_indexer(names)
+    rows = codes >= 0
+    rows[rows] = found[codes[rows]] >= 0
+    if not rows.any():
+        return df
+    hit = found[codes[rows]]
+    for col in MASTER_COLUMNS:
+        values = lookup[col].to_numpy(dtype=object)[hit]
+        known = pd.notna(values)
+        if not known.any():
+            continue
+        if col not in df.columns:
+            df[col] = None
+        positions = np.flatnonzero(rows)[known]
+        df.iloc[positions, df.columns.get_loc(col)] = values[known]
+    return df
+
+
+def reenrich_sales(tenant_id: str, intra_states, tax_rate: float) -> int:
+    """
+    Apply the customer master to the tenant's stored rows in one UPDATE ... FROM join: STATE / CITY where
+    the master has them and, when STATE changes, IGST/CGST/SGST/TAX/TOTALAMOUNT as calculate_taxes would
+    (intra_states: upper-cased states taxed as CGST + SGST). Returns rows updated; raises on failure.
+
+    Bumps the tenant's revision (tenant_snapshot), so every process discards its Parquet snapshot, and
+    drops this process's cached frame and result cache. Other API workers keep serving their in-memory
+    frame until it expires (TENANT_CACHE_TTL_SECONDS, then one stale-while-revalidate reload).
+    """
+    eng = get_engine()
+    if eng is None:
+        raise RuntimeError("Database engine not initialized.")
+    with eng.connect() as conn:
+        _ensure_table(conn)
+        present = {r[0] for r in conn.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = 'sales_master'"
+        )).fetchall()}
+    targets = [c for c in MASTER_COLUMNS if c in present]
+    if "CUSTOMER_NAME" not in present or not targets:
+        return 0
+    new = {c: f"COALESCE(m.{c.lower()}, s.{_quote_ident(c)})" for c in targets}
+    sets = [f"{_quote_ident(c)} = {new[c]}" for c in targets]
+    if "STATE" in targets and "AMOUNT" in present:
+        amount = f"CAST(s.{_quote_ident('AMOUNT')} AS DOUBLE PRECISION)"
+        intra = f"UPPER(BTRIM(COALESCE({new['STATE']}, 'Unknown'))) IN :intra"
+        taxes = {
+            "IGST": f"CASE WHEN {intra} THEN 0 ELSE {amount} * :rate END",
+            "CGST": f"CASE WHEN {intra} THEN {amount} * :rate / 2 ELSE 0 END",
+            "SGST": f"CASE WHEN {intra} THEN {amount} * :rate / 2 ELSE 0 END",
+            "TAX": f"{amount} * :rate",
+            "TOTALAMOUNT": f"{amount} * (1 + :rate)",
+        }
+        sets += [f"{_quote_ident(c)} = {taxes[c]}" for c in _TAX_COLUMNS if c in present]
+    changed = " OR ".join(f"s.{_quote_ident(c)} IS DISTINCT FROM {new[c]}" for c in targets)
+    sql = (
+        f"UPDATE sales_master s SET {', '.join(sets)} FROM customer_master m "
+        f"WHERE s.tenant_id = :tid AND m.tenant_id = :tid AND s.{_quote_ident('CUSTOMER_NAME')} = m.customer_name "
+        f"AND ({changed})"
+    )
+    stmt, params = text(sql), {"tid": tenant_id}
+    # TAX / TOTALAMOUNT use :rate alone: a table without IGST/CGST/SGST has no :intra
+    if ":rate" in sql:
+        params["rate"] = tax_rate
+    if ":intra" in sql:
+        stmt = stmt.bindparams(bindparam("intra", expanding=True))
+        params["intra"] = sorted(intra_states)
+    with eng.begin() as conn:
+        updated = conn.execute(stmt, params).rowcount
+        if updated:
+            # Rows changed in place: snapshots of this tenant (any process) are stale from this commit on
+            tenant_snapshot.bump_revision(conn, tenant_id)
+    if updated:
+        tenant_snapshot.remove(tenant_id)
+        invalidate_tenant_cache(tenant_id)
+    logging.info("customer_master: re-enriched %d stored rows for tenant %s", updated, tenant_id)
+    return updated
@@ -1,14 +1,32 @@
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 import logging
 from typing import Optional
-from cachetools import TTLCache, cached
+from cachetools import LRUCache
 
 from dotenv import load_dotenv
+from shared.date_enrichment import add_date_columns
+
+from .filter_index import FilterIndex
+from .sales_cube import SalesCube
+from . import bulk_copy
+from . import sql_pushdown
+from . import tenant_snapshot
 
 load_dotenv()
 
+# Tenant frames are shared read-only between requests; copy-on-write (default from pandas 3) makes every
+# slice a lazy view and turns accidental writes into private copies instead of cache corruption.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 if not DATABASE_URL:
     logging.warning("DATABASE_URL is not set. The backend will not be able to connect to the database.")
@@ -49,29 +67,73 @@ def get_engine():
         logging.error(f"Failed to initialize PostgreSQL engine in Backend: {e}")
         return None
 
-def _tenant_cache_from_env() -> TTLCache:
-    """In-memory cache for full tenant DataFrames. Tunable via env to reduce DB egress or support more tenants."""
-    try:
-        maxsize = int(os.environ.get("TENANT_CACHE_MAXSIZE", "10"))
-    except ValueError:
-        maxsize = 10
+def _env_int(name: str, default: int) -> int:
     try:
-        ttl = int(os.environ.get("TENANT_CACHE_TTL_SECONDS", str(4 * 3600)))
+        return int(os.environ.get(name, str(default)))
     except ValueError:
-        ttl = 4 * 3600
-    return TTLCache(maxsize=max(1, maxsize), ttl=max(60, ttl))
+        return default
+
+
+# In-memory cache for full tenant frames. Tunable via env to reduce DB egress or support more tenants.
+# Default: 10 tenants, 4h TTL; past the TTL an entry keeps serving for TENANT_CACHE_STALE_SECONDS
+# (default = TTL) while one background refresh reloads it — see docs/OPTIMIZATION.md
+TENANT_CACHE_MAXSIZE = max(1, _env_int("TENANT_CACHE_MAXSIZE", 10))
+TENANT_CACHE_TTL = max(60, _env_int("TENANT_CACHE_TTL_SECONDS", 4 * 3600))
+TENANT_CACHE_STALE = max(0, _env_int("TENANT_CACHE_STALE_SECONDS", TENANT_CACHE_TTL))
+# A failed load is remembered this long so queued requests don't each retry a down database
+_FAILED_LOAD_RETRY_SECONDS = 30
+
+tenant_cache = LRUCache(maxsize=TENANT_CACHE_MAXSIZE)
+_cache_lock = threading.RLock()
+_tenant_locks = {}
+_generations = {}
+# Data version per tenant: bumped whenever what the API would answer may change (see result_cache)
+_versions = {}
+_refreshing = set()
+_refresh_pool = None
+
+
+def _tenant_lock(tenant_id: str) -> threading.Lock:
+    """Per-tenant loader lock: one DB read per tenant at a time (single flight)."""
+    with _cache_lock:
+        lock = _tenant_locks.get(tenant_id)
+        if lock is None:
+            lock = _tenant_locks[tenant_id] = threading.Lock()
+        return lock
+
+
+def _cache_get(tenant_id: str):
+    with _cache_lock:
+        return tenant_cache.get((tenant_id,))
+
 
+def tenant_data_version(tenant_id: str) -> int:
+    """Monotonic per-tenant counter; results computed under one version stay valid until it changes."""
+    with _cache_lock:
+        return _versions.get(tenant_id, 0)
 
-# Default: 10 tenants, 4h TTL — see docs/OPTIMIZATION.md
-tenant_cache = _tenant_cache_from_env()
+
+def bump_tenant_version(tenant_id: str) -> None:
+    with _cache_lock:
+        _versions[tenant_id] = _versions.get(tenant_id, 0) + 1
+
+
+def _cache_put(tenant_id: str, frame, generation: int) -> None:
+    """Store a loaded frame unless the tenant was invalidated while it was loading."""
+    with _cache_lock:
+        if _generations.get(tenant_id, 0) == generation:
+            tenant_cache[(tenant_id,)] = frame
+            _versions[tenant_id] = _versions.get(tenant_id, 0) + 1
 
 
 def invalidate_tenant_cache(tenant_id: str) -> None:
     """Call after upload so the next dashboard/API request gets fresh data from DB."""
     try:
-        key = (tenant_id,)
-        if key in tenant_cache:
-            del tenant_cache[key]
+        with _cache_lock:
+            _generations[tenant_id] = _generations.get(tenant_id, 0) + 1
+            _versions[tenant_id] = _versions.get(tenant_id, 0) + 1
+            tenant_cache.pop((tenant_id,), None)
+        sql_pushdown.forget_tenant(tenant_id)
     except Exception:
         pass
 
@@ -153,101 +215,659 @@ def verify_user(username: str, password: str):
         return None
 
 
-def _fy_from_date(date):
-    """Same as routes.calculate_fy: April = start of FY. Used for read-time enrichment."""
-    if pd.isna(date):
-        return "UNKNOWN"
+def _egress_max_years() -> int:
     try:
-        d = pd.to_datetime(date)
-        if hasattr(d, "month"):
-            y = d.year % 100
-            return f"FY{y}-{(d.year + 1) % 100}" if d.month >= 4 else f"FY{y - 1}-{y}"
-    except Exception:
-        pass
-    return "UNKNOWN"
+        return max(0, int(os.environ.get("EGRESS_MAX_YEARS", "0")))
+    except ValueError:
+        return 0
 
 
 def _tenant_query_date_filter() -> str:
     """Limit rows fetched from DB to reduce RAM. Set EGRESS_MAX_YEARS=3 in env to enable. Default=0 (load all)."""
-    try:
-        years = int(os.environ.get("EGRESS_MAX_YEARS", "0"))
-        if years <= 0:
-            return ""
-        # Column is often lowercase 'date' in Postgres when created via pandas to_sql
-        return f" AND date >= (CURRENT_DATE - INTERVAL '{years} years')"
-    except Exception:
+    years = _egress_max_years()
+    if years <= 0:
         return ""
+    # Column is often lowercase 'date' in Postgres when created via pandas to_sql
+    return f" AND date >= (CURRENT_DATE - INTERVAL '{years} years')"
 
 
-@cached(cache=tenant_cache)
-def get_cached_tenant_df(tenant_id: str) -> pd.DataFrame:
-    """Internal cached helper to fetch full tenant dataset from DB. Enriches FINANCIAL_YEAR and MONTH from DATE when missing."""
+# Dashboard dimensions: low-cardinality strings that every filter / groupby touches.
+# Stored as pandas categoricals so isin/groupby run on integer codes.
+DIMENSION_COLUMNS = [
+    "STATE", "CITY", "CUSTOMER_NAME", "ITEM_NAME_GROUP", "MATERIALGROUP", "MONTH", "FINANCIAL_YEAR",
+]
+# Also dictionary-encoded: item names repeat on every line selling the item (product tables, reports).
+# Other text (INVOICE_NO, columns a tenant's files happen to carry) stays as strings.
+_ENCODED_COLUMNS = ["ITEMNAME"]
+# Same value for every row of the cached frame (it is keyed by tenant) / snapshot and dedup bookkeeping — not kept in RAM.
+_DROPPED_COLUMNS = ["tenant_id", tenant_snapshot.ROW_ID_COLUMN, bulk_copy.LINE_KEY_COLUMN]
+
+
+def _as_category(series: pd.Series) -> pd.Series:
+    """Dictionary-encode a text column; labels are stripped once per unique value, not per row."""
+    codes, uniques = pd.factorize(series)
+    labels = pd.Index([v.strip() if isinstance(v, str) else v for v in uniques], dtype=object)
+    categories = labels.unique()
+    try:
+        categories = categories.sort_values()
+    except TypeError:
+        pass
+    remap = categories.get_indexer(labels)
+    new_codes = np.where(codes >= 0, remap[codes] if len(remap) else codes, -1)
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=categories),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def _normalize_tenant_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compact columnar form of a tenant frame, done once at cache-load time:
+    categorical dimensions and ITEMNAME, float64 AMOUNT, naive datetime64 DATE, derived FINANCIAL_YEAR / MONTH.
+    Other columns keep their values (served by /v1/data and reports); only _DROPPED_COLUMNS are removed.
+    """
+    df = df.drop(columns=[c for c in _DROPPED_COLUMNS if c in df.columns])
+    # Coerce AMOUNT to numeric (DB may return string)
+    amt_col = next((c for c in df.columns if str(c).upper() == "AMOUNT"), None)
+    if amt_col is not None:
+        df[amt_col] = pd.to_numeric(df[amt_col], errors="coerce").fillna(0).astype("float64")
+    date_col = next((c for c in df.columns if str(c).upper() == "DATE"), None)
+    if date_col is not None:
+        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+        if hasattr(df[date_col].dtype, "tz") and df[date_col].dtype.tz is not None:
+            df[date_col] = df[date_col].dt.tz_localize(None)
+        add_date_columns(df, date_col, overwrite=False)
+    for col in df.columns:
+        s = df[col]
+        if not (pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype)):
+            continue
+        if col in DIMENSION_COLUMNS or col in _ENCODED_COLUMNS:
+            df[col] = _as_category(s)
+    if date_col == "DATE":
+        # Keep rows in DATE order (NaT last) so date ranges resolve to contiguous slices
+        df = df.sort_values("DATE", kind="stable", na_position="last", ignore_index=True)
+        df.attrs["sorted_by"] = "DATE"
+    return df
+
+
+def _sales_cube_enabled() -> bool:
+    """SALES_CUBE=0 turns off the pre-aggregated cube (analytics then always scan raw lines)."""
+    return os.environ.get("SALES_CUBE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class TenantFrame:
+    """Cached tenant dataset: the normalized frame plus the filter index and sales cube built from it at load time."""
+
+    __slots__ = ("df", "index", "cube", "loaded_at", "_fingerprint")
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.loaded_at = time.monotonic()
+        self.index = None
+        self.cube = None
+        self._fingerprint = None
+        if not df.empty:
+            try:
+                self.index = FilterIndex(df)
+            except Exception as e:
+                logging.warning("TenantFrame: filter index build failed, filters fall back to per-request index: %s", e)
+        if self.index is not None and df.attrs.get("sorted_by") == "DATE" and _sales_cube_enabled():
+            try:
+                self.cube = SalesCube(df)
+            except Exception as e:
+                logging.warning("TenantFrame: sales cube build failed, analytics use raw lines: %s", e)
+
+    def fingerprint(self) -> str:
+        """
+        Digest of the frame's rows in order (values, not categorical codes), computed on first use. Equal
+        for a reload or patch that yields the same rows in the same order, so positions stay comparable.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = frame_fingerprint(self.df)
+        return self._fingerprint
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Digest of a frame's length, columns and row values in order (see TenantFrame.fingerprint)."""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"{len(df)}|{'|'.join(map(str, df.columns))}".encode("utf-8"))
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@contextmanager
+def _consistent_read(eng):
+    """REPEATABLE READ transaction: every statement in it sees the same snapshot of the database."""
+    with eng.connect() as conn:
+        conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            yield conn
+
+
+def _load_from_snapshot(eng, tenant_id: str) -> Optional[pd.DataFrame]:
+    """
+    Local snapshot + rows inserted since its high-water mark (see tenant_snapshot), or None when there is
+    no usable snapshot. Only the delta crosses the network; the refreshed snapshot is written back.
+    """
+    years = _egress_max_years()
+    with _consistent_read(eng) as conn:
+        snap = tenant_snapshot.read(conn, tenant_id, years)
+        if snap is None:
+            return None
+        df, hw, rev = snap
+        delta = pd.read_sql(
+            text(f"SELECT * FROM sales_master WHERE tenant_id = :tid AND {tenant_snapshot.ROW_ID_COLUMN} > :hw{_tenant_query_date_filter()}"),
+            conn, params={"tid": tenant_id, "hw": hw},
+        )
+        new_hw = tenant_snapshot.high_water(delta)
+        rows_up_to_mark = tenant_snapshot.source_rows(conn, tenant_id, new_hw) if new_hw is not None else 0
+    if years > 0:
+        # The egress window moves forward with time; drop snapshot rows that fell out of it
+        df = df[df["DATE"] >= pd.Timestamp.today().normalize() - pd.DateOffset(years=years)]
+    if delta.empty:
+        return df
+    try:
+        df = _append_rows(df, delta)
+    except ValueError as e:
+        logging.info("tenant snapshot for %s not reusable, full reload: %s", tenant_id, e)
+        return None
+    tenant_snapshot.write(tenant_id, df, new_hw, rows_up_to_mark, years, rev)
+    logging.info("Loaded tenant %s from snapshot + %d new rows.", tenant_id, len(delta))
+    return df
+
+
+def _load_tenant_frame(tenant_id: str) -> TenantFrame:
+    """
+    Fetch the full tenant dataset from DB and normalize it once (see _normalize_tenant_frame)
+    so every request reuses the compact form. With TENANT_SNAPSHOT_DIR set, starts from the local
+    snapshot and fetches only newer rows. Raises on DB errors.
+    """
     eng = get_engine()
     if eng is None:
-        return pd.DataFrame()
-    try:
-        date_filter = _tenant_query_date_filter()
-        query = text(f"SELECT * FROM sales_master WHERE tenant_id = :tid{date_filter}")
+        raise RuntimeError("database engine unavailable")
+    use_snapshot = tenant_snapshot.enabled() and tenant_snapshot.ensure_row_id_column(eng)
+    if use_snapshot:
+        df = _load_from_snapshot(eng, tenant_id)
+        if df is not None:
+            return TenantFrame(df)
+    query = text(f"SELECT * FROM sales_master WHERE tenant_id = :tid{_tenant_query_date_filter()}")
+    if use_snapshot:
+        # Revision, rows and row count from one snapshot of the database (see tenant_snapshot)
+        with _consistent_read(eng) as conn:
+            rev = tenant_snapshot.revision(conn, tenant_id)
+            df = pd.read_sql(query, conn, params={"tid": tenant_id})
+            hw = tenant_snapshot.high_water(df)
+            rows_up_to_mark = tenant_snapshot.source_rows(conn, tenant_id, hw) if hw is not None else 0
+    else:
         df = pd.read_sql(query, eng, params={"tid": tenant_id})
-        if df.empty:
-            return df
+        hw = None
+    if df.empty:
+        return TenantFrame(df)
+    try:
+        df = _normalize_tenant_frame(df)
+    except Exception as e:
+        logging.warning("get_tenant_frame: enrich/coerce failed, returning raw df: %s", e)
+        hw = None
+    if hw is not None:
+        tenant_snapshot.write(tenant_id, df, hw, rows_up_to_mark, _egress_max_years(), rev)
+    return TenantFrame(df)
+
+
+def _refresh_tenant(tenant_id: str) -> None:
+    """Background reload of an expired entry; on failure the stale frame keeps serving."""
+    lock = _tenant_lock(tenant_id)
+    try:
+        if not lock.acquire(blocking=False):
+            return
         try:
-            # Coerce AMOUNT to numeric (DB may return string)
-            amt_col = next((c for c in df.columns if str(c).upper() == "AMOUNT"), None)
-            if amt_col is not None:
-                df[amt_col] = pd.to_numeric(df[amt_col], errors="coerce").fillna(0)
-            date_col = next((c for c in df.columns if str(c).upper() == "DATE"), None)
-            if date_col is not None:
-                df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-                if hasattr(df[date_col].dtype, "tz") and df[date_col].dtype.tz is not None:
-                    df[date_col] = df[date_col].dt.tz_localize(None)
-                if "FINANCIAL_YEAR" not in df.columns:
-                    df["FINANCIAL_YEAR"] = df[date_col].apply(_fy_from_date)
-                if "MONTH" not in df.columns:
-                    df["MONTH"] = df[date_col].dt.strftime("%b-%y").str.upper()
-        except Exception as e:
-            logging.warning("get_cached_tenant_df: enrich/coerce failed, returning raw df: %s", e)
-        return df
+            generation = _generations.get(tenant_id, 0)
+            _cache_put(tenant_id, _load_tenant_frame(tenant_id), generation)
+        finally:
+            lock.release()
     except Exception as e:
-        logging.error(f"Error fetching data from DB: {e}")
-        return pd.DataFrame()
+        logging.warning("tenant refresh failed for %s, serving stale frame: %s", tenant_id, e)
+    finally:
+        with _cache_lock:
+            _refreshing.discard(tenant_id)
+
+
+def _refresh_in_background(tenant_id: str) -> None:
+    global _refresh_pool
+    with _cache_lock:
+        if tenant_id in _refreshing:
+            return
+        _refreshing.add(tenant_id)
+        if _refresh_pool is None:
+            _refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tenant-refresh")
+    _refresh_pool.submit(_refresh_tenant, tenant_id)
+
+
+def get_tenant_frame(tenant_id: str) -> TenantFrame:
+    """
+    Cached TenantFrame for a tenant.
+    Single flight: concurrent misses wait for one loader instead of each running SELECT *.
+    Stale-while-revalidate: past the TTL the old frame keeps serving while one background refresh runs.
+    """
+    frame = _cache_get(tenant_id)
+    if frame is not None:
+        age = time.monotonic() - frame.loaded_at
+        if age < TENANT_CACHE_TTL:
+            return frame
+        if age < TENANT_CACHE_TTL + TENANT_CACHE_STALE:
+            _refresh_in_background(tenant_id)
+            return frame
+    with _tenant_lock(tenant_id):
+        # Another request may have finished loading while we waited
+        frame = _cache_get(tenant_id)
+        if frame is not None and time.monotonic() - frame.loaded_at < TENANT_CACHE_TTL:
+            return frame
+        generation = _generations.get(tenant_id, 0)
+        try:
+            frame = _load_tenant_frame(tenant_id)
+        except Exception as e:
+            logging.error(f"Error fetching data from DB: {e}")
+            frame = TenantFrame(pd.DataFrame())
+            frame.loaded_at -= max(0, TENANT_CACHE_TTL - _FAILED_LOAD_RETRY_SECONDS)
+        _cache_put(tenant_id, frame, generation)
+        return frame
+
+
+def get_cached_tenant_df(tenant_id: str) -> pd.DataFrame:
+    """Full cached tenant frame (shared, read-only)."""
+    return get_tenant_frame(tenant_id).df
+
+def _date_bounds(start_date: Optional[str], end_date: Optional[str]):
+    """Parse request dates into (start, end, end_inclusive). Date-only end (e.g. "2025-03-05") covers the full day."""
+    start_dt = end_dt = None
+    end_inclusive = True
+    if start_date:
+        start_dt = pd.to_datetime(start_date)
+        if getattr(start_dt, "tz", None) is not None:
+            start_dt = start_dt.tz_localize(None)
+    if end_date:
+        end_dt = pd.to_datetime(end_date)
+        if getattr(end_dt, "tz", None) is not None:
+            end_dt = end_dt.tz_localize(None)
+        if len(str(end_date).strip()) <= 10:
+            end_dt = end_dt + pd.Timedelta(days=1)
+            end_inclusive = False
+    return start_dt, end_dt, end_inclusive
+
+
+def date_range_positions(dates: np.ndarray, start_date: Optional[str], end_date: Optional[str]) -> tuple:
+    """
+    Row range [lo, hi) of a DATE-sorted (NaT last) datetime64 array that falls inside the request dates.
+    Binary search, O(log n). NaT rows are only included when no bound is given (same as boolean masks).
+    """
+    n = len(dates)
+    if not start_date and not end_date:
+        return 0, n
+    start_dt, end_dt, end_inclusive = _date_bounds(start_date, end_date)
+    # NumPy sorts NaT after every date, so its insertion point is the count of dated rows
+    lo, hi = 0, int(np.searchsorted(dates, np.datetime64("NaT"), side="left"))
+    if start_dt is not None:
+        lo = int(np.searchsorted(dates[:hi], start_dt.to_datetime64(), side="left"))
+    if end_dt is not None:
+        hi = int(np.searchsorted(dates[:hi], end_dt.to_datetime64(), side="right" if end_inclusive else "left"))
+    return lo, max(lo, hi)
+
 
 def get_tenant_data(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
     """
     Fetches the sales_master data for a specific SaaS tenant, with optional date filtering.
     Leverages in-memory caching to avoid hitting Supabase on every API request.
+
+    Returns a read-only view of the cached frame (no DataFrame.copy()); date ranges are binary-searched
+    on the DATE-sorted cache. Copy-on-write keeps the cache
+    frozen: a handler that assigns columns only copies what it touches, never the whole tenant frame.
+    SQL pushdown tenants (see get_sql_pushdown) are read straight from the database and never cached.
     Never raises: returns empty DataFrame on any error.
     """
     try:
+        lines = _pushdown_lines(tenant_id, start_date, end_date)
+        if lines is not None:
+            return lines
         raw = get_cached_tenant_df(tenant_id)
-        df = raw.copy() if raw is not None and isinstance(raw, pd.DataFrame) else pd.DataFrame()
+        # Shallow copy = new object over the same column buffers; column writes on it never reach the cache
+        df = raw.copy(deep=False) if raw is not None and isinstance(raw, pd.DataFrame) else pd.DataFrame()
     except Exception as e:
         logging.error(f"get_tenant_data: %s", e)
         df = pd.DataFrame()
+    return _date_slice(df, start_date, end_date)
 
+
+def _date_slice(df: pd.DataFrame, start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
     try:
-        if not df.empty and "DATE" in df.columns:
-            if start_date:
-                start_dt = pd.to_datetime(start_date)
-                if getattr(start_dt, "tz", None) is not None:
-                    start_dt = start_dt.tz_localize(None)
-                df = df[df["DATE"] >= start_dt]
-            if end_date:
-                end_dt = pd.to_datetime(end_date)
-                if getattr(end_dt, "tz", None) is not None:
-                    end_dt = end_dt.tz_localize(None)
-                # Date-only (e.g. "2025-03-05") → include full end day
-                if len(str(end_date).strip()) <= 10:
-                    end_dt = end_dt + pd.Timedelta(days=1)
-                    df = df[df["DATE"] < end_dt]
-                else:
-                    df = df[df["DATE"] <= end_dt]
+        if not df.empty and "DATE" in df.columns and (start_date or end_date):
+            if df.attrs.get("sorted_by") == "DATE":
+                # Cached frame is DATE-sorted: the range is one contiguous (zero-copy) slice
+                lo, hi = date_range_positions(df["DATE"].to_numpy(), start_date, end_date)
+                df = df.iloc[lo:hi]
+            else:
+                start_dt, end_dt, end_inclusive = _date_bounds(start_date, end_date)
+                if start_dt is not None:
+                    df = df[df["DATE"] >= start_dt]
+                if end_dt is not None:
+                    df = df[df["DATE"] <= end_dt] if end_inclusive else df[df["DATE"] < end_dt]
     except Exception as e:
         logging.error(f"get_tenant_data date filter: %s", e)
         df = pd.DataFrame()
     return df
 
 
+def get_tenant_data_versioned(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None) -> tuple:
+    """
+    (get_tenant_data(...), fingerprint of the cached frame it was cut from), both from the same frame, for
+    positional pagination. SQL pushdown tenants get the fingerprint of the rows read for this request.
+    Never raises: (empty DataFrame, "") on any error.
+    """
+    try:
+        lines = _pushdown_lines(tenant_id, start_date, end_date)
+        if lines is not None:
+            return lines, frame_fingerprint(lines)
+        frame = get_tenant_frame(tenant_id)
+    except Exception as e:
+        logging.error("get_tenant_data_versioned: %s", e)
+        return pd.DataFrame(), ""
+    return _date_slice(frame.df.copy(deep=False), start_date, end_date), frame.fingerprint()
+
+
+def get_filtered_data(
+    tenant_id: str = "default_elettro",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    states=None,
+    cities=None,
+    customers=None,
+    material_groups=None,
+    fiscal_years=None,
+    months=None,
+) -> pd.DataFrame:
+    """
+    get_tenant_data + dashboard filters (comma-separated strings, empty = no filter) in one step.
+    Answered from the tenant's FilterIndex: date range by binary search, filters by row-id postings.
+    SQL pushdown tenants get only the matching rows from the database, uncached.
+    Never raises: returns empty DataFrame on any error.
+    """
+    filters = dict(
+        states=states, cities=cities, customers=customers,
+        material_groups=material_groups, fiscal_years=fiscal_years, months=months,
+    )
+    try:
+        lines = _pushdown_lines(tenant_id, start_date, end_date, **filters)
+        if lines is not None:
+            return lines
+        frame = get_tenant_frame(tenant_id)
+        df = frame.df
+        if frame.index is not None and df.attrs.get("sorted_by") == "DATE":
+            lo, hi = date_range_positions(df["DATE"].to_numpy(), start_date, end_date)
+            return frame.index.take(df, lo, hi, **filters)
+    except Exception as e:
+        logging.error("get_filtered_data: %s", e)
+        return pd.DataFrame()
+    # Unsorted or unindexed cache: filter the date-ranged view with a throwaway index
+    df = get_tenant_data(tenant_id, start_date, end_date)
+    if df.empty:
+        return df
+    try:
+        return FilterIndex(df).take(df, **filters)
+    except Exception as e:
+        logging.error("get_filtered_data filters: %s", e)
+        return pd.DataFrame()
+
+
+def _month_aligned(start_date: Optional[str], end_date: Optional[str]) -> bool:
+    """True when the request dates select whole calendar months (cube cells are monthly)."""
+    start_dt, end_dt, end_inclusive = _date_bounds(start_date, end_date)
+    if start_dt is not None and (start_dt.day != 1 or start_dt != start_dt.normalize()):
+        return False
+    if end_dt is not None and (end_inclusive or end_dt.day != 1 or end_dt != end_dt.normalize()):
+        return False
+    return True
+
+
+def _cube_slice(tenant_id: str, start_date: Optional[str], end_date: Optional[str], **filters):
+    """CubeSlice for month-aligned dates when the tenant has a sales cube, else None. Never raises."""
+    try:
+        if not _month_aligned(start_date, end_date) or _pushdown_engine(tenant_id) is not None:
+            return None
+        frame = get_tenant_frame(tenant_id)
+        if frame.cube is not None:
+            cells = frame.cube.cells
+            lo, hi = date_range_positions(cells["DATE"].to_numpy(), start_date, end_date)
+            return frame.cube.slice(lo, hi, **filters)
+    except Exception as e:
+        logging.warning("get_rollup_source: cube unavailable, using raw lines: %s", e)
+    return None
+
+
+def get_rollup_source(
+    tenant_id: str = "default_elettro",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    states=None,
+    cities=None,
+    customers=None,
+    material_groups=None,
+    fiscal_years=None,
+    months=None,
+):
+    """
+    Input for the analytics rollups: a CubeSlice of the tenant's sales cube when the dates cover whole
+    months, otherwise the filtered raw lines (get_filtered_data). Aggregate it with sales_cube.rollup().
+    """
+    cube_slice = _cube_slice(
+        tenant_id, start_date, end_date, states=states, cities=cities, customers=customers,
+        material_groups=material_groups, fiscal_years=fiscal_years, months=months,
+    )
+    if cube_slice is not None:
+        return cube_slice
+    return get_filtered_data(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+
+
+def get_sql_pushdown(
+    tenant_id: str = "default_elettro",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    states=None,
+    cities=None,
+    customers=None,
+    material_groups=None,
+    fiscal_years=None,
+    months=None,
+):
+    """
+    SqlAggregates for tenants at or above SQL_PUSHDOWN_MIN_ROWS rows, else None (use the in-memory path).
+    Such tenants are never loaded into the tenant cache. Never raises.
+    """
+    eng = _pushdown_engine(tenant_id)
+    if eng is None:
+        return None
+    try:
+        return sql_pushdown.SqlAggregates(
+            eng, sql_pushdown.table_columns(eng), tenant_id, _date_bounds(start_date, end_date),
+            egress_years=_egress_max_years(), states=states, cities=cities, customers=customers,
+            material_groups=material_groups, fiscal_years=fiscal_years, months=months,
+        )
+    except Exception as e:
+        logging.warning("get_sql_pushdown: falling back to in-memory aggregation: %s", e)
+        return None
+
+
+def _pushdown_engine(tenant_id: str):
+    """Engine when the tenant is served by SQL pushdown (SQL_PUSHDOWN_MIN_ROWS rows or more), else None. Never raises."""
+    min_rows = sql_pushdown.pushdown_min_rows()
+    if min_rows <= 0:
+        return None
+    eng = get_engine()
+    if eng is None:
+        return None
+    try:
+        return eng if sql_pushdown.tenant_row_count(eng, tenant_id) >= min_rows else None
+    except Exception as e:
+        logging.warning("get_sql_pushdown: row count failed, using the in-memory path: %s", e)
+        return None
+
+
+def _pushdown_lines(tenant_id: str, start_date: Optional[str], end_date: Optional[str], **filters) -> Optional[pd.DataFrame]:
+    """Filtered, normalized rows of a SQL pushdown tenant (not cached), or None for in-memory tenants. Raises on DB errors."""
+    src = get_sql_pushdown(tenant_id, start_date, end_date, **filters)
+    if src is None:
+        return None
+    df = src.lines()
+    if df.empty:
+        return df
+    try:
+        return _normalize_tenant_frame(df)
+    except Exception as e:
+        logging.warning("pushdown lines: enrich/coerce failed, returning raw rows: %s", e)
+        return df
+
+
+class TenantSelection:
+    """
+    One tenant + filter set, resolved at most once per source kind (for /query/batch): the filtered raw
+    lines, the rollup source (cube slice or those same lines) and the pushdown-or-lines/rollup sources.
+    """
+
+    def __init__(self, tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, **filters):
+        self.tenant_id = tenant_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.filters = filters
+        self._memo = {}
+
+    def _once(self, key, build):
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    @property
+    def lines(self) -> pd.DataFrame:
+        """Same as get_filtered_data."""
+        return self._once("lines", lambda: get_filtered_data(self.tenant_id, self.start_date, self.end_date, **self.filters))
+
+    @property
+    def rollup_source(self):
+        """Same as get_rollup_source, sharing the filtered lines when the cube does not apply."""
+        def build():
+            cube_slice = _cube_slice(self.tenant_id, self.start_date, self.end_date, **self.filters)
+            return self.lines if cube_slice is None else cube_slice
+        return self._once("rollup", build)
+
+    @property
+    def pushdown(self):
+        """Same as get_sql_pushdown."""
+        return self._once("pushdown", lambda: get_sql_pushdown(self.tenant_id, self.start_date, self.end_date, **self.filters))
+
+    @property
+    def analytics_source(self):
+        """SQL pushdown for very large tenants, else rollup_source."""
+        return self.rollup_source if self.pushdown is None else self.pushdown
+
+    @property
+    def lines_source(self):
+        """SQL pushdown for very large tenants, else the filtered lines (rollups finer than the monthly cube)."""
+        return self.lines if self.pushdown is None else self.pushdown
+
+
+def _align_new_column(old: pd.Series, new: pd.Series):
+    """
+    Cast an uploaded column to the cached column's dtype; categoricals get the union of categories.
+    Dimension categories stay sorted (groupby output order); others just append, keeping old codes.
+    """
+    if isinstance(old.dtype, pd.CategoricalDtype):
+        if not isinstance(new.dtype, pd.CategoricalDtype):
+            new = _as_category(new.astype(object))
+        extra = new.cat.categories.difference(old.cat.categories)
+        if len(extra):
+            categories = old.cat.categories.append(extra).astype(old.cat.categories.dtype)
+            if old.name in DIMENSION_COLUMNS:
+                try:
+                    categories = categories.sort_values()
+                except TypeError:
+                    pass
+                old = old.cat.set_categories(categories)
+            else:
+                old = old.cat.add_categories(extra.astype(old.cat.categories.dtype))
+        return old, new.cat.set_categories(old.cat.categories)
+    if isinstance(new.dtype, pd.CategoricalDtype):
+        new = new.astype(object)
+    return old, new.astype(old.dtype)
+
+
+def _append_rows(cached: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cached tenant frame + newly inserted rows, in the same normalized, DATE-sorted form a reload would give.
+    Raises ValueError on schema drift (upload has columns the cached frame does not know).
+    """
+    if cached.attrs.get("sorted_by") != "DATE":
+        raise ValueError("cached frame is not normalized")
+    new = _normalize_tenant_frame(new_rows)
+    years = _egress_max_years()
+    if years > 0:
+        new = new[new["DATE"] >= pd.Timestamp.today().normalize() - pd.DateOffset(years=years)]
+    drift = [c for c in new.columns if c not in cached.columns]
+    if drift:
+        raise ValueError(f"schema drift: new columns {drift}")
+
+    old_cols, new_cols = {}, {}
+    for col in cached.columns:
+        old_s = cached[col]
+        if col in new.columns:
+            new_s = new[col]
+        elif isinstance(old_s.dtype, pd.CategoricalDtype):
+            new_s = pd.Series(pd.Categorical([None] * len(new), categories=old_s.cat.categories), index=new.index)
+        else:
+            new_s = pd.Series(None, index=new.index, dtype=object)
+        old_cols[col], new_cols[col] = _align_new_column(old_s, new_s)
+    old_df = pd.DataFrame(old_cols, index=cached.index)
+    new_df = pd.DataFrame(new_cols, index=new.index)
+
+    # Both sides are DATE-sorted (NaT last): merge by binary-searched insertion points, no full re-sort
+    old_dates = cached["DATE"].to_numpy()
+    n_dated = int(np.searchsorted(old_dates, np.datetime64("NaT"), side="left"))
+    new_dates = new_df["DATE"].to_numpy()
+    pos = np.searchsorted(old_dates[:n_dated], new_dates, side="right")
+    # Undated new rows go after the undated old ones, as the stable sort of a reload puts them
+    pos[np.isnat(new_dates)] = len(old_df)
+    order = np.insert(np.arange(len(old_df)), pos, np.arange(len(old_df), len(old_df) + len(new_df)))
+    merged = pd.concat([old_df, new_df], ignore_index=True).take(order).reset_index(drop=True)
+    merged.attrs["sorted_by"] = "DATE"
+    return merged
+
+
+def patch_tenant_cache(tenant_id: str, new_rows: pd.DataFrame) -> bool:
+    """
+    Call after appending rows to sales_master: appends them to the cached tenant frame (filter index and
+    sales cube are rebuilt from memory) so the next request does not re-read the whole tenant.
+    Falls back to invalidate_tenant_cache on schema drift or any error. Returns True when patched.
+    """
+    if new_rows is None or new_rows.empty:
+        return True
+    # Under the tenant lock: no loader or other patch can interleave with this read-modify-write
+    with _tenant_lock(tenant_id):
+        frame = _cache_get(tenant_id)
+        if frame is None:
+            return False
+        if frame.df.empty:
+            invalidate_tenant_cache(tenant_id)
+            return False
+        try:
+            patched = TenantFrame(_append_rows(frame.df, new_rows))
+            # Staleness is still measured from the last full read (other writers' rows)
+            patched.loaded_at = frame.loaded_at
+            _cache_put(tenant_id, patched, _generations.get(tenant_id, 0))
+            sql_pushdown.forget_tenant(tenant_id)
+            return True
+        except Exception as e:
+            logging.info("patch_tenant_cache: full reload for tenant %s: %s", tenant_id, e)
+            invalidate_tenant_cache(tenant_id)
+            return False
+
+
 def clear_tenant_data(tenant_id: str = "default_elettro") -> int:
     """Delete all rows for a tenant so data can be re-uploaded with enrichment (e.g. after adding customer master)."""
     eng = get_engine()
@@ -258,67 +878,100 @@ def clear_tenant_data(tenant_id: str = "default_elettro") -> int:
             result = conn.execute(text("DELETE FROM sales_master WHERE tenant_id = :tid"), {"tid": tenant_id})
             conn.commit()
             invalidate_tenant_cache(tenant_id)
+            tenant_snapshot.remove(tenant_id)
             return result.rowcount
     except Exception as e:
         logging.error(f"clear_tenant_data: {e}")
         return 0
 
 
-def update_database(new_df: pd.DataFrame, tenant_id: str = "default_elettro") -> int:
-    """Updates the PostgreSQL database with new records for the specific tenant."""
-    if new_df is None or new_df.empty:
-        return 0
-
-    eng = get_engine()
-    if eng is None:
-        logging.error("Database engine not initialized. Cannot update.")
-        return 0
+class SalesUpload:
+    """
+    One upload appended to sales_master chunk by chunk, skipping lines the tenant already holds (unique
+    LINE_KEY, see bulk_copy). Each add() is its own transaction, so a failure keeps the earlier chunks;
+    sending the file again only inserts what is missing. finish() patches the cached tenant frame once
+    and returns {"inserted": n, "skipped": n}.
+    """
 
-    # Inject multi-tenant ID
-    new_df["tenant_id"] = tenant_id
+    def __init__(self, tenant_id: str = "default_elettro"):
+        self.tenant_id = tenant_id
+        self.counts = {"inserted": 0, "skipped": 0}
+        self._keys = bulk_copy.LineKeyer()
+        self._inserted = []
+        self._created = False
+        self._eng = None
 
-    try:
+    def _prepare_table(self, new_df: pd.DataFrame):
+        eng = get_engine()
+        if eng is None:
+            raise RuntimeError("Database engine not initialized. Cannot update.")
         with eng.connect() as conn:
             # Check if table exists
             has_table = conn.execute(text(
                 "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'sales_master')"
             )).scalar()
+        if not has_table:
+            # First time creation: to_sql only creates the table (column types from the frame)
+            new_df.head(0).to_sql("sales_master", eng, if_exists="replace", index=False)
+            tenant_snapshot.forget_row_id_column()
+            bulk_copy.forget_line_key_index()
+            self._created = True
+            if tenant_snapshot.enabled():
+                # Empty table: the BIGSERIAL column costs nothing yet (existing tables use the migration)
+                tenant_snapshot.ensure_row_id_column(eng, create=True)
+        bulk_copy.ensure_line_key_index(eng)
+        if has_table:
+            bulk_copy.backfill_line_keys(eng, self.tenant_id)
+        return eng
 
-            new_records_count = 0
+    def add(self, new_df: pd.DataFrame) -> set:
+        """
+        Insert one cleaned chunk (keyed here unless it already carries LINE_KEY). Returns the LINE_KEYs
+        inserted. Raises on database errors.
+        """
+        if new_df is None or new_df.empty:
+            return set()
+        # Inject multi-tenant ID
+        new_df["tenant_id"] = self.tenant_id
+        if bulk_copy.LINE_KEY_COLUMN not in new_df.columns:
+            new_df[bulk_copy.LINE_KEY_COLUMN] = self._keys(new_df)
+        if self._eng is None:
+            self._eng = self._prepare_table(new_df)
+        inserted = bulk_copy.insert_new_lines(self._eng, "sales_master", new_df)
+        self.counts["inserted"] += len(inserted)
+        self.counts["skipped"] += len(new_df) - len(inserted)
+        if inserted and not self._created:
+            self._inserted.append(new_df[new_df[bulk_copy.LINE_KEY_COLUMN].isin(inserted)])
+        return inserted
 
-            if not has_table:
-                # First time creation
-                new_df.to_sql("sales_master", eng, if_exists="replace", index=False)
-                new_records_count = len(new_df)
-                logging.info(f"Created new Postgres table with {new_records_count} records for tenant {tenant_id}.")
-            else:
-                # Deduplication logic per tenant
-                existing_invoices = pd.read_sql(
-                    text("SELECT \"INVOICE_NO\" FROM sales_master WHERE tenant_id = :tid"), 
-                    conn, params={"tid": tenant_id}
-                )
-                existing_set = set(existing_invoices["INVOICE_NO"])
-                
-                if "INVOICE_NO" in new_df.columns:
-                    to_insert = new_df[~new_df["INVOICE_NO"].isin(existing_set)]
-                else:
-                    logging.warning("INVOICE_NO missing in new data. Appending all.")
-                    to_insert = new_df
-
-                new_records_count = len(to_insert)
-
-                if new_records_count > 0:
-                    to_insert.to_sql("sales_master", eng, if_exists="append", index=False)
-                    logging.info(f"Appended {new_records_count} new records to Postgres for tenant {tenant_id}.")
-                else:
-                    logging.info("No new records to append to Postgres DB.")
-
-            if new_records_count > 0:
-                invalidate_tenant_cache(tenant_id)
-            return new_records_count
+    def finish(self) -> dict:
+        if self._created:
+            invalidate_tenant_cache(self.tenant_id)
+        elif self._inserted:
+            # Append to the cached frame instead of forcing a full reload of the tenant
+            patch_tenant_cache(self.tenant_id, pd.concat(self._inserted, ignore_index=True))
+        self._inserted = []
+        logging.info(
+            "Appended %d new records to Postgres for tenant %s (%d already present).",
+            self.counts["inserted"], self.tenant_id, self.counts["skipped"],
+        )
+        return dict(self.counts)
+
+
+def insert_sales_rows(new_df: pd.DataFrame, tenant_id: str = "default_elettro") -> dict:
+    """Append a cleaned frame in one go (SalesUpload). Returns {"inserted": n, "skipped": n}; zeros on failure."""
+    upload = SalesUpload(tenant_id)
+    try:
+        upload.add(new_df)
+        return upload.finish()
     except Exception as e:
         logging.error(f"Failed to update Postgres database: {e}")
-        return 0
+        return {"inserted": 0, "skipped": 0}
+
+
+def update_database(new_df: pd.DataFrame, tenant_id: str = "default_elettro") -> int:
+    """Updates the PostgreSQL database with new records for the specific tenant. Returns rows inserted."""
+    return insert_sales_rows(new_df, tenant_id)["inserted"]
 
 
 # ─── SALES TARGETS (per tenant, dashboard KPI vs target) ────────────────────
@@ -379,6 +1032,8 @@ def set_sales_targets(tenant_id: str, target_revenue: Optional[float], target_or
                 {"tid": tenant_id, "rev": target_revenue, "ord": target_orders},
             )
             conn.commit()
+        # /dashboard/summary embeds the targets
+        bump_tenant_version(tenant_id)
         return True
     except Exception as e:
         logging.error("set_sales_targets: %s", e)
@@ -0,0 +1,139 @@
+"""
+Inverted index over the dashboard filter dimensions of a tenant frame.
+
+For every filter dimension (state, city, customer, material group, fiscal year, month) the index keeps,
+per distinct value, the sorted row ids holding that value (CSR layout: one row-id array + offsets).
+A filter request then becomes: union the postings of the requested values, intersect across dimensions,
+clip to the DATE range. No string parsing or per-row comparison happens on the request path.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Material group column, first match wins (any common casing).
+MATERIAL_GROUP_COLUMNS = [
+    "ITEM_NAME_GROUP", "MATERIALGROUP", "MATERIAL_GROUP", "PRODUCT_CATEGORY", "CATEGORY", "ITEM_GROUP",
+    "item_name_group", "materialgroup", "material_group", "product_category", "category", "item_group",
+]
+
+# Request filter name -> candidate columns (first present one is indexed).
+FILTER_COLUMNS = {
+    "states": ["STATE"],
+    "cities": ["CITY"],
+    "customers": ["CUSTOMER_NAME"],
+    "material_groups": MATERIAL_GROUP_COLUMNS,
+    "fiscal_years": ["FINANCIAL_YEAR"],
+    "months": ["MONTH"],
+}
+
+
+def material_group_column(df: pd.DataFrame) -> Optional[str]:
+    """Return the material group column name if present (any common casing)."""
+    for col in MATERIAL_GROUP_COLUMNS:
+        if col in df.columns:
+            return col
+    return None
+
+
+def parse_filter_list(value) -> list:
+    """Comma-separated query value -> list of stripped, non-empty items."""
+    if not value or not str(value).strip():
+        return []
+    return [v.strip() for v in str(value).split(",") if v.strip()]
+
+
+def fiscal_year_key(value) -> str:
+    """Normalize so "FY25-26", "fy25-26" and "25-26" share one key."""
+    s = str(value).strip()
+    if s.upper().startswith("FY") and len(s) > 2:
+        return s[2:].strip()
+    return s
+
+
+class _Postings:
+    """Row ids per distinct value of one column, plus the per-row codes for cheap membership checks."""
+
+    __slots__ = ("codes", "keys", "row_ids", "offsets")
+
+    def __init__(self, series: pd.Series, key=None):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            labels = series.cat.categories
+        else:
+            codes, labels = pd.factorize(series)
+        labels = [key(v) for v in labels] if key is not None else list(labels)
+        self.keys = pd.Index(labels, dtype=object)
+        self.codes = codes
+        # Stable argsort groups rows by code while keeping ids ascending inside each group
+        order = np.argsort(codes, kind="stable")
+        missing = int((codes < 0).sum())
+        self.row_ids = order[missing:]
+        counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def codes_for(self, values: list) -> np.ndarray:
+        return np.flatnonzero(self.keys.isin(values))
+
+    def size(self, codes: np.ndarray) -> int:
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def rows(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.row_ids[self.offsets[c]:self.offsets[c + 1]] for c in codes]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        if len(parts) == 1:
+            return parts[0]
+        # Postings of different values are disjoint, so a sort is an exact union
+        return np.sort(np.concatenate(parts))
+
+
+class FilterIndex:
+    """Per-frame inverted index answering the dashboard filters with sorted row-id sets."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self._postings = {}
+        for name, candidates in FILTER_COLUMNS.items():
+            col = next((c for c in candidates if c in df.columns), None)
+            if col is None:
+                continue
+            key = fiscal_year_key if name == "fiscal_years" else None
+            self._postings[name] = _Postings(df[col], key=key)
+
+    def select(self, lo: int = 0, hi: Optional[int] = None, **filters) -> Optional[np.ndarray]:
+        """
+        Sorted row ids inside [lo, hi) matching every non-empty filter (comma-separated strings or lists).
+        Returns None when no filter applies, i.e. the whole [lo, hi) range matches.
+        Filters on columns the frame does not have are ignored, as before.
+        """
+        hi = self.n_rows if hi is None else hi
+        active = []
+        for name, value in filters.items():
+            postings = self._postings.get(name)
+            values = value if isinstance(value, (list, tuple)) else parse_filter_list(value)
+            if postings is None or not values:
+                continue
+            if name == "fiscal_years":
+                values = [fiscal_year_key(v) for v in values]
+            active.append((postings, postings.codes_for(values)))
+        if not active:
+            return None
+        # Drive from the most selective dimension, then check the rest by code
+        active.sort(key=lambda pc: pc[0].size(pc[1]))
+        postings, codes = active[0]
+        rows = postings.rows(codes)
+        rows = rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+        for postings, codes in active[1:]:
+            if not len(rows):
+                break
+            rows = rows[np.isin(postings.codes[rows], codes)]
+        return rows
+
+    def take(self, df: pd.DataFrame, lo: int = 0, hi: Optional[int] = None, **filters) -> pd.DataFrame:
+        """Rows of df (the frame this index was built on) matching the filters inside [lo, hi)."""
+        hi = self.n_rows if hi is None else hi
+        rows = self.select(lo, hi, **filters)
+        if rows is None:
+            return df.iloc[lo:hi]
+        return df.iloc[rows]
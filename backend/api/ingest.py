@@ -0,0 +1,230 @@
+"""
+Bounded-memory reading of uploaded sales files.
+
+The upload is spooled to a temp file in 1 MB blocks (never held as one bytes object) and parsed back in
+frames of UPLOAD_CHUNK_ROWS rows (default 50000): CSV with pandas' chunked reader, .xlsx/.xlsm through
+openpyxl's read-only (streaming) mode. Legacy .xls workbooks have no streaming reader and are parsed
+whole from the temp file. Each frame goes through the upload pipeline and into the database before the
+next one is read, so peak memory follows the chunk size rather than the file size.
+
+Chunks of one file must parse like the whole file would. pandas infers dtypes and date formats per call,
+so a blank cell could turn an int column into float in one chunk only, and "02/05/2024" could read as
+2 May in one chunk and 5 Feb in the next. CSV is therefore read as text, the first chunk fixes which
+columns are numeric (FileDtypes), and DateParser reuses the date format of the file's first text date.
+
+Multi-file batches can be parsed and transformed in parallel on parse_pool(), a process pool started for
+the batch and shut down after it (UPLOAD_PARSE_PROCESSES workers; default 1 = parse in the job thread).
+openpyxl parsing is CPU-bound and holds the GIL, but every spawn worker re-imports the API (about 140 MB
+resident), so only raise it where memory allows: a 512 MB instance cannot afford it.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, Optional
+
+import pandas as pd
+from fastapi import UploadFile
+from pandas.tseries.api import guess_datetime_format
+
+_SPOOL_BLOCK = 1 << 20
+_STREAMING_EXCEL = (".xlsx", ".xlsm")
+
+
+def upload_chunk_rows() -> int:
+    try:
+        return max(1, int(os.environ.get("UPLOAD_CHUNK_ROWS", "50000")))
+    except ValueError:
+        return 50000
+
+
+def parse_processes() -> int:
+    try:
+        return max(1, int(os.environ.get("UPLOAD_PARSE_PROCESSES", "1")))
+    except ValueError:
+        return 1
+
+
+def parse_pool(files: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Process pool for parsing one batch of files (at most one worker per file); the caller shuts it down.
+    None when disabled (UPLOAD_PARSE_PROCESSES <= 1, or a single file) or unavailable.
+    """
+    workers = min(parse_processes(), files)
+    if workers <= 1:
+        return None
+    try:
+        # spawn: the API process runs threads (job pool, cache refresh) that fork would copy mid-state
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    except Exception as e:
+        logging.warning("ingest: no process pool, parsing uploads in-thread: %s", e)
+        return None
+
+
+async def spool_upload(file: UploadFile) -> str:
+    """Copy the upload to a named temp file (keeping its extension); the caller removes it."""
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(_SPOOL_BLOCK)
+                if not block:
+                    break
+                out.write(block)
+    except Exception:
+        remove_spool(path)
+        raise
+    return path
+
+
+def remove_spool(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _unique_headers(header) -> list:
+    """Header row as pandas would name it: blanks -> 'Unnamed: i', repeats -> 'NAME.1', 'NAME.2'."""
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _excel_frames(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _unique_headers(header)
+        width = len(columns)
+        while True:
+            batch = [
+                row[:width] + (None,) * (width - len(row))
+                for row in islice(rows, chunk_rows)
+            ]
+            if not batch:
+                break
+            frame = pd.DataFrame.from_records(batch, columns=columns).dropna(how="all")
+            if not frame.empty:
+                yield frame
+    finally:
+        wb.close()
+
+
+def estimate_rows(path: str, filename: str) -> int:
+    """Data rows in a spooled upload, for progress reporting (CSV: line count; Excel: sheet dimension). 0 if unknown."""
+    name = (filename or "").lower()
+    try:
+        if name.endswith(".csv"):
+            lines = 0
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(_SPOOL_BLOCK), b""):
+                    lines += block.count(b"\n")
+            return max(0, lines - 1)
+        if name.endswith(_STREAMING_EXCEL):
+            from openpyxl import load_workbook
+
+            wb = load_workbook(path, read_only=True)
+            try:
+                return max(0, (wb.worksheets[0].max_row or 1) - 1)
+            finally:
+                wb.close()
+    except Exception as e:
+        logging.info("ingest: no row estimate for %s: %s", filename, e)
+    return 0
+
+
+class FileDtypes:
+    """
+    Numeric columns of one file, decided on its first chunk: a column whose filled cells all parse as
+    numbers becomes Int64 (all integral) or float64 in every chunk; other columns are left as read. A later
+    chunk whose cells do not all parse keeps that column as text rather than losing values (e.g. "INV-5").
+    """
+
+    def __init__(self):
+        self.numeric = None
+
+    @staticmethod
+    def _numeric_dtype(s: pd.Series) -> Optional[str]:
+        filled = s.dropna()
+        if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(s) or filled.empty:
+            return None
+        if pd.api.types.is_datetime64_any_dtype(s) or pd.api.types.is_timedelta64_dtype(s):
+            return None
+        values = pd.to_numeric(filled, errors="coerce")
+        if values.isna().any():
+            return None
+        return "Int64" if (values == values.round()).all() else "float64"
+
+    def __call__(self, frame: pd.DataFrame) -> pd.DataFrame:
+        if self.numeric is None:
+            self.numeric = {c: t for c in frame.columns if (t := self._numeric_dtype(frame[c])) is not None}
+        for col, dtype in self.numeric.items():
+            if col not in frame.columns:
+                continue
+            values = pd.to_numeric(frame[col], errors="coerce").astype("float64")
+            if values.isna().sum() > frame[col].isna().sum():
+                continue
+            if dtype == "Int64" and (values.dropna() == values.dropna().round()).all():
+                frame[col] = values.astype("Int64")
+            else:
+                frame[col] = values
+        return frame
+
+
+class DateParser:
+    """
+    pd.to_datetime for the chunks of one file, with the format pandas would infer for the whole file:
+    guessed from its first text date, else element-wise ("mixed"). Unparsable values become NaT.
+    """
+
+    def __init__(self):
+        self.format = None
+
+    def __call__(self, s: pd.Series) -> pd.Series:
+        if self.format is None:
+            filled = s.dropna()
+            if filled.empty:
+                return pd.to_datetime(s, errors="coerce")
+            first = filled.iloc[0]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                guessed = guess_datetime_format(first) if isinstance(first, str) else None
+            self.format = guessed or "mixed"
+        return pd.to_datetime(s, format=self.format, errors="coerce")
+
+
+def iter_upload_frames(path: str, filename: str, chunk_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Raw frames of at most chunk_rows rows (default upload_chunk_rows()) from a spooled CSV/Excel upload,
+    with the same column dtypes in every frame (FileDtypes).
+    """
+    chunk_rows = chunk_rows or upload_chunk_rows()
+    name = (filename or "").lower()
+    dtypes = FileDtypes()
+    if name.endswith(".csv"):
+        with pd.read_csv(path, chunksize=chunk_rows, dtype=str) as reader:
+            for frame in reader:
+                yield dtypes(frame)
+    elif name.endswith(_STREAMING_EXCEL):
+        for frame in _excel_frames(path, chunk_rows):
+            yield dtypes(frame)
+    else:
+        logging.info("ingest: %s has no streaming reader, parsing it whole", filename)
+        yield pd.read_excel(path)
@@ -0,0 +1,128 @@
+"""
+Background jobs for work that does not fit in a request (uploads).
+
+submit() runs a function on a small thread pool (UPLOAD_JOB_WORKERS, default 2) and returns at once with
+a Job the client can follow: GET /jobs/{id} for a snapshot, GET /jobs/{id}/events for Server-Sent Events.
+The function reports progress through the callback it receives, using the legacy pipeline_monitor
+stages (Ingest / Transform / Reference / Load) and a 0-100 percent. A job that fails after committing
+part of its work raises PartialFailure, whose result is kept next to the error. Jobs live in process memory and are
+forgotten JOB_RETENTION_SECONDS (default 3600) after they were last updated; with several API workers a
+job is only visible on the worker that accepted it, so run uploads against a single worker or a sticky
+route.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from cachetools import TTLCache
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+FINISHED = (COMPLETED, FAILED)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, str(default))))
+    except ValueError:
+        return default
+
+
+_executor = ThreadPoolExecutor(max_workers=_env_int("UPLOAD_JOB_WORKERS", 2), thread_name_prefix="job")
+_jobs = TTLCache(maxsize=1000, ttl=_env_int("JOB_RETENTION_SECONDS", 3600))
+_lock = threading.Lock()
+
+
+class Job:
+    """State of one background job; `version` increases on every update (SSE sends each new version)."""
+
+    def __init__(self, kind: str, tenant_id: str, **meta):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.tenant_id = tenant_id
+        self.meta = meta
+        self.status = QUEUED
+        self.stage = "Queued"
+        self.percent = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+
+    def update(self, stage: Optional[str] = None, percent: Optional[float] = None, message: Optional[str] = None) -> None:
+        with _lock:
+            if stage is not None:
+                self.stage = stage
+            if percent is not None:
+                self.percent = max(self.percent, min(100, int(percent)))
+            if message is not None:
+                self.message = message
+            self._touch()
+
+    def _touch(self) -> None:
+        self.updated_at = time.time()
+        self.version += 1
+        # Re-insert so retention counts from the last update
+        _jobs[self.id] = self
+
+    def to_dict(self) -> dict:
+        with _lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "tenant": self.tenant_id,
+                "status": self.status,
+                "stage": self.stage,
+                "percent": self.percent,
+                "message": self.message,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+                **self.meta,
+            }
+
+
+class PartialFailure(Exception):
+    """Raised by a job that failed after committing part of its work; `result` describes what was committed."""
+
+    def __init__(self, message: str, result: dict):
+        super().__init__(message)
+        self.result = result
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def _run(job: Job, fn: Callable, args: tuple) -> None:
+    with _lock:
+        job.status = RUNNING
+        job._touch()
+    try:
+        result = fn(*args, progress=job.update)
+        with _lock:
+            job.status, job.stage, job.percent, job.result = COMPLETED, "Done", 100, result
+            job._touch()
+    except Exception as e:
+        logging.exception("job %s (%s, tenant %s) failed", job.id, job.kind, job.tenant_id)
+        with _lock:
+            job.status, job.error = FAILED, str(e)
+            if isinstance(e, PartialFailure):
+                job.result = e.result
+            job._touch()
+
+
+def submit(kind: str, tenant_id: str, fn: Callable, *args, **meta) -> Job:
+    """Queue fn(*args, progress=callback) on the job pool; progress(stage=, percent=, message=)."""
+    job = Job(kind, tenant_id, **meta)
+    with _lock:
+        _jobs[job.id] = job
+    _executor.submit(_run, job, fn, args)
+    return job
@@ -176,7 +176,7 @@ def _dim_to_col(df: pd.DataFrame, dim: str) -> Optional[str]:
 def _safe_top_series(df: pd.DataFrame, col: str, value_col: str = "AMOUNT", top_n: int = 10) -> pd.Series:
     if df.empty or col not in df.columns or value_col not in df.columns:
         return pd.Series(dtype=float)
-    s = df.groupby(col)[value_col].sum().sort_values(ascending=False)
+    s = df.groupby(col, observed=True)[value_col].sum().sort_values(ascending=False)
     if top_n and len(s) > top_n:
         top = s.head(top_n)
         rest = s.iloc[top_n:].sum()
@@ -286,7 +286,7 @@ def _generate_dynamic_pdf_report_inner(
         pdf.set_font("Arial", "B", 12)
         pdf.set_text_color(0, 0, 0)
         pdf.cell(0, 8, "2. Monthly Trend", 0, 1)
-        trend = df.groupby(pd.Grouper(key="DATE", freq="ME"))["AMOUNT"].sum().reset_index()
+        trend = df.groupby(pd.Grouper(key="DATE", freq="ME"), observed=True)["AMOUNT"].sum().reset_index()
         trend["DATE"] = pd.to_datetime(trend["DATE"], errors="coerce")
         trend = trend.sort_values("DATE").tail(24)
         trend["LABEL"] = trend["DATE"].dt.strftime("%Y-%m")
@@ -336,7 +336,7 @@ def _generate_dynamic_pdf_report_inner(
     if include_top_table and primary_col:
         pdf.set_font("Arial", "B", 12)
         pdf.cell(0, 8, _pdf_text(f"4. Top {max(3, int(top_n))} by Revenue ({primary_col})"), 0, 1)
-        grp = df.groupby(primary_col).agg(
+        grp = df.groupby(primary_col, observed=True).agg(
             Revenue=("AMOUNT", "sum"),
             Orders=("INVOICE_NO", "nunique") if "INVOICE_NO" in df.columns else ("AMOUNT", "size"),
             Customers=("CUSTOMER_NAME", "nunique") if "CUSTOMER_NAME" in df.columns else ("AMOUNT", "size"),
@@ -368,11 +368,11 @@ def _generate_dynamic_pdf_report_inner(
         pdf.set_text_color(0, 0, 0)
         pdf.cell(0, 8, _pdf_text(f"5. Breakdown: {primary_col} -> {secondary_col}"), 0, 1)
 
-        top_primary = df.groupby(primary_col)["AMOUNT"].sum().sort_values(ascending=False).head(8).index.tolist()
-        top_secondary = df.groupby(secondary_col)["AMOUNT"].sum().sort_values(ascending=False).head(6).index.tolist()
+        top_primary = df.groupby(primary_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(8).index.tolist()
+        top_secondary = df.groupby(secondary_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(6).index.tolist()
         sub = df[df[primary_col].isin(top_primary) & df[secondary_col].isin(top_secondary)]
         if not sub.empty:
-            pivot = sub.pivot_table(index=primary_col, columns=secondary_col, values="AMOUNT", aggfunc="sum", fill_value=0)
+            pivot = sub.pivot_table(index=primary_col, columns=secondary_col, values="AMOUNT", aggfunc="sum", fill_value=0, observed=True)
             # Limit columns so cell width never too small (fpdf "Not enough horizontal space")
             max_cols = 10
             cols = list(pivot.columns)[:max_cols]
@@ -782,7 +782,7 @@ def _generate_distributor_strategy_pdf_inner(
     pdf.set_text_color(0, 0, 0)
     fill = False
     if grp_col in df.columns and total_rev > 0:
-        mix = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False).head(9)
+        mix = df.groupby(grp_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(9)
         for i, (cat, amt) in enumerate(mix.items(), 1):
             share = (float(amt) / total_rev * 100.0) if total_rev > 0 else 0.0
             pdf.set_fill_color(248, 249, 250) if fill else pdf.set_fill_color(255, 255, 255)
@@ -808,7 +808,7 @@ def _generate_distributor_strategy_pdf_inner(
 
     recs = []
     if grp_col in df.columns and total_rev > 0:
-        top_cat = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False).head(1)
+        top_cat = df.groupby(grp_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(1)
         if len(top_cat) == 1:
             cat_name = _pdf_text(top_cat.index[0])
             cat_share = float(top_cat.iloc[0]) / total_rev * 100.0 if total_rev > 0 else 0.0
@@ -975,7 +975,7 @@ def _generate_pdf_report_inner(
     # 3. Monthly Trend Graph (limit to last 24 months for speed)
     print("PDF_GEN - Starting Monthly Trend Graph...", flush=True); sys.stdout.flush()
     if "MONTH" in df.columns and "AMOUNT" in df.columns:
-        trend = df.groupby("MONTH")["AMOUNT"].sum().reset_index()
+        trend = df.groupby("MONTH", observed=True)["AMOUNT"].sum().reset_index()
         try:
             trend["SortKey"] = pd.to_datetime(trend["MONTH"], format="%b-%y", errors='coerce')
             trend = trend.sort_values("SortKey").tail(24)
@@ -1022,7 +1022,7 @@ def _generate_pdf_report_inner(
         pdf.set_font("Arial", 'B', 12)
         pdf.cell(0, 10, "3. Category Distribution", 0, 1)
         
-        grp_data = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False)
+        grp_data = df.groupby(grp_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False)
         if len(grp_data) > 5:
             top_5 = grp_data.head(5)
             others = pd.Series([grp_data.iloc[5:].sum()], index=["Others"])
@@ -1055,7 +1055,7 @@ def _generate_pdf_report_inner(
     # Top items Horizontal Bar
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(0, 10, f"4. Top 10 High Volume Items", 0, 1)
-    top_items = df.groupby(item_col)["AMOUNT"].sum().sort_values(ascending=False).head(10)
+    top_items = df.groupby(item_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(10)
     
     fig = Figure(figsize=(10, 5))
     canvas = FigureCanvas(fig)
@@ -1098,7 +1098,7 @@ def _generate_pdf_report_inner(
     pdf.set_text_color(0, 0, 0)
     
     # Top 25 items for table
-    detailed_data = df.groupby([item_col, grp_col])["AMOUNT"].sum().reset_index().sort_values(by="AMOUNT", ascending=False).head(25)
+    detailed_data = df.groupby([item_col, grp_col], observed=True)["AMOUNT"].sum().reset_index().sort_values(by="AMOUNT", ascending=False).head(25)
     
     fill = False
     for idx, row in detailed_data.iterrows():
@@ -1125,7 +1125,7 @@ def _generate_pdf_report_inner(
         pdf.cell(0, 10, "5. Fiscal Year (FY) Analysis", 0, 1)
         pdf.ln(2)
 
-        fy_stats = df.groupby("FINANCIAL_YEAR").agg(Revenue=("AMOUNT", "sum"), Orders=("INVOICE_NO", "nunique")).sort_index()
+        fy_stats = df.groupby("FINANCIAL_YEAR", observed=True).agg(Revenue=("AMOUNT", "sum"), Orders=("INVOICE_NO", "nunique")).sort_index()
 
         pdf.set_font("Arial", 'B', 10)
         pdf.set_fill_color(33, 37, 41)
@@ -1159,7 +1159,7 @@ def _generate_pdf_report_inner(
                 df['Month_Num'] = pd.to_datetime(df['DATE']).dt.month
                 df['Month_Name'] = pd.to_datetime(df['DATE']).dt.strftime('%b')
                 
-                fy_trend = df.groupby(['FINANCIAL_YEAR', 'Month_Num', 'Month_Name'])['AMOUNT'].sum().reset_index()
+                fy_trend = df.groupby(['FINANCIAL_YEAR', 'Month_Num', 'Month_Name'], observed=True)['AMOUNT'].sum().reset_index()
                 fy_trend.sort_values('Month_Num', inplace=True)
                 
                 fig = Figure(figsize=(10, 5))
@@ -1192,7 +1192,7 @@ def _generate_pdf_report_inner(
     pdf.ln(5)
 
     if grp_col in df.columns:
-        group_summary = df.groupby(grp_col).agg(
+        group_summary = df.groupby(grp_col, observed=True).agg(
             Total_Revenue=("AMOUNT", "sum"),
             Top_Item=(item_col, lambda x: x.mode()[0] if not x.mode().empty else "N/A"),
             Order_Count=("INVOICE_NO", "nunique")
@@ -1224,7 +1224,7 @@ def _generate_pdf_report_inner(
         pdf.cell(0, 10, "7. Material Group Preference", 0, 1)
         pdf.ln(5)
         
-        mat_grp_data = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False).head(15)
+        mat_grp_data = df.groupby(grp_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(15)
         
         pdf.set_font("Arial", 'B', 10)
         pdf.set_fill_color(33, 37, 41)
@@ -1250,7 +1250,7 @@ def _generate_pdf_report_inner(
         pdf.ln(5)
         
         if "CUSTOMER_NAME" in df.columns:
-            cust_data = df.groupby("CUSTOMER_NAME")["AMOUNT"].sum().sort_values(ascending=False).head(15)
+            cust_data = df.groupby("CUSTOMER_NAME", observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(15)
             
             pdf.set_font("Arial", 'B', 10)
             pdf.set_fill_color(33, 37, 41)
@@ -1320,7 +1320,7 @@ def _generate_pdf_report_inner(
         pdf.set_font("Arial", '', 10)
         pdf.ln(2)
         
-        top5_cust = df.groupby("CUSTOMER_NAME")["AMOUNT"].sum().sort_values(ascending=False).head(5)
+        top5_cust = df.groupby("CUSTOMER_NAME", observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(5)
         fill = False
         for i, (cust, amt) in enumerate(top5_cust.items(), 1):
             share = (amt / total_rev * 100) if total_rev > 0 else 0
@@ -1342,7 +1342,7 @@ def _generate_pdf_report_inner(
         pdf.set_font("Arial", '', 10)
         pdf.ln(2)
         
-        top5_grp = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False).head(5)
+        top5_grp = df.groupby(grp_col, observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(5)
         fill = False
         for i, (grp, amt) in enumerate(top5_grp.items(), 1):
             share = (amt / total_rev * 100) if total_rev > 0 else 0
@@ -1366,7 +1366,7 @@ def _generate_pdf_report_inner(
     insights = []
     
     if "CUSTOMER_NAME" in df.columns and total_rev > 0:
-        top3_rev = df.groupby("CUSTOMER_NAME")["AMOUNT"].sum().sort_values(ascending=False).head(3).sum()
+        top3_rev = df.groupby("CUSTOMER_NAME", observed=True)["AMOUNT"].sum().sort_values(ascending=False).head(3).sum()
         top3_pct = top3_rev / total_rev * 100
         if top3_pct > 60:
             insights.append(f"HIGH CONCENTRATION: Top 3 customers account for {top3_pct:.1f}% of revenue. Consider diversifying the customer base.")
@@ -1375,8 +1375,8 @@ def _generate_pdf_report_inner(
     
     if grp_col in df.columns:
         num_cats = df[grp_col].nunique()
-        top_cat = df.groupby(grp_col)["AMOUNT"].sum().idxmax()
-        top_cat_share = df.groupby(grp_col)["AMOUNT"].sum().max() / total_rev * 100 if total_rev > 0 else 0
+        top_cat = df.groupby(grp_col, observed=True)["AMOUNT"].sum().idxmax()
+        top_cat_share = df.groupby(grp_col, observed=True)["AMOUNT"].sum().max() / total_rev * 100 if total_rev > 0 else 0
         insights.append(f"PORTFOLIO: {num_cats} material groups active. '{str(top_cat)[:30]}' leads with {top_cat_share:.1f}% share.")
     
     if avg_order > 0:
@@ -1388,7 +1388,7 @@ def _generate_pdf_report_inner(
     # Geographic insight
     if "STATE" in df.columns and not df.empty:
         num_states = df["STATE"].nunique()
-        top_state = df.groupby("STATE")["AMOUNT"].sum().idxmax()
+        top_state = df.groupby("STATE", observed=True)["AMOUNT"].sum().idxmax()
         insights.append(f"GEOGRAPHY: Active across {num_states} states. Top state: {top_state}.")
     
     insights.append(f"Generated on: {datetime.now().strftime('%d %B %Y, %I:%M %p')}")
@@ -0,0 +1,113 @@
+"""
+Response cache for the read-only analytics GET routes.
+
+Routes marked with @cached_result keep their rendered JSON body in a bounded LRU, keyed by
+(route, canonicalized query params) and tagged with db.tenant_data_version() at compute time. Any upload,
+clear, cache reload or targets change bumps that version, so older entries can no longer be served;
+entries also expire with the tenant cache TTL so background reloads still happen. Every cached response
+carries a strong ETag; a request whose If-None-Match matches gets 304 before the endpoint (or any pandas
+work) runs. The cache is bounded by the size of the bodies it holds: RESULT_CACHE_MAX_BYTES (default
+64 MB, 0 = off); a single body larger than that is not cached.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from cachetools import LRUCache
+from fastapi import Request, Response
+
+from .db import TENANT_CACHE_TTL, tenant_data_version
+from .serialization import FormatRoute
+
+# Comma-separated filters: order and duplicates do not change the result
+_LIST_PARAMS = {"states", "cities", "customers", "material_groups", "fiscal_years", "months"}
+# ETags from a previous process must not match: versions restart at 0
+_PROCESS_NONCE = uuid.uuid4().hex
+
+
+def _max_bytes() -> int:
+    try:
+        return max(0, int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 << 20))))
+    except ValueError:
+        return 64 << 20
+
+
+# Entries are (version, stored_at, body, media_type); weighed by body size so large lists count fully
+_results = LRUCache(maxsize=max(1, _max_bytes()), getsizeof=lambda entry: max(1, len(entry[2])))
+_lock = threading.Lock()
+
+
+def cached_result(endpoint):
+    """Mark a GET endpoint whose response depends only on its query params and the tenant's data."""
+    endpoint._result_cache = True
+    return endpoint
+
+
+def _canonical_params(query_params) -> tuple:
+    items = []
+    for name, value in query_params.multi_items():
+        value = value.strip()
+        if not value:
+            continue
+        if name in _LIST_PARAMS:
+            value = ",".join(sorted({v.strip() for v in value.split(",") if v.strip()}))
+        items.append((name, value))
+    return tuple(sorted(items))
+
+
+def _etag(key: tuple, version: int) -> str:
+    digest = hashlib.sha1(repr((key, version, _PROCESS_NONCE)).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
+
+def clear() -> None:
+    with _lock:
+        _results.clear()
+
+
+class ResultCacheRoute(FormatRoute):
+    """APIRoute that serves @cached_result endpoints from the result cache / with 304 revalidation."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not getattr(self.endpoint, "_result_cache", False):
+            return handler
+        path = self.path
+
+        async def cached_handler(request: Request) -> Response:
+            if request.method != "GET" or _max_bytes() == 0:
+                return await handler(request)
+            tenant_id = request.query_params.get("tenant_id", "default_elettro")
+            key = (path, _canonical_params(request.query_params))
+            version = tenant_data_version(tenant_id)
+            etag = _etag(key, version)
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            with _lock:
+                hit = _results.get(key)
+            if hit is not None and hit[0] == version and time.monotonic() - hit[1] < TENANT_CACHE_TTL:
+                if _etag_matches(request, etag):
+                    return Response(status_code=304, headers=headers)
+                return Response(content=hit[2], media_type=hit[3], headers=headers)
+
+            response = await handler(request)
+            # Only keep results that were computed entirely under one data version
+            if response.status_code == 200 and hasattr(response, "body") and tenant_data_version(tenant_id) == version:
+                with _lock:
+                    try:
+                        _results[key] = (version, time.monotonic(), response.body, response.media_type)
+                    except ValueError:
+                        # Body alone exceeds RESULT_CACHE_MAX_BYTES: serve it, do not cache it
+                        _results.pop(key, None)
+                response.headers.update(headers)
+            return response
+
+        return cached_handler
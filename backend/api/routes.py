@@ -1,17 +1,33 @@
 from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form, Response, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Union
 import logging
 import pandas as pd
 import json
 import io
+import asyncio
+import time
+import numpy as np
+from concurrent.futures import as_completed
+import base64
 import os
 from datetime import datetime, timedelta
 
 import calendar
 
+from shared.date_enrichment import add_date_columns
+from shared.dict_encoding import clean_text, map_unique, mask_unique, text_value
+from shared.geo_resolver import fill_missing_states
+from shared.material_rules import apply_material_rules
+
 from .db import (
     get_tenant_data,
+    get_tenant_data_versioned,
+    get_filtered_data,
+    get_rollup_source,
+    get_sql_pushdown,
+    TenantSelection,
     create_user,
     verify_user,
     get_sales_targets,
@@ -20,28 +36,15 @@ from .db import (
     list_distributor_targets,
     upsert_distributor_target,
 )
+from .filter_index import FilterIndex, parse_filter_list, material_group_column as _material_group_column
+from .sales_cube import DateLabel, rollup, aggregate
+from . import bulk_copy, ingest, jobs
+from .customer_master import enrich as _enrich_from_customer_master, reenrich_sales, save_master as save_customer_master
+from .result_cache import ResultCacheRoute, cached_result
+from .serialization import json_bytes_response, records_json, response_format, serialize_df
 
-router = APIRouter()
-
-# Keyword-based exclusion: row excluded if material group CONTAINS any of these (case-insensitive).
-# Kept in sync with legacy/config.py EXCLUDE_KEYWORDS.
-EXCLUDE_KEYWORDS = [
-    "SERVICE", "AIR VENT", "PACKING", "RAW", "BRASS", "PANEL",
-    "SALES ACCOUNT", "MASTER BATCH", "SEMI", "PPCP", "FIXED",
-    "PROTECTION", "HIPS", "ABS", "INDIRECT", "NYLOAN", "PP BLACK",
-    "NASER MILES PARIS", "DOCUMENT HOLDER",
-    "SWISS MILITARY MODLE MAZE",
-    "SELF ADHESIVE TIE MOUNT", "SCREW TYPE TIE MOUNT",
-    "FINISHED GOOD",
-]
-
-# Rename mappings: regex pattern → standardized name (applied before exclusion)
-MATERIAL_GROUP_MAPPINGS = {
-    r"CONDUIT.*GLAND": "POLYAMIDE CONDUIT GLAND",
-    r"REVER": "REVERSE FORWARD",
-    r"REVERSE FORWORD": "REVERSE FORWARD",
-}
-
+# Analytics GETs marked @cached_result are answered from the result cache / 304 (see result_cache.py)
+router = APIRouter(route_class=ResultCacheRoute)
 
 # ─── AUTH (real: users stored in auth_users table) ───
 
@@ -160,19 +163,6 @@ def admin_create_user(request: Request, req: CreateUserRequest):
         raise HTTPException(status_code=400, detail=err)
     return {"message": f"User '{req.username}' created."}
 
-def serialize_df(df: pd.DataFrame) -> list:
-    """Helper to cleanly serialize pandas dataframes to JSON. Returns [] on error to avoid 500s."""
-    if df is None or df.empty:
-        return []
-    try:
-        raw = df.to_json(orient="records", date_format="iso")
-        # pandas can output NaN which is invalid JSON; replace so json.loads works
-        if raw.find("NaN") != -1:
-            raw = raw.replace("NaN", "null")
-        return json.loads(raw)
-    except Exception:
-        return []
-
 def _date_amount_columns(df: pd.DataFrame):
     """Return (date_col, amount_col) with case-insensitive match so trend works when DB returns lowercase."""
     if df is None or df.empty:
@@ -181,94 +171,77 @@ def _date_amount_columns(df: pd.DataFrame):
     amount_col = next((c for c in df.columns if str(c).upper() == "AMOUNT"), None)
     return date_col, amount_col
 
-def _material_group_column(df: pd.DataFrame):
-    """Return the material group column name if present (any common casing)."""
-    candidates = [
-        "ITEM_NAME_GROUP", "MATERIALGROUP", "MATERIAL_GROUP", "PRODUCT_CATEGORY", "CATEGORY", "ITEM_GROUP",
-        "item_name_group", "materialgroup", "material_group", "product_category", "category", "item_group",
-    ]
-    for col in candidates:
-        if col in df.columns:
-            return col
-    return None
-
-def _apply_material_mappings(df: pd.DataFrame) -> pd.DataFrame:
-    """Rename/standardize material groups using regex patterns (same as legacy ETL)."""
-    if df is None or df.empty:
-        return df
-    grp_col = _material_group_column(df)
-    if grp_col is None:
-        return df
-    for pattern, replacement in MATERIAL_GROUP_MAPPINGS.items():
-        mask = df[grp_col].astype(str).str.contains(pattern, case=False, na=False)
-        df.loc[mask, grp_col] = replacement
-    return df
+def _analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months):
+    """SQL pushdown for very large tenants, else the sales cube slice or filtered raw lines."""
+    src = get_sql_pushdown(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+    if src is None:
+        src = get_rollup_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+    return src
+
+def _lines_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months):
+    """SQL pushdown for very large tenants, else the filtered raw lines (day- and customer-level rollups)."""
+    src = get_sql_pushdown(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+    if src is None:
+        src = get_filtered_data(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+    return src
+
+def _trend_records(df, limit: Optional[int] = None) -> list:
+    """Monthly AMOUNT as [{DATE: "YYYY-MM", AMOUNT}]; falls back to the MONTH column when no row has a DATE."""
+    date_col, amount_col = _date_amount_columns(df)
+    if not amount_col:
+        return []
+    if date_col:
+        trend = rollup(df, pd.Grouper(key=date_col, freq="ME"), AMOUNT=(amount_col, "sum")).reset_index()
+        if not trend.empty:
+            trend = trend.rename(columns={date_col: "DATE"})
+            trend["DATE"] = trend["DATE"].dt.strftime("%Y-%m")
+            return serialize_df(trend.tail(limit) if limit is not None else trend)
+    month_col = next((c for c in df.columns if str(c).upper() == "MONTH"), None)
+    if month_col:
+        try:
+            by_month = rollup(df, month_col, AMOUNT=(amount_col, "sum")).reset_index()
+            by_month = by_month.rename(columns={month_col: "MONTH"})
+            month_str = by_month["MONTH"].astype(str).str.strip()
+            month_str = month_str.str[:3].str.title() + "-" + month_str.str[-2:]
+            by_month["DATE"] = pd.to_datetime(month_str, format="%b-%y", errors="coerce")
+            by_month = by_month.dropna(subset=["DATE"]).sort_values("DATE")
+            by_month["DATE"] = by_month["DATE"].dt.strftime("%Y-%m")
+            by_month = by_month[["DATE", "AMOUNT"]]
+            return serialize_df(by_month.tail(limit) if limit is not None else by_month)
+        except Exception:
+            pass
+    return []
 
+def _top_amounts(df, col: str, amount_col: str, limit: int) -> pd.DataFrame:
+    """Top `limit` values of col by summed amount, as [col, amount_col] rows."""
+    totals = rollup(df, col, **{amount_col: (amount_col, "sum")})[amount_col]
+    return totals.sort_values(ascending=False).head(limit).reset_index()
 
-def _exclude_material_groups(df: pd.DataFrame) -> pd.DataFrame:
+def _apply_material_rules(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Remove non-sales material groups using keyword/substring matching (same as legacy ETL).
-    Row excluded if material group CONTAINS any keyword (case-insensitive).
+    Rename material groups (MATERIAL_GROUP_MAPPINGS), then drop non-sales groups (EXCLUDE_KEYWORDS).
+    Rules live in shared/material_rules.py, used by the legacy ETL as well.
     """
     if df is None or df.empty:
         return df
     grp_col = _material_group_column(df)
     if grp_col is None:
         return df
-    norm = (
-        df[grp_col]
-        .astype(str)
-        .str.replace("\u00a0", " ", regex=False)
-        .str.replace(r"\s+", " ", regex=True)
-        .str.strip()
-        .str.upper()
-    )
-    mask = pd.Series(False, index=df.index)
-    for keyword in EXCLUDE_KEYWORDS:
-        mask = mask | norm.str.contains(keyword, case=False, na=False)
-    return df[~mask]
+    return apply_material_rules(df, grp_col)
 
 def apply_filters(df: pd.DataFrame, states=None, cities=None, customers=None, material_groups=None, fiscal_years=None, months=None) -> pd.DataFrame:
-    """Apply granular filters to a dataframe. Ignores empty or whitespace-only filter strings."""
+    """
+    Apply granular filters to an arbitrary dataframe. Ignores empty or whitespace-only filter strings.
+    Tenant data should go through get_filtered_data, which reuses the index built at cache load.
+    """
     if df is None or not isinstance(df, pd.DataFrame):
         return pd.DataFrame()
     if df.empty:
         return df
-    if states and str(states).strip():
-        state_list = [s.strip() for s in states.split(",") if s.strip()]
-        if "STATE" in df.columns and state_list:
-            df = df[df["STATE"].isin(state_list)]
-    if cities and str(cities).strip():
-        city_list = [c.strip() for c in cities.split(",") if c.strip()]
-        if "CITY" in df.columns and city_list:
-            df = df[df["CITY"].isin(city_list)]
-    if customers and str(customers).strip():
-        cust_list = [c.strip() for c in customers.split(",") if c.strip()]
-        if "CUSTOMER_NAME" in df.columns and cust_list:
-            df = df[df["CUSTOMER_NAME"].isin(cust_list)]
-    if material_groups and str(material_groups).strip():
-        mg_list = [m.strip() for m in material_groups.split(",") if m.strip()]
-        grp_col = _material_group_column(df)
-        if grp_col and mg_list:
-            df = df[df[grp_col].isin(mg_list)]
-    if fiscal_years and str(fiscal_years).strip():
-        fy_list = [f.strip() for f in fiscal_years.split(",") if f.strip()]
-        if "FINANCIAL_YEAR" in df.columns and fy_list:
-            # Normalize so "FY25-26" and "25-26" both match
-            fy_set = set()
-            for f in fy_list:
-                fy_set.add(f)
-                if str(f).upper().startswith("FY") and len(f) > 2:
-                    fy_set.add(str(f)[2:].strip())
-                else:
-                    fy_set.add("FY" + str(f).strip())
-            col = df["FINANCIAL_YEAR"].astype(str).str.strip()
-            df = df[col.isin(fy_set)]
-    if months and str(months).strip():
-        month_list = [m.strip() for m in months.split(",") if m.strip()]
-        if "MONTH" in df.columns and month_list:
-            df = df[df["MONTH"].isin(month_list)]
-    return df
+    return FilterIndex(df).take(
+        df, states=states, cities=cities, customers=customers,
+        material_groups=material_groups, fiscal_years=fiscal_years, months=months,
+    )
 
 # Single canonical placeholder for missing state/region (avoids "State Not Found" vs "STATE NOT FOUND ⚠️")
 STATE_PLACEHOLDER = "State Not Found"
@@ -311,8 +284,19 @@ def standardize(df):
 
     return df
 
+def _state_missing(value) -> bool:
+    return value == "" or "NOT FOUND" in value.upper()
+
+
+def _state_or_placeholder(value) -> str:
+    return text_value(value) or STATE_PLACEHOLDER
+
+
 def _coalesce_state_region(df: pd.DataFrame) -> pd.DataFrame:
-    """One STATE column: merge REGION/PROVINCE/TERRITORY into STATE where STATE is empty, then drop extras."""
+    """
+    One STATE column: merge REGION/PROVINCE/TERRITORY into STATE where STATE is empty, then drop extras.
+    Cleanup runs per distinct value (shared/dict_encoding.py), not per row.
+    """
     if df is None or df.empty:
         return df
     region_cols = [c for c in ["REGION", "PROVINCE", "TERRITORY"] if c in df.columns]
@@ -320,27 +304,21 @@ def _coalesce_state_region(df: pd.DataFrame) -> pd.DataFrame:
         if "STATE" not in df.columns:
             df["STATE"] = STATE_PLACEHOLDER
         else:
-            df["STATE"] = df["STATE"].fillna("").astype(str).str.strip()
-            df.loc[df["STATE"].astype(str).str.strip() == "", "STATE"] = STATE_PLACEHOLDER
+            df["STATE"] = map_unique(df["STATE"], _state_or_placeholder)
         return df
-    if "STATE" not in df.columns:
-        df["STATE"] = df[region_cols[0]].fillna("").astype(str).str.strip()
+    state = clean_text(df["STATE"] if "STATE" in df.columns else df[region_cols[0]])
     for rc in region_cols:
-        mask = (df["STATE"].fillna("").astype(str).str.strip() == "") | (df["STATE"].astype(str).str.upper().str.contains("NOT FOUND", na=False))
-        df.loc[mask, "STATE"] = df.loc[mask, rc].fillna("").astype(str).str.strip()
+        mask = mask_unique(state, _state_missing)
+        if mask.any():
+            state = state.mask(mask, clean_text(df[rc]))
         df.drop(columns=[rc], inplace=True, errors="ignore")
-    df["STATE"] = df["STATE"].fillna("").astype(str).str.strip()
-    df.loc[df["STATE"] == "", "STATE"] = STATE_PLACEHOLDER
+    df["STATE"] = map_unique(state, _state_or_placeholder).rename("STATE")
     return df
 
-def calculate_fy(date):
-    if pd.isna(date): return "UNKNOWN"
-    if date.month >= 4: return f"FY{date.year % 100}-{(date.year + 1) % 100}"
-    else: return f"FY{(date.year - 1) % 100}-{date.year % 100}"
-
-
 COMPANY_STATE = "MAHARASHTRA"
 TAX_RATE = 0.18
+# Intra-state (CGST + SGST) when the cleaned, upper-cased STATE is one of these
+_INTRA_STATES = {COMPANY_STATE, "UNKNOWN", "STATE NOT FOUND"}
 
 def calculate_taxes(df: pd.DataFrame) -> pd.DataFrame:
     """Calculate IGST/CGST/SGST based on STATE (same as legacy ETL)."""
@@ -360,10 +338,10 @@ def calculate_taxes(df: pd.DataFrame) -> pd.DataFrame:
     df["TAX"] = 0.0
     df["TOTALAMOUNT"] = 0.0
 
-    state_series = df["STATE"].copy() if "STATE" in df.columns else pd.Series(["Unknown"] * len(df), index=df.index)
-    state_series = state_series.fillna("Unknown").astype(str).str.upper().str.strip()
-
-    intra = state_series.isin([COMPANY_STATE, "UNKNOWN", "STATE NOT FOUND"])
+    if "STATE" in df.columns:
+        intra = mask_unique(df["STATE"], lambda v: text_value(v, "Unknown", upper=True) in _INTRA_STATES)
+    else:
+        intra = pd.Series(True, index=df.index)
     inter = ~intra
 
     df.loc[inter, "IGST"] = df.loc[inter, "AMOUNT"] * TAX_RATE
@@ -378,34 +356,6 @@ def calculate_taxes(df: pd.DataFrame) -> pd.DataFrame:
 
 # ─── UPLOAD PIPELINE ───
 
-# In-memory customer master per tenant (uploaded via /upload/customer-master)
-_customer_masters: dict[str, pd.DataFrame] = {}
-
-
-def _merge_customer_master(df: pd.DataFrame, tenant_id: str) -> pd.DataFrame:
-    """Enrich sales data with STATE/CITY from the customer master if available."""
-    master = _customer_masters.get(tenant_id)
-    if master is None or master.empty:
-        return df
-    if "CUSTOMER_NAME" not in df.columns or "CUSTOMER_NAME" not in master.columns:
-        return df
-    master_cols = [c for c in ["CUSTOMER_NAME", "STATE", "CITY"] if c in master.columns]
-    if len(master_cols) < 2:
-        return df
-    merged = pd.merge(df, master[master_cols], on="CUSTOMER_NAME", how="left", suffixes=("_raw", "_master"))
-    for col in ["STATE", "CITY"]:
-        mc = f"{col}_master"
-        rc = f"{col}_raw"
-        if mc in merged.columns and rc in merged.columns:
-            merged[col] = merged[mc].fillna(merged[rc])
-            merged.drop(columns=[mc, rc], inplace=True)
-        elif mc in merged.columns:
-            merged.rename(columns={mc: col}, inplace=True)
-        elif rc in merged.columns:
-            merged.rename(columns={rc: col}, inplace=True)
-    return merged
-
-
 @router.post("/data/clear")
 def clear_data(tenant_id: str = Form("default_elettro")):
     """Clear all sales data for a tenant so it can be re-uploaded with enrichment."""
@@ -414,111 +364,394 @@ def clear_data(tenant_id: str = Form("default_elettro")):
     return {"deleted_rows": deleted, "tenant": tenant_id}
 
 
+@router.post("/data/reenrich", status_code=202)
+def reenrich_data(tenant_id: str = Form("default_elettro")):
+    """
+    Queue applying the tenant's customer master (STATE/CITY, taxes) to rows already stored, without
+    re-uploading; returns the job at once (202). The finished job's result has updated_rows.
+    """
+    job = jobs.submit("reenrich", tenant_id, _reenrich_job, tenant_id)
+    return {"job_id": job.id, "status": job.status, "tenant": tenant_id}
+
+
 @router.post("/upload/customer-master")
-async def upload_customer_master(file: UploadFile = File(...), tenant_id: str = Form("default_elettro")):
-    """Upload a customer master Excel/CSV. Stored in memory; used to enrich STATE/CITY on subsequent sales uploads."""
+def upload_customer_master(
+    file: UploadFile = File(...),
+    tenant_id: str = Form("default_elettro"),
+    reenrich: bool = Form(False),
+):
+    """
+    Upload a customer master Excel/CSV (CUSTOMER_NAME with STATE and/or CITY). It replaces the tenant's
+    stored master and enriches STATE/CITY on subsequent sales uploads; reenrich=true also queues a job
+    applying it to the rows already stored (see /data/reenrich) and returns its reenrich_job_id.
+    """
     try:
-        content = await file.read()
         if file.filename and file.filename.endswith(".csv"):
-            master = pd.read_csv(io.BytesIO(content))
+            master = pd.read_csv(file.file)
         else:
-            master = pd.read_excel(io.BytesIO(content))
+            master = pd.read_excel(file.file)
         master = standardize(master)
-        _customer_masters[tenant_id] = master
-        cols = list(master.columns)
-        return {"filename": file.filename, "rows": len(master), "columns": cols, "tenant": tenant_id}
+        stored = save_customer_master(tenant_id, master)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process customer master: {str(e)}")
+    job = jobs.submit("reenrich", tenant_id, _reenrich_job, tenant_id) if reenrich else None
+    cols = list(master.columns)
+    return {
+        "filename": file.filename, "rows": stored, "columns": cols, "tenant": tenant_id,
+        "reenrich_job_id": job.id if job is not None else None,
+    }
 
 
-@router.post("/upload")
-async def handle_data_upload(file: UploadFile = File(...), tenant_id: str = Form("default_elettro")):
+def _no_progress(**_):
+    pass
+
+
+def _reenrich_job(tenant_id: str, progress=_no_progress) -> dict:
+    """Background job for /data/reenrich: one UPDATE ... FROM customer_master over the stored rows."""
+    progress(stage="Load", percent=5, message="Applying customer master to stored rows")
+    updated = reenrich_sales(tenant_id, _INTRA_STATES, TAX_RATE)
+    return {"updated_rows": updated, "tenant": tenant_id}
+
+
+def _prepare_upload_frame(df: pd.DataFrame, tenant_id: str, customer_master: bool = True, progress=_no_progress, parse_dates=None) -> pd.DataFrame:
+    """
+    Upload pipeline for one chunk of raw rows: standardize -> enrich -> material rules -> taxes.
+    Pass one ingest.DateParser per file so every chunk reads DATE with the same format.
+    """
+    # 1. Clean & Standardize
+    progress(stage="Transform")
+    df = standardize(df)
+    df = _coalesce_state_region(df)
+
+    # 2. Enrich from customer master (STATE/CITY)
+    if customer_master:
+        progress(stage="Reference")
+        df = _enrich_from_customer_master(df, tenant_id)
+        progress(stage="Transform")
+
+    # 2b. Still no state: derive it from CITY (shared city index, once per distinct city)
+    df = fill_missing_states(df, placeholder=STATE_PLACEHOLDER)
+
+    # 3. Enrich Dates
+    if "DATE" in df.columns:
+        df["DATE"] = (parse_dates or ingest.DateParser())(df["DATE"])
+        add_date_columns(df, "DATE")
+
+    if "CITY" not in df.columns: df["CITY"] = "City Not Found"
+    if "STATE" not in df.columns: df["STATE"] = STATE_PLACEHOLDER
+
+    # 4. Standardize material group names, then exclude non-sales rows (ETL rule)
+    df = _apply_material_rules(df)
+
+    # 5. Calculate taxes (IGST/CGST/SGST based on state)
+    return calculate_taxes(df)
+
+
+def _ingest_upload(path: str, filename: str, tenant_id: str, customer_master: bool = True, progress=_no_progress, span=(0, 100)) -> dict:
+    """
+    Push a spooled upload through the pipeline and into the database chunk by chunk (see ingest.py), so
+    memory stays bounded by UPLOAD_CHUNK_ROWS whatever the file size. progress() gets the current stage
+    and a percent within span. Returns {"rows_read", "inserted", "skipped"}.
+    Each chunk commits on its own: on failure the chunks already committed stay (and are patched into the
+    cache), and jobs.PartialFailure reports their counts. Sending the file again adds only missing lines.
+    """
+    from .db import SalesUpload
+
+    total = ingest.estimate_rows(path, filename)
+    lo, hi = span
+    upload = SalesUpload(tenant_id)
+    dates = ingest.DateParser()
+    rows_read = 0
     try:
-        content = await file.read()
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        else:
-            df = pd.read_excel(io.BytesIO(content))
-            
-        if df.empty:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        progress(stage="Ingest", percent=lo, message=f"Reading {filename}")
+        for raw in ingest.iter_upload_frames(path, filename):
+            rows_read += len(raw)
+            df = _prepare_upload_frame(raw, tenant_id, customer_master, progress, dates)
+            # 6. Insert into database
+            progress(stage="Load", message=f"{filename}: {rows_read:,} rows processed")
+            upload.add(df)
+            if total:
+                progress(percent=lo + (hi - lo) * min(1.0, rows_read / total))
+            progress(stage="Ingest")
+    except Exception as e:
+        counts = upload.finish()
+        raise jobs.PartialFailure(
+            f"{filename}: {e} ({counts['inserted']:,} rows were inserted and {counts['skipped']:,} skipped as "
+            "already present before the failure; upload the file again to add the rest)",
+            {"rows_read": rows_read, **counts},
+        ) from e
+    return {"rows_read": rows_read, **upload.finish()}
 
-        # 1. Clean & Standardize
-        df = standardize(df)
-        df = _coalesce_state_region(df)
 
-        # 2. Enrich from customer master (STATE/CITY)
-        df = _merge_customer_master(df, tenant_id)
+def _upload_summary(files: list, tenant_id: str) -> dict:
+    return {
+        "files": files,
+        "rows_inserted": sum(f["rows_inserted"] for f in files),
+        "rows_skipped": sum(f["rows_skipped"] for f in files),
+        "tenant": tenant_id,
+    }
 
-        # 3. Enrich Dates
-        if "DATE" in df.columns:
-            df["DATE"] = pd.to_datetime(df["DATE"], errors='coerce')
-            df["FINANCIAL_YEAR"] = df["DATE"].apply(calculate_fy)
-            df["MONTH"] = df["DATE"].dt.strftime("%b-%y").str.upper()
 
-        if "CITY" not in df.columns: df["CITY"] = "City Not Found"
-        if "STATE" not in df.columns: df["STATE"] = STATE_PLACEHOLDER
+def _file_stats(filename: str, result: dict) -> dict:
+    return {
+        "filename": filename,
+        "rows_read": result["rows_read"],
+        "rows_inserted": result["inserted"],
+        "rows_skipped": result["skipped"],
+    }
 
-        # 4. Standardize material group names, then exclude non-sales rows (ETL rule)
-        df = _apply_material_mappings(df)
-        df = _exclude_material_groups(df)
 
-        # 5. Calculate taxes (IGST/CGST/SGST based on state)
-        df = calculate_taxes(df)
+def _upload_job(spooled: list, tenant_id: str, customer_master: bool = True, progress=_no_progress) -> dict:
+    """
+    Background job body for /upload and /v1/upload_batch: ingest each spooled (path, filename) in turn.
+    If a file fails, jobs.PartialFailure carries the files loaded so far and the failed file's committed counts.
+    """
+    files = []
+    try:
+        for i, (path, filename) in enumerate(spooled):
+            span = (100 * i / len(spooled), 100 * (i + 1) / len(spooled))
+            try:
+                result = _ingest_upload(path, filename, tenant_id, customer_master, progress, span)
+            except jobs.PartialFailure as e:
+                # Earlier files and the committed chunks of this one stay in the database: report them
+                files.append({**_file_stats(filename, e.result), "error": str(e)})
+                raise jobs.PartialFailure(str(e), _upload_summary(files, tenant_id)) from e.__cause__
+            if result["rows_read"] == 0 and len(spooled) == 1:
+                raise ValueError("Uploaded file is empty.")
+            files.append(_file_stats(filename, result))
+    finally:
+        for path, _ in spooled:
+            ingest.remove_spool(path)
+    return _upload_summary(files, tenant_id)
+
+
+def _transform_upload_file(path: str, filename: str, tenant_id: str, customer_master: bool = False):
+    """
+    Process-pool worker for batch uploads: one spooled file through the pipeline (chunked read), keyed per
+    file like a separate upload would be. Returns (rows_read, cleaned frame with LINE_KEY).
+    """
+    frames = []
+    dates = ingest.DateParser()
+    rows_read = 0
+    for raw in ingest.iter_upload_frames(path, filename):
+        rows_read += len(raw)
+        df = _prepare_upload_frame(raw, tenant_id, customer_master, parse_dates=dates)
+        if not df.empty:
+            frames.append(df)
+    if not frames:
+        return rows_read, pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    df[bulk_copy.LINE_KEY_COLUMN] = bulk_copy.line_keys(df)
+    return rows_read, df
+
+
+def _transform_upload_files(spooled: list, tenant_id: str, progress, customer_master: bool = False) -> list:
+    """(rows_read, frame) per spooled file, in order; parsed in parallel when the ingest process pool is on."""
+    pool = ingest.parse_pool(len(spooled))
+    if pool is None:
+        out = []
+        for i, (path, filename) in enumerate(spooled):
+            progress(stage="Transform", percent=80 * i / len(spooled), message=f"Parsing {filename}")
+            out.append(_transform_upload_file(path, filename, tenant_id, customer_master))
+        return out
+    progress(stage="Transform", message=f"Parsing {len(spooled)} files in parallel")
+    futures = {pool.submit(_transform_upload_file, path, filename, tenant_id, customer_master): i for i, (path, filename) in enumerate(spooled)}
+    out = [None] * len(spooled)
+    try:
+        for done, future in enumerate(as_completed(futures), start=1):
+            out[futures[future]] = future.result()
+            progress(percent=80 * done / len(spooled), message=f"{done} of {len(spooled)} files parsed")
+    finally:
+        # The workers hold a full API import each: release them as soon as the batch is parsed
+        pool.shutdown(wait=True, cancel_futures=True)
+    return out
 
-        # 6. Insert into database
-        from .db import update_database
-        rows_inserted = update_database(df, tenant_id)
 
-        return {"filename": file.filename, "rows_inserted": rows_inserted, "tenant": tenant_id}
+def _upload_batch_job(spooled: list, tenant_id: str, customer_master: bool = False, progress=_no_progress) -> dict:
+    """
+    Background job body for multi-file /v1/upload_batch: files are parsed/transformed concurrently, merged,
+    deduplicated across files (an overlapping line is loaded once), then loaded in one transaction with
+    one cache update. Returns per-file stats and totals. Holds the batch's cleaned rows in memory.
+    """
+    from .db import SalesUpload
+
+    try:
+        parsed = _transform_upload_files(spooled, tenant_id, progress, customer_master)
+    finally:
+        for path, _ in spooled:
+            ingest.remove_spool(path)
+
+    key = bulk_copy.LINE_KEY_COLUMN
+    frames = [df for _, df in parsed if not df.empty]
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    file_of_row = np.repeat(np.arange(len(parsed)), [len(df) for _, df in parsed])
+    inserted = set()
+    if not merged.empty:
+        first = ~merged[key].duplicated().to_numpy()
+        merged, file_of_row = merged[first], file_of_row[first]
+        progress(stage="Load", percent=85, message=f"Loading {len(merged):,} rows")
+        upload = SalesUpload(tenant_id)
+        try:
+            inserted = upload.add(merged)
+        finally:
+            upload.finish()
+
+    was_inserted = merged[key].isin(inserted).to_numpy() if inserted else np.zeros(len(file_of_row), dtype=bool)
+    files = []
+    for i, ((_, filename), (rows_read, df)) in enumerate(zip(spooled, parsed)):
+        n_inserted = int(was_inserted[file_of_row == i].sum())
+        files.append({
+            "filename": filename,
+            "rows_read": rows_read,
+            "rows_inserted": n_inserted,
+            "rows_skipped": len(df) - n_inserted,
+        })
+    return _upload_summary(files, tenant_id)
 
+
+async def _enqueue_upload(files: List[UploadFile], tenant_id: str, customer_master: bool = True, parallel: bool = False) -> dict:
+    """
+    Spool the files to disk (the request's copies go away with it) and queue the upload job.
+    parallel: several files go through _upload_batch_job; customer_master is applied there too (the pool
+    workers read it from Postgres). /v1/upload_batch passes customer_master=False, as it always has.
+    """
+    spooled = []
+    try:
+        for file in files:
+            spooled.append((await ingest.spool_upload(file), file.filename or "upload"))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
+        for path, _ in spooled:
+            ingest.remove_spool(path)
+        raise HTTPException(status_code=500, detail=f"Failed to receive file: {str(e)}")
+    names = [name for _, name in spooled]
+    if parallel and len(spooled) > 1:
+        job = jobs.submit("upload", tenant_id, _upload_batch_job, spooled, tenant_id, customer_master, filenames=names)
+    else:
+        job = jobs.submit("upload", tenant_id, _upload_job, spooled, tenant_id, customer_master, filenames=names)
+    return {"job_id": job.id, "status": job.status, "filename": names[0], "filenames": names, "tenant": tenant_id}
+
+
+@router.post("/upload", status_code=202)
+async def handle_data_upload(file: UploadFile = File(...), tenant_id: str = Form("default_elettro")):
+    """
+    Queue a sales file (CSV/Excel) for processing and return its job at once (202). Follow it with
+    GET /jobs/{job_id} or /jobs/{job_id}/events; the finished job's result has rows_inserted / rows_skipped.
+    """
+    return await _enqueue_upload([file], tenant_id)
+
+
+# ─── BACKGROUND JOBS ───
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """Status, stage (Ingest/Transform/Reference/Load/Done), percent and, once finished, result or error."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job.to_dict()
+
+
+async def _job_events(job: "jobs.Job"):
+    sent = -1
+    last_write = time.monotonic()
+    while True:
+        if job.version != sent:
+            sent = job.version
+            state = job.to_dict()
+            event = "done" if state["status"] in jobs.FINISHED else "progress"
+            yield f"event: {event}\ndata: {json.dumps(state)}\n\n"
+            last_write = time.monotonic()
+            if event == "done":
+                return
+        elif time.monotonic() - last_write > 15:
+            # Comment line keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            last_write = time.monotonic()
+        await asyncio.sleep(0.5)
+
+
+@router.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str):
+    """Server-Sent Events: a `progress` event per job update, then one `done` event with the final state."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return StreamingResponse(
+        _job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ─── Legacy Streamlit compatibility (v1) ───
 
-@router.get("/v1/data")
-def v1_data(tenant_id: str = Query("default_elettro")):
-    """Legacy Streamlit: return full tenant data as JSON list of records."""
-    df = get_tenant_data(tenant_id)
-    return serialize_df(df)
+def _encode_cursor(offset: int, version: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset, "v": version}).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, version: str) -> int:
+    """Row offset from a /v1/data cursor; 400 if malformed, 409 if the tenant data changed since it was issued."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset, cursor_version = int(state["o"]), str(state["v"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if cursor_version != version or offset < 0:
+        raise HTTPException(status_code=409, detail="Tenant data changed since this cursor was issued; restart without cursor.")
+    return offset
+
+
+def _ndjson_chunks(df: pd.DataFrame):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS].to_json(orient="records", lines=True, date_format="iso").rstrip("\n").encode("utf-8") + b"\n"
 
 
-@router.post("/v1/upload_batch")
+@router.get("/v1/data")
+def v1_data(
+    tenant_id: str = Query("default_elettro"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columns: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+):
+    """
+    Legacy Streamlit: tenant rows (DATE order) as a JSON list of records.
+    Optional: server-side date bounds; columns=DATE,AMOUNT,... projection (absent columns are skipped);
+    limit + cursor pagination (X-Next-Cursor response header while rows remain); stream=true for NDJSON.
+    """
+    if cursor or limit is not None:
+        # The version is a digest of the rows: refreshes and patches that change nothing keep cursors valid
+        df, version = get_tenant_data_versioned(tenant_id, start_date, end_date)
+    else:
+        df, version = get_tenant_data(tenant_id, start_date, end_date), ""
+    offset = _decode_cursor(cursor, version) if cursor else 0
+    if columns:
+        df = df[[c for c in parse_filter_list(columns) if c in df.columns]]
+    end = len(df) if limit is None else min(len(df), offset + limit)
+    page = df.iloc[offset:end]
+    headers = {}
+    if end < len(df):
+        headers["X-Next-Cursor"] = _encode_cursor(end, version)
+    if stream:
+        return StreamingResponse(_ndjson_chunks(page), media_type="application/x-ndjson", headers=headers)
+    response = json_bytes_response(records_json(page))
+    response.headers.update(headers)
+    return response
+
+
+@router.post("/v1/upload_batch", status_code=202)
 async def v1_upload_batch(files: List[UploadFile] = File(...), tenant_id: str = Form("default_elettro")):
-    """Legacy Streamlit: accept multiple files, process each like /upload; return last result."""
+    """
+    Legacy Streamlit: queue multiple files as one upload job; returns the job. Several files are parsed in
+    parallel and loaded together in one transaction; the result lists per-file stats.
+    """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided.")
-    last_result = None
-    for file in files:
-        try:
-            content = await file.read()
-            if file.filename and file.filename.endswith(".csv"):
-                df = pd.read_csv(io.BytesIO(content))
-            else:
-                df = pd.read_excel(io.BytesIO(content))
-            if df.empty:
-                continue
-            df = standardize(df)
-            df = _coalesce_state_region(df)
-            if "DATE" in df.columns:
-                df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce")
-                df["FINANCIAL_YEAR"] = df["DATE"].apply(calculate_fy)
-                df["MONTH"] = df["DATE"].dt.strftime("%b-%y").str.upper()
-            if "CITY" not in df.columns:
-                df["CITY"] = "City Not Found"
-            if "STATE" not in df.columns:
-                df["STATE"] = STATE_PLACEHOLDER
-            df = _apply_material_mappings(df)
-            df = _exclude_material_groups(df)
-            df = calculate_taxes(df)
-            from .db import update_database
-            rows = update_database(df, tenant_id)
-            last_result = {"filename": file.filename, "rows_inserted": rows, "tenant": tenant_id}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed on {file.filename}: {str(e)}")
-    return last_result or {"filename": None, "rows_inserted": 0, "tenant": tenant_id}
+    return await _enqueue_upload(files, tenant_id, customer_master=False, parallel=True)
 
 
 # ─── DATA QUALITY / HEALTH ───
@@ -617,9 +850,7 @@ def download_pdf_report(
 ):
     try:
         from .pdf_generator import generate_pdf_report, generate_dynamic_pdf_report, generate_distributor_strategy_pdf
-        df = get_tenant_data(tenant_id, start_date, end_date)
-        logging.info(f"REPORT: raw rows={len(df)}, cols={list(df.columns)[:10]}")
-        df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+        df = get_filtered_data(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
         logging.info(f"REPORT: after filters rows={len(df)}, report_type={report_type}, entity={specific_entity}, months={months}")
 
         if df.empty:
@@ -733,8 +964,7 @@ class DynamicReportRequest(BaseModel):
 def download_dynamic_report(req: DynamicReportRequest):
     try:
         from .pdf_generator import generate_dynamic_pdf_report
-        df = get_tenant_data(req.tenant_id, req.start_date, req.end_date)
-        df = apply_filters(df, req.states, req.cities, req.customers, req.material_groups, req.fiscal_years, req.months)
+        df = get_filtered_data(req.tenant_id, req.start_date, req.end_date, req.states, req.cities, req.customers, req.material_groups, req.fiscal_years, req.months)
         if df.empty:
             raise HTTPException(status_code=404, detail="No data for the selected filters and date range.")
 
@@ -788,31 +1018,40 @@ def handle_chat_query(req: ChatRequest):
 # ─── FILTER OPTIONS ───
 
 @router.get("/filters/options")
+@cached_result
 def get_filter_options(tenant_id: str = "default_elettro"):
     """Returns all unique filter values for the sidebar multi-selects."""
-    df = get_tenant_data(tenant_id)
-    if df.empty:
+    pushdown = get_sql_pushdown(tenant_id)
+    if pushdown is not None:
+        # Very large tenant: one SELECT DISTINCT scan instead of loading the rows
+        grp_col = _material_group_column(pushdown)
+        unique = pushdown.distinct_values(["STATE", "CITY", "CUSTOMER_NAME", grp_col, "FINANCIAL_YEAR", "MONTH"])
+        if grp_col in unique:
+            unique["MATERIAL_GROUP"] = unique.pop(grp_col)
+    else:
+        df = get_tenant_data(tenant_id)
+        grp_col = _material_group_column(df)
+        unique = {col: df[col].dropna().unique().tolist() for col in ("STATE", "CITY", "CUSTOMER_NAME", "FINANCIAL_YEAR", "MONTH") if col in df.columns}
+        if grp_col:
+            unique["MATERIAL_GROUP"] = df[grp_col].dropna().unique().tolist()
+    if not any(unique.values()):
         return {"states": [], "cities": [], "customers": [], "material_groups": [], "fiscal_years": [], "months": []}
 
     # Exclude "State Not Found" / "STATE NOT FOUND ⚠️" from filter options so only real states appear (no duplicate region placeholders)
-    raw_states = df["STATE"].dropna().unique().tolist() if "STATE" in df.columns else []
-    states = sorted([s for s in raw_states if str(s).strip() and "NOT FOUND" not in str(s).upper()])
-    cities = sorted([c for c in df["CITY"].dropna().unique().tolist() if "NOT FOUND" not in str(c).upper() and "UNKNOWN" not in str(c).upper()]) if "CITY" in df.columns else []
-    customers = sorted(df["CUSTOMER_NAME"].dropna().unique().tolist()) if "CUSTOMER_NAME" in df.columns else []
-    
-    grp_col = _material_group_column(df)
-    material_groups = sorted(df[grp_col].dropna().unique().tolist()) if grp_col else []
-    
-    fiscal_years = sorted(df["FINANCIAL_YEAR"].dropna().unique().tolist()) if "FINANCIAL_YEAR" in df.columns else []
+    states = sorted([s for s in unique.get("STATE", []) if str(s).strip() and "NOT FOUND" not in str(s).upper()])
+    cities = sorted([c for c in unique.get("CITY", []) if "NOT FOUND" not in str(c).upper() and "UNKNOWN" not in str(c).upper()])
+    customers = sorted(unique.get("CUSTOMER_NAME", []))
+    material_groups = sorted(unique.get("MATERIAL_GROUP", []))
+    fiscal_years = sorted(unique.get("FINANCIAL_YEAR", []))
     months = []
-    if "MONTH" in df.columns:
+    if unique.get("MONTH"):
         try:
-            unique_months = df["MONTH"].dropna().unique()
-            month_df = pd.DataFrame({"MONTH": unique_months})
+            # Pre-sorted so months that do not parse keep a stable order on both paths
+            month_df = pd.DataFrame({"MONTH": sorted(unique["MONTH"])})
             month_df["SortKey"] = pd.to_datetime(month_df["MONTH"], format="%b-%y", errors='coerce')
-            months = month_df.sort_values("SortKey")["MONTH"].tolist()
+            months = month_df.sort_values("SortKey", kind="stable")["MONTH"].tolist()
         except:
-            months = sorted(df["MONTH"].dropna().unique().tolist())
+            months = sorted(unique["MONTH"])
     
     return {
         "states": states,
@@ -939,7 +1178,6 @@ def build_distributor_vs_target_report(tenant_id: str, customer_name: str, year_
             "message": "No invoice rows in database for this month.",
         }
 
-    df[amt_col] = pd.to_numeric(df[amt_col], errors="coerce").fillna(0)
     dfc = df[df[cn].astype(str).str.strip() == customer_name.strip()]
     if dfc.empty:
         return {
@@ -972,7 +1210,7 @@ def build_distributor_vs_target_report(tenant_id: str, customer_name: str, year_
             "pct_of_target": round(pct_t, 1),
         })
     else:
-        mg = dfc.groupby(grp_col)[amt_col].sum()
+        mg = dfc.groupby(grp_col, observed=True)[amt_col].sum()
         for gname, aval in mg.items():
             aval = float(aval)
             share = (aval / cust_actual) if cust_actual > 0 else 0.0
@@ -1041,7 +1279,21 @@ def report_distributor_vs_target_pdf(
 
 # ─── DASHBOARD (single-call for faster load) ───
 
+def _kpi_totals(df, amt_col):
+    """(revenue, distinct invoices, distinct customers) over any rollup source."""
+    aggs = {}
+    if amt_col is not None:
+        aggs["revenue"] = (amt_col, "sum")
+    if "INVOICE_NO" in df.columns:
+        aggs["orders"] = ("INVOICE_NO", "nunique")
+    if "CUSTOMER_NAME" in df.columns:
+        aggs["customers"] = ("CUSTOMER_NAME", "nunique")
+    totals = aggregate(df, **aggs) if aggs else {}
+    return float(totals.get("revenue", 0.0)), int(totals.get("orders", 0)), int(totals.get("customers", 0))
+
+
 @router.get("/dashboard/summary")
+@cached_result
 def get_dashboard_summary(
     tenant_id: str = "default_elettro",
     start_date: Optional[str] = None,
@@ -1073,22 +1325,13 @@ def get_dashboard_summary(
             "message": msg,
         }
     try:
-        df = get_tenant_data(tenant_id, start_date, end_date)
-        df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
-        if df is None or not isinstance(df, pd.DataFrame) or df.empty:
+        # Filtered raw lines, a sales cube slice or (very large tenants) SQL aggregates — same rollup API
+        df = _analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+        if df is None or df.empty:
             return _empty("No rows in database for this tenant. Upload data from the Data page (Cloud Data Uploader).")
-        # Coerce numeric/date so DB string or tz-aware types never raise
+        # AMOUNT/DATE dtypes are guaranteed by the cached frame (float64 / naive datetime64)
         amt_col = next((c for c in df.columns if str(c).upper() == "AMOUNT"), None)
-        if amt_col is not None:
-            df[amt_col] = pd.to_numeric(df[amt_col], errors="coerce").fillna(0)
-        date_col_raw = next((c for c in df.columns if str(c).upper() == "DATE"), None)
-        if date_col_raw is not None:
-            df[date_col_raw] = pd.to_datetime(df[date_col_raw], errors="coerce")
-            if hasattr(df[date_col_raw].dtype, "tz") and df[date_col_raw].dtype.tz is not None:
-                df[date_col_raw] = df[date_col_raw].dt.tz_localize(None)
-        revenue = float(df[amt_col].sum()) if amt_col is not None else 0.0
-        orders = int(df["INVOICE_NO"].nunique()) if "INVOICE_NO" in df.columns else 0
-        cust_count = int(df["CUSTOMER_NAME"].nunique()) if "CUSTOMER_NAME" in df.columns else 0
+        revenue, orders, cust_count = _kpi_totals(df, amt_col)
         aov = revenue / orders if orders > 0 else 0
         summary = {"revenue": revenue, "orders": orders, "customers": cust_count, "average_order_value": aov}
 
@@ -1105,13 +1348,10 @@ def get_dashboard_summary(
                 prev_start = prev_end - delta
                 prev_start_str = prev_start.strftime("%Y-%m-%d")
                 prev_end_str = prev_end.strftime("%Y-%m-%d")
-                df_prev = get_tenant_data(tenant_id, prev_start_str, prev_end_str)
-                df_prev = apply_filters(df_prev, states, cities, customers, material_groups, fiscal_years, months)
+                df_prev = _analytics_source(tenant_id, prev_start_str, prev_end_str, states, cities, customers, material_groups, fiscal_years, months)
                 if not df_prev.empty:
                     _amt = next((c for c in df_prev.columns if str(c).upper() == "AMOUNT"), None)
-                    pr = float(df_prev[_amt].sum()) if _amt is not None else 0.0
-                    po = int(df_prev["INVOICE_NO"].nunique()) if "INVOICE_NO" in df_prev.columns else 0
-                    pc = int(df_prev["CUSTOMER_NAME"].nunique()) if "CUSTOMER_NAME" in df_prev.columns else 0
+                    pr, po, pc = _kpi_totals(df_prev, _amt)
                     paov = pr / po if po > 0 else 0
                     previous_summary = {"revenue": pr, "orders": po, "customers": pc, "average_order_value": paov}
                     rev_pct = ((revenue - pr) / pr * 100) if pr > 0 else 0
@@ -1145,36 +1385,12 @@ def get_dashboard_summary(
             goals["orders_target"] = eff_goal_ord
             goals["orders_achievement_pct"] = round(orders / eff_goal_ord * 100, 1)
 
-        trend = []
-        date_col, amount_col = _date_amount_columns(df)
-        if date_col and amount_col:
-            df_t = df.copy()
-            df_t[date_col] = pd.to_datetime(df_t[date_col], errors="coerce")
-            df_t = df_t.dropna(subset=[date_col])
-            if not df_t.empty:
-                t = df_t.groupby(pd.Grouper(key=date_col, freq="ME"))[amount_col].sum().reset_index()
-                t = t.rename(columns={date_col: "DATE", amount_col: "AMOUNT"})
-                t["DATE"] = t["DATE"].dt.strftime("%Y-%m")
-                trend = serialize_df(t.tail(trend_limit))
-        if not trend and amount_col:
-            month_col = next((c for c in df.columns if str(c).upper() == "MONTH"), None)
-            if month_col:
-                try:
-                    by_month = df.groupby(month_col)[amount_col].sum().reset_index()
-                    by_month = by_month.rename(columns={amount_col: "AMOUNT", month_col: "MONTH"})
-                    month_str = by_month["MONTH"].astype(str).str.strip()
-                    month_str = month_str.str[:3].str.title() + "-" + month_str.str[-2:]
-                    by_month["DATE"] = pd.to_datetime(month_str, format="%b-%y", errors="coerce")
-                    by_month = by_month.dropna(subset=["DATE"]).sort_values("DATE")
-                    by_month["DATE"] = by_month["DATE"].dt.strftime("%Y-%m")
-                    trend = serialize_df(by_month[["DATE", "AMOUNT"]].tail(trend_limit))
-                except Exception:
-                    pass
+        trend = _trend_records(df, trend_limit)
 
         grp_col = "ITEM_NAME_GROUP" if "ITEM_NAME_GROUP" in df.columns else "MATERIALGROUP"
         material_groups_list = []
         if grp_col in df.columns and amt_col is not None:
-            mg = df.groupby(grp_col)[amt_col].sum().sort_values(ascending=False).head(material_limit).reset_index()
+            mg = _top_amounts(df, grp_col, amt_col, material_limit)
             # Split total revenue target by each row's share of filtered sales (same logic for customers & materials)
             if eff_goal_rev is not None and eff_goal_rev > 0 and revenue > 0:
                 mg["SHARE_PCT"] = (mg[amt_col] / revenue * 100).round(2)
@@ -1185,7 +1401,7 @@ def get_dashboard_summary(
 
         top_customers_list = []
         if "CUSTOMER_NAME" in df.columns and amt_col is not None:
-            tc = df.groupby("CUSTOMER_NAME")[amt_col].sum().sort_values(ascending=False).head(top_customers_limit).reset_index()
+            tc = _top_amounts(df, "CUSTOMER_NAME", amt_col, top_customers_limit)
             if eff_goal_rev is not None and eff_goal_rev > 0 and revenue > 0:
                 tc["SHARE_PCT"] = (tc[amt_col] / revenue * 100).round(2)
                 tc["TARGET_REVENUE"] = (eff_goal_rev * tc[amt_col] / revenue).round(2)
@@ -1213,15 +1429,14 @@ def get_dashboard_summary(
 
 # ─── EXECUTIVE SUMMARY ───
 
-@router.get("/metrics/summary")
-def get_kpi_summary(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+def _summary_metrics(df):
     if df.empty:
         raise HTTPException(status_code=404, detail="No data found.")
-    revenue = float(df["AMOUNT"].sum()) if "AMOUNT" in df.columns else 0.0
-    orders = int(df["INVOICE_NO"].nunique()) if "INVOICE_NO" in df.columns else 0
-    customers = int(df["CUSTOMER_NAME"].nunique()) if "CUSTOMER_NAME" in df.columns else 0
+    aggs = {"revenue": ("AMOUNT", "sum"), "orders": ("INVOICE_NO", "nunique"), "customers": ("CUSTOMER_NAME", "nunique")}
+    totals = aggregate(df, **{name: agg for name, agg in aggs.items() if agg[0] in df.columns})
+    revenue = float(totals.get("revenue", 0.0))
+    orders = int(totals.get("orders", 0))
+    customers = int(totals.get("customers", 0))
     return {
         "revenue": revenue,
         "orders": orders,
@@ -1229,95 +1444,78 @@ def get_kpi_summary(tenant_id: str = "default_elettro", start_date: Optional[str
         "average_order_value": revenue / orders if orders > 0 else 0
     }
 
+@router.get("/metrics/summary")
+@cached_result
+def get_kpi_summary(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _summary_metrics(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months))
+
 @router.get("/charts/trend")
+@cached_result
 def get_sales_trend(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
-    amount_col = next((c for c in df.columns if str(c).upper() == "AMOUNT"), None)
-    date_col, _ = _date_amount_columns(df)
-    if not amount_col:
-        return []
-    out = []
-    if date_col:
-        df_t = df.copy()
-        df_t[date_col] = pd.to_datetime(df_t[date_col], errors="coerce")
-        df_t = df_t.dropna(subset=[date_col])
-        if not df_t.empty:
-            trend = df_t.groupby(pd.Grouper(key=date_col, freq="ME"))[amount_col].sum().reset_index()
-            trend = trend.rename(columns={date_col: "DATE", amount_col: "AMOUNT"})
-            trend["DATE"] = trend["DATE"].dt.strftime("%Y-%m")
-            return serialize_df(trend)
-    month_col = next((c for c in df.columns if str(c).upper() == "MONTH"), None)
-    if month_col:
-        try:
-            by_month = df.groupby(month_col)[amount_col].sum().reset_index()
-            by_month = by_month.rename(columns={amount_col: "AMOUNT", month_col: "MONTH"})
-            month_str = by_month["MONTH"].astype(str).str.strip()
-            month_str = month_str.str[:3].str.title() + "-" + month_str.str[-2:]
-            by_month["DATE"] = pd.to_datetime(month_str, format="%b-%y", errors="coerce")
-            by_month = by_month.dropna(subset=["DATE"]).sort_values("DATE")
-            by_month["DATE"] = by_month["DATE"].dt.strftime("%Y-%m")
-            return serialize_df(by_month[["DATE", "AMOUNT"]])
-        except Exception:
-            pass
-    return []
+    df = _analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
+    return _trend_records(df)
 
-@router.get("/charts/material-groups")
-def get_material_groups(tenant_id: str = "default_elettro", limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+def _material_group_records(df, limit: int = 10):
     grp_col = "ITEM_NAME_GROUP" if "ITEM_NAME_GROUP" in df.columns else "MATERIALGROUP"
     if df.empty or grp_col not in df.columns:
         return []
-    merged = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False).head(limit).reset_index()
+    merged = _top_amounts(df, grp_col, "AMOUNT", limit)
     return serialize_df(merged)
 
-@router.get("/charts/top-customers")
-def get_top_customers(tenant_id: str = "default_elettro", limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+@router.get("/charts/material-groups")
+@cached_result
+def get_material_groups(tenant_id: str = "default_elettro", limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _material_group_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months), limit)
+
+def _top_customer_records(df, limit: int = 10):
     if df.empty or "CUSTOMER_NAME" not in df.columns:
         return []
-    merged = df.groupby("CUSTOMER_NAME")["AMOUNT"].sum().sort_values(ascending=False).head(limit).reset_index()
+    merged = _top_amounts(df, "CUSTOMER_NAME", "AMOUNT", limit)
     return serialize_df(merged)
 
+@router.get("/charts/top-customers")
+@cached_result
+def get_top_customers(tenant_id: str = "default_elettro", limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _top_customer_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months), limit)
+
 # ─── SALES & GROWTH ───
 
-@router.get("/sales/monthly")
-def get_monthly_sales(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+def _monthly_records(df):
     if df.empty or "DATE" not in df.columns:
         return []
-    df["MONTH"] = df["DATE"].dt.to_period("M").astype(str)
-    monthly = df.groupby("MONTH").agg(
+    # Group by a derived key instead of overwriting MONTH: df is a read-only view of the tenant cache
+    monthly = rollup(
+        df, DateLabel("%Y-%m", "MONTH"),
         Revenue=("AMOUNT", "sum"),
         Orders=("INVOICE_NO", "nunique"),
         Customers=("CUSTOMER_NAME", "nunique")
     ).reset_index()
     return serialize_df(monthly)
 
-@router.get("/sales/daily")
-def get_daily_sales(tenant_id: str = "default_elettro", days: int = 30, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+@router.get("/sales/monthly")
+@cached_result
+def get_monthly_sales(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _monthly_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months))
+
+def _daily_records(df, days: int = 30):
     if df.empty or "DATE" not in df.columns:
         return []
-    df["DAY"] = df["DATE"].dt.strftime("%Y-%m-%d")
-    daily = df.groupby("DAY").agg(
+    daily = rollup(
+        df, DateLabel("%Y-%m-%d", "DAY"),
         Revenue=("AMOUNT", "sum"),
         Orders=("INVOICE_NO", "nunique")
     ).sort_index().tail(days).reset_index()
     return serialize_df(daily)
 
-@router.get("/sales/growth")
-def get_growth_metrics(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+@router.get("/sales/daily")
+@cached_result
+def get_daily_sales(tenant_id: str = "default_elettro", days: int = 30, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _daily_records(_lines_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months), days)
+
+def _growth_metrics(df):
     if df.empty or "DATE" not in df.columns:
         return {"mom_growth": 0, "current_month_rev": 0, "prev_month_rev": 0}
-    df["MONTH"] = df["DATE"].dt.to_period("M")
-    monthly = df.groupby("MONTH")["AMOUNT"].sum().sort_index()
+    monthly = rollup(df, DateLabel("%Y-%m", "MONTH"), AMOUNT=("AMOUNT", "sum"))["AMOUNT"].sort_index()
     if len(monthly) < 2:
         return {"mom_growth": 0, "current_month_rev": float(monthly.iloc[-1]) if len(monthly) > 0 else 0, "prev_month_rev": 0}
     curr = float(monthly.iloc[-1])
@@ -1325,35 +1523,43 @@ def get_growth_metrics(tenant_id: str = "default_elettro", start_date: Optional[
     growth = ((curr - prev) / prev * 100) if prev > 0 else 0
     return {"mom_growth": round(growth, 1), "current_month_rev": curr, "prev_month_rev": prev}
 
+@router.get("/sales/growth")
+@cached_result
+def get_growth_metrics(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _growth_metrics(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months))
+
 # ─── CUSTOMER INTELLIGENCE ───
 
-@router.get("/customers/all")
-def get_all_customers(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+def _customer_records(df) -> bytes:
     if df.empty or "CUSTOMER_NAME" not in df.columns:
-        return []
-    cust = df.groupby("CUSTOMER_NAME").agg(
+        return records_json(None)
+    cust = rollup(
+        df, "CUSTOMER_NAME",
         Revenue=("AMOUNT", "sum"),
         Orders=("INVOICE_NO", "nunique"),
         AvgOrder=("AMOUNT", "mean"),
         LastOrder=("DATE", "max")
     ).sort_values("Revenue", ascending=False).reset_index()
     cust["LastOrder"] = cust["LastOrder"].dt.strftime("%Y-%m-%d")
-    return serialize_df(cust)
+    return records_json(cust)
 
-@router.get("/customers/rfm")
-def get_rfm_segments(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+@router.get("/customers/all")
+@cached_result
+def get_all_customers(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return json_bytes_response(_customer_records(_lines_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)))
+
+def _rfm_records(df) -> bytes:
     if df.empty or "CUSTOMER_NAME" not in df.columns or "DATE" not in df.columns:
-        return []
-    max_date = df["DATE"].max()
-    rfm = df.groupby("CUSTOMER_NAME").agg(
-        Recency=("DATE", lambda x: (max_date - x.max()).days),
+        return records_json(None)
+    max_date = aggregate(df, max_date=("DATE", "max"))["max_date"]
+    rfm = rollup(
+        df, "CUSTOMER_NAME",
+        LastOrder=("DATE", "max"),
         Frequency=("INVOICE_NO", "nunique"),
         Monetary=("AMOUNT", "sum")
-    ).reset_index()
+    )
+    rfm.insert(0, "Recency", (max_date - rfm.pop("LastOrder")).dt.days)
+    rfm = rfm.reset_index()
     # Simple scoring
     for col in ["Recency", "Frequency", "Monetary"]:
         rfm[f"{col}_Score"] = pd.qcut(rfm[col], q=4, labels=[4,3,2,1] if col == "Recency" else [1,2,3,4], duplicates="drop").astype(int)
@@ -1365,25 +1571,30 @@ def get_rfm_segments(tenant_id: str = "default_elettro", start_date: Optional[st
         elif score >= 4: return "At Risk"
         else: return "Lost"
     rfm["Segment"] = rfm["RFM_Score"].apply(segment)
-    return serialize_df(rfm[["CUSTOMER_NAME", "Recency", "Frequency", "Monetary", "Segment"]])
+    return records_json(rfm[["CUSTOMER_NAME", "Recency", "Frequency", "Monetary", "Segment"]])
+
+@router.get("/customers/rfm")
+@cached_result
+def get_rfm_segments(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return json_bytes_response(_rfm_records(_lines_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)))
 
 # ─── GEOGRAPHIC ───
 
-@router.get("/geographic/states")
-def get_state_data(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+def _state_records(df):
     if df.empty or "STATE" not in df.columns:
         return []
-    # Exclude placeholder so map/region only show real states (avoids "no state found" / duplicate region)
-    df = df[~df["STATE"].astype(str).str.upper().str.contains("NOT FOUND", na=False)]
-    if df.empty:
-        return []
-    state = df.groupby("STATE").agg(
+    state = rollup(
+        df, "STATE",
         Revenue=("AMOUNT", "sum"),
         Orders=("INVOICE_NO", "nunique"),
         Customers=("CUSTOMER_NAME", "nunique")
-    ).sort_values("Revenue", ascending=False).reset_index()
+    )
+    # Exclude placeholder so map/region only show real states (avoids "no state found" / duplicate region).
+    # The test is on the group key itself, so dropping groups equals dropping their rows first.
+    state = state[~state.index.astype(str).str.upper().str.contains("NOT FOUND", na=False)]
+    if state.empty:
+        return []
+    state = state.sort_values("Revenue", ascending=False).reset_index()
     
     # Add market share
     total_rev = state["Revenue"].sum()
@@ -1403,29 +1614,35 @@ def get_state_data(tenant_id: str = "default_elettro", start_date: Optional[str]
     
     return serialize_df(state)
 
-@router.get("/geographic/cities")
-def get_city_data(tenant_id: str = "default_elettro", limit: int = 20, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+@router.get("/geographic/states")
+@cached_result
+def get_state_data(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _state_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months))
+
+def _city_records(df, limit: int = 20):
     col = "CITY" if "CITY" in df.columns else "STATE"
     if df.empty or col not in df.columns:
         return []
-    city = df.groupby(col).agg(
+    city = rollup(
+        df, col,
         Revenue=("AMOUNT", "sum"),
         Customers=("CUSTOMER_NAME", "nunique")
     ).sort_values("Revenue", ascending=False).head(limit).reset_index()
     return serialize_df(city)
 
+@router.get("/geographic/cities")
+@cached_result
+def get_city_data(tenant_id: str = "default_elettro", limit: int = 20, start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _city_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months), limit)
+
 # ─── MATERIAL PERFORMANCE ───
 
-@router.get("/materials/performance")
-def get_material_performance(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+def _material_performance_records(df):
     grp_col = "ITEM_NAME_GROUP" if "ITEM_NAME_GROUP" in df.columns else "MATERIALGROUP"
     if df.empty or grp_col not in df.columns:
         return []
-    perf = df.groupby(grp_col).agg(
+    perf = rollup(
+        df, grp_col,
         Revenue=("AMOUNT", "sum"),
         Orders=("INVOICE_NO", "nunique"),
         Customers=("CUSTOMER_NAME", "nunique"),
@@ -1436,23 +1653,127 @@ def get_material_performance(tenant_id: str = "default_elettro", start_date: Opt
     perf["CumulativeShare"] = perf["Share"].cumsum().round(1)
     return serialize_df(perf)
 
-@router.get("/materials/pareto")
-def get_pareto_data(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+@router.get("/materials/performance")
+@cached_result
+def get_material_performance(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _material_performance_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months))
+
+def _pareto_records(df):
     grp_col = "ITEM_NAME_GROUP" if "ITEM_NAME_GROUP" in df.columns else "MATERIALGROUP"
     if df.empty or grp_col not in df.columns:
         return []
-    pareto = df.groupby(grp_col)["AMOUNT"].sum().sort_values(ascending=False).reset_index()
+    pareto = rollup(df, grp_col, AMOUNT=("AMOUNT", "sum"))["AMOUNT"].sort_values(ascending=False).reset_index()
     total = pareto["AMOUNT"].sum()
     pareto["Percentage"] = (pareto["AMOUNT"] / total * 100).round(1)
     pareto["Cumulative"] = pareto["Percentage"].cumsum().round(1)
     pareto["Class"] = pareto["Cumulative"].apply(lambda x: "A" if x <= 80 else ("B" if x <= 95 else "C"))
     return serialize_df(pareto)
 
+@router.get("/materials/pareto")
+@cached_result
+def get_pareto_data(tenant_id: str = "default_elettro", start_date: Optional[str] = None, end_date: Optional[str] = None, states: Optional[str] = None, cities: Optional[str] = None, customers: Optional[str] = None, material_groups: Optional[str] = None, fiscal_years: Optional[str] = None, months: Optional[str] = None):
+    return _pareto_records(_analytics_source(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months))
+# ─── BATCH QUERY (one filter spec, many widgets) ───
+
+# Widget name -> (selection source, payload builder, default options). Same payloads as the GET endpoints.
+BATCH_WIDGETS = {
+    "kpis": ("analytics_source", _summary_metrics, {}),
+    "trend": ("analytics_source", _trend_records, {}),
+    "material_groups": ("analytics_source", _material_group_records, {"limit": 10}),
+    "top_customers": ("analytics_source", _top_customer_records, {"limit": 10}),
+    "monthly": ("analytics_source", _monthly_records, {}),
+    "daily": ("lines_source", _daily_records, {"days": 30}),
+    "growth": ("analytics_source", _growth_metrics, {}),
+    "customers": ("lines_source", _customer_records, {}),
+    "rfm": ("lines_source", _rfm_records, {}),
+    "states": ("analytics_source", _state_records, {}),
+    "cities": ("analytics_source", _city_records, {"limit": 20}),
+    "materials": ("analytics_source", _material_performance_records, {}),
+    "pareto": ("analytics_source", _pareto_records, {}),
+}
+
+
+class BatchWidget(BaseModel):
+    name: str
+    limit: Optional[int] = None
+    days: Optional[int] = None
+
+
+class BatchQueryRequest(BaseModel):
+    tenant_id: str = "default_elettro"
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    states: Optional[str] = None
+    cities: Optional[str] = None
+    customers: Optional[str] = None
+    material_groups: Optional[str] = None
+    fiscal_years: Optional[str] = None
+    months: Optional[str] = None
+    # Widget names, or {"name", "limit"/"days"} to override a widget's default option
+    widgets: List[Union[str, BatchWidget]]
+    # true: NDJSON, one {"widget", "data"|"error"} line per widget as soon as it is computed
+    stream: bool = False
+
+
+def _json_fragment(value) -> bytes:
+    """Widget payloads may already be encoded (records_json); everything else is encoded here."""
+    if isinstance(value, bytes):
+        return value
+    return json.dumps(value, default=str).encode("utf-8")
+
+
+def _run_widget(selection: TenantSelection, widget: BatchWidget):
+    """(payload, None) or (None, error message) for one widget over the shared selection."""
+    source, build, defaults = BATCH_WIDGETS[widget.name]
+    options = {k: v for k, v in {**defaults, "limit": widget.limit, "days": widget.days}.items() if k in defaults and v is not None}
+    try:
+        return build(getattr(selection, source), **options), None
+    except HTTPException as e:
+        return None, str(e.detail)
+    except Exception as e:
+        logging.exception("query/batch: widget %s failed: %s", widget.name, e)
+        return None, str(e) or "Unknown error"
+
+
+@router.post("/query/batch")
+def query_batch(req: BatchQueryRequest):
+    """
+    Several dashboard widgets for one filter set in one call: the tenant is filtered once and every widget
+    aggregates that selection. Response: {"results": {widget: payload}, "errors": {widget: message}}.
+    """
+    if response_format() == "arrow":
+        raise HTTPException(status_code=400, detail="format=arrow is only available on single-table endpoints; use format=columnar")
+    widgets = [BatchWidget(name=w) if isinstance(w, str) else w for w in req.widgets]
+    unknown = sorted({w.name for w in widgets if w.name not in BATCH_WIDGETS})
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown widgets {unknown}; available: {sorted(BATCH_WIDGETS)}")
+    selection = TenantSelection(
+        req.tenant_id, req.start_date, req.end_date, states=req.states, cities=req.cities, customers=req.customers,
+        material_groups=req.material_groups, fiscal_years=req.fiscal_years, months=req.months,
+    )
+    if req.stream:
+        def lines():
+            for w in widgets:
+                data, error = _run_widget(selection, w)
+                if error is not None:
+                    yield _json_fragment({"widget": w.name, "error": error}) + b"\n"
+                else:
+                    yield b'{"widget":' + _json_fragment(w.name) + b',"data":' + _json_fragment(data) + b"}\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    results, errors = {}, {}
+    for w in widgets:
+        data, error = _run_widget(selection, w)
+        if error is not None:
+            errors[w.name] = error
+        else:
+            results[w.name] = _json_fragment(data)
+    members = b",".join(_json_fragment(name) + b":" + data for name, data in results.items())
+    return json_bytes_response(b'{"results":{' + members + b'},"errors":' + _json_fragment(errors) + b"}")
+
 # ─── REPORTS API ───
 
 @router.get("/reports/item-details")
+@cached_result
 def get_item_details(
     tenant_id: str = "default_elettro", 
     start_date: Optional[str] = None, 
@@ -1464,8 +1785,7 @@ def get_item_details(
     fiscal_years: Optional[str] = None, 
     months: Optional[str] = None
 ):
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+    df = get_filtered_data(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
     
     if df.empty:
         return []
@@ -1485,7 +1805,7 @@ def get_item_details(
     if qty_col:
         aggs[qty_col] = "sum"
         
-    items = df.groupby([item_col, grp_col]).agg(aggs).reset_index()
+    items = df.groupby([item_col, grp_col], observed=True).agg(aggs).reset_index()
     
     items.rename(columns={
         item_col: "Item",
@@ -1499,11 +1819,61 @@ def get_item_details(
     else:
         items["Quantity"] = 0
         
-    return serialize_df(items.sort_values("Revenue", ascending=False))
+    return json_bytes_response(records_json(items.sort_values("Revenue", ascending=False)))
 
 
 # ─── DATA EXPORT ───
 
+# Rows per CSV chunk / Parquet row group: bounds the extra memory of an export to one chunk
+EXPORT_CHUNK_ROWS = 50_000
+
+
+def _csv_chunks(df: pd.DataFrame):
+    """CSV in row chunks (UTF-8 with BOM for Excel), same text as df.to_csv(index=False)."""
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(index=False, header=start == 0)
+        yield chunk.encode("utf-8-sig" if start == 0 else "utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object collecting what ParquetWriter has flushed so far."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.size
+
+    def drain(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts = []
+        return out
+
+
+def _parquet_chunks(df: pd.DataFrame):
+    """zstd-compressed Parquet, one row group per chunk, yielded as each row group is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+            chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
 @router.get("/export/data")
 def export_filtered_data(
     tenant_id: str = "default_elettro",
@@ -1515,25 +1885,30 @@ def export_filtered_data(
     material_groups: Optional[str] = None,
     fiscal_years: Optional[str] = None, 
     months: Optional[str] = None,
+    format: str = "csv",
 ):
     """
-    Export the currently filtered dataset as CSV for use by the frontend Export Data button.
+    Export the currently filtered dataset as CSV (default) or Parquet (format=parquet, needs pyarrow)
+    for use by the frontend Export Data button. Streamed in row chunks, so the response starts at once
+    and memory stays at one chunk beyond the filtered frame.
     """
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, cities, customers, material_groups, fiscal_years, months)
+    fmt = (format or "csv").strip().lower()
+    if fmt not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export needs pyarrow on the server; use format=csv.")
 
-    if df.empty:
-        # Return a valid but empty CSV so the download still works
-        csv_bytes = "".encode("utf-8")
-    else:
-        csv_bytes = df.to_csv(index=False).encode("utf-8-sig")
+    df = get_filtered_data(tenant_id, start_date, end_date, states, cities, customers, material_groups, fiscal_years, months)
 
-    filename = f"ELETTRO_Export_{tenant_id}.csv"
-    return Response(
-        content=csv_bytes,
-        media_type="text/csv",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    filename = f"ELETTRO_Export_{tenant_id}.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if fmt == "parquet":
+        return StreamingResponse(_parquet_chunks(df), media_type="application/vnd.apache.parquet", headers=headers)
+    # Empty selection: a valid but empty CSV so the download still works
+    return StreamingResponse(_csv_chunks(df), media_type="text/csv", headers=headers)
 
 
 # ─── INTEGRATIONS (stubs: email, Slack, BI) ───
@@ -1557,6 +1932,7 @@ def email_report_stub(req: EmailReportRequest):
 # ─── ANOMALIES (for alerts / AI) ───
 
 @router.get("/analytics/anomalies")
+@cached_result
 def get_anomalies(
     tenant_id: str = "default_elettro",
     start_date: Optional[str] = None,
@@ -1569,8 +1945,7 @@ def get_anomalies(
     drop_threshold_pct: float = 20.0,
 ):
     """Returns customers or entities with revenue drop vs previous period (for alerts / dashboard)."""
-    df = get_tenant_data(tenant_id, start_date, end_date)
-    df = apply_filters(df, states, None, customers, material_groups, fiscal_years, months)
+    df = get_filtered_data(tenant_id, start_date, end_date, states, None, customers, material_groups, fiscal_years, months)
     if df.empty or "CUSTOMER_NAME" not in df.columns or "DATE" not in df.columns:
         return {"anomalies": [], "period": "current"}
 
@@ -1583,16 +1958,15 @@ def get_anomalies(
         delta = end_dt - start_dt
         prev_end = start_dt - pd.Timedelta(days=1)
         prev_start = prev_end - delta
-        df_prev = get_tenant_data(tenant_id, prev_start.strftime("%Y-%m-%d"), prev_end.strftime("%Y-%m-%d"))
-        df_prev = apply_filters(df_prev, states, None, customers, material_groups, fiscal_years, months)
+        df_prev = get_filtered_data(tenant_id, prev_start.strftime("%Y-%m-%d"), prev_end.strftime("%Y-%m-%d"), states, None, customers, material_groups, fiscal_years, months)
     except Exception:
         return {"anomalies": [], "period": "current"}
 
     if df_prev.empty:
         return {"anomalies": [], "period": "current"}
 
-    cur = df.groupby("CUSTOMER_NAME")["AMOUNT"].sum()
-    prev = df_prev.groupby("CUSTOMER_NAME")["AMOUNT"].sum()
+    cur = df.groupby("CUSTOMER_NAME", observed=True)["AMOUNT"].sum()
+    prev = df_prev.groupby("CUSTOMER_NAME", observed=True)["AMOUNT"].sum()
     common = cur.index.intersection(prev.index)
     anomalies = []
     for c in common:
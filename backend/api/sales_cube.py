@@ -0,0 +1,221 @@
+"""
+Pre-aggregated sales cube for the analytics endpoints.
+
+One cell per (month, FINANCIAL_YEAR, MONTH, state, city, customer, material group) present in the tenant
+frame, holding sum(AMOUNT), sum(QTY) and the line count. Distinct invoices are kept as an exact
+(cell, invoice) set so order counts merge across cells without approximation. Cells carry the same
+categorical dimension columns as the raw frame, so the FilterIndex and the routes' groupby code run on
+them unchanged — a filtered rollup touches ~10^4 cells instead of ~10^6 lines.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .filter_index import FilterIndex, material_group_column
+
+CUBE_DIMENSIONS = ["FINANCIAL_YEAR", "MONTH", "STATE", "CITY", "CUSTOMER_NAME", "ITEM_NAME_GROUP", "MATERIALGROUP"]
+INVOICE_COLUMN = "INVOICE_NO"
+
+
+def _codes(series: pd.Series) -> np.ndarray:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64)
+    return pd.factorize(series)[0].astype(np.int64)
+
+
+class SalesCube:
+    """Cells of a DATE-sorted, normalized tenant frame (see db._normalize_tenant_frame)."""
+
+    def __init__(self, df: pd.DataFrame):
+        dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+        grp_col = material_group_column(df)
+        if grp_col is not None and grp_col not in dims:
+            dims.append(grp_col)
+        # Month bucket; NaT stays NaT so undated lines keep their own cells
+        month = df["DATE"].to_numpy().astype("datetime64[M]").astype("datetime64[ns]")
+
+        # Cell id per line: fold the dimension codes into one key, re-factorizing to keep it compact
+        key = pd.factorize(month, use_na_sentinel=False)[0].astype(np.int64)
+        for col in dims:
+            codes = _codes(df[col]) + 1
+            key = pd.factorize(key * (int(codes.max()) + 1) + codes)[0].astype(np.int64)
+        n_cells = int(key.max()) + 1 if len(key) else 0
+        first = np.zeros(n_cells, dtype=np.int64)
+        first[key[::-1]] = np.arange(len(key) - 1, -1, -1)
+
+        cells = df.iloc[first][dims].reset_index(drop=True)
+        cells.insert(0, "DATE", month[first])
+        cells["AMOUNT"] = np.bincount(key, weights=df["AMOUNT"].to_numpy(dtype="float64"), minlength=n_cells)
+        if "QTY" in df.columns:
+            qty = pd.to_numeric(df["QTY"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+            cells["QTY"] = np.bincount(key, weights=qty, minlength=n_cells)
+        cells["LINES"] = np.bincount(key, minlength=n_cells)
+
+        # Same layout as the raw cache: DATE order (NaT last) so month ranges are contiguous slices
+        order = np.argsort(cells["DATE"].to_numpy(), kind="stable")
+        cells = cells.iloc[order].reset_index(drop=True)
+        cells.attrs["sorted_by"] = "DATE"
+        rank = np.empty(n_cells, dtype=np.int64)
+        rank[order] = np.arange(n_cells)
+        key = rank[key]
+
+        self.cells = cells
+        self.index = FilterIndex(cells)
+        self.dimensions = dims
+
+        # Exact distinct (cell, invoice) pairs, CSR by cell
+        self.has_invoices = INVOICE_COLUMN in df.columns
+        self._inv_offsets = np.zeros(n_cells + 1, dtype=np.int64)
+        self._inv_codes = np.empty(0, dtype=np.int64)
+        self._n_invoices = 1
+        if self.has_invoices:
+            inv = _codes(df[INVOICE_COLUMN])
+            self._n_invoices = max(int(inv.max()) + 1, 1)
+            valid = inv >= 0
+            pairs = np.unique(key[valid] * self._n_invoices + inv[valid])
+            self._inv_codes = pairs % self._n_invoices
+            self._inv_offsets[1:] = np.cumsum(np.bincount(pairs // self._n_invoices, minlength=n_cells))
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def slice(self, lo: int = 0, hi: Optional[int] = None, **filters) -> "CubeSlice":
+        """Cells inside the cell range [lo, hi) matching the dashboard filters."""
+        hi = len(self.cells) if hi is None else hi
+        rows = self.index.select(lo, hi, **filters)
+        cell_ids = np.arange(lo, hi) if rows is None else rows
+        return CubeSlice(self, cell_ids)
+
+    def invoices(self, cell_ids: np.ndarray):
+        """(owner, invoice_code) for every distinct invoice of the given cells; owner indexes cell_ids."""
+        if len(cell_ids) == len(self.cells):
+            # Whole cube: the pair list is already in cell order
+            counts = np.diff(self._inv_offsets)
+            return np.repeat(np.arange(len(counts)), counts), self._inv_codes
+        starts = self._inv_offsets[cell_ids]
+        counts = self._inv_offsets[cell_ids + 1] - starts
+        owner = np.repeat(np.arange(len(cell_ids)), counts)
+        pos = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        return owner, self._inv_codes[pos]
+
+
+class CubeSlice:
+    """
+    Filtered set of cube cells. Reads like the filtered raw frame for what the analytics routes need:
+    .empty, .columns, column access, boolean-mask selection; aggregate through rollup()/distinct_count().
+    """
+
+    def __init__(self, cube: SalesCube, cell_ids: np.ndarray):
+        self.cube = cube
+        self.cell_ids = np.asarray(cell_ids, dtype=np.int64)
+        self.cells = cube.cells.iloc[self.cell_ids]
+
+    @property
+    def empty(self) -> bool:
+        return len(self.cell_ids) == 0
+
+    @property
+    def columns(self) -> pd.Index:
+        extra = [INVOICE_COLUMN] if self.cube.has_invoices else []
+        return self.cells.columns.drop("LINES").append(pd.Index(extra))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.cells[key]
+        mask = np.asarray(key, dtype=bool)
+        return CubeSlice(self.cube, self.cell_ids[mask])
+
+    def distinct_invoices(self, group_ids: Optional[np.ndarray] = None, n_groups: int = 1) -> np.ndarray:
+        """Distinct invoice count per group (group_ids: group per cell, -1 = dropped)."""
+        owner, inv = self.cube.invoices(self.cell_ids)
+        if group_ids is None:
+            seen = np.zeros(self.cube._n_invoices, dtype=bool)
+            seen[inv] = True
+            return np.array([int(seen.sum())])
+        gid = np.asarray(group_ids)[owner]
+        keep = gid >= 0
+        # Hash-based distinct (pd.unique) — no sort over the pair list
+        pairs = pd.unique(gid[keep] * self.cube._n_invoices + inv[keep])
+        return np.bincount(pairs // self.cube._n_invoices, minlength=n_groups)
+
+    def aggregate(self, **aggs) -> dict:
+        """Grand totals over the slice, aggs as (column, "sum"|"nunique")."""
+        out = {}
+        for name, (col, how) in aggs.items():
+            if how == "sum" and col in ("AMOUNT", "QTY"):
+                out[name] = self.cells[col].sum()
+            elif how == "nunique" and (col == INVOICE_COLUMN or col in self.cube.dimensions):
+                out[name] = distinct_count(self, col)
+            else:
+                raise ValueError(f"SalesCube cannot aggregate {col!r} with {how!r}")
+        return out
+
+    def rollup(self, by, **aggs) -> pd.DataFrame:
+        """groupby(by, observed=True).agg(**aggs) over the cells; aggs as (column, "sum"|"mean"|"nunique"|"size")."""
+        grouped = self.cells.groupby(by, observed=True)
+        out = {}
+        sums = None
+        gid = None
+        for name, (col, how) in aggs.items():
+            if how == "sum" and col in ("AMOUNT", "QTY"):
+                out[name] = grouped[col].sum()
+            elif how == "mean" and col == "AMOUNT":
+                # AMOUNT is NaN-free in the normalized frame, so mean = sum / lines
+                sums = grouped[["AMOUNT", "LINES"]].sum() if sums is None else sums
+                out[name] = sums["AMOUNT"] / sums["LINES"]
+            elif how == "size":
+                out[name] = grouped["LINES"].sum()
+            elif how == "nunique" and col == INVOICE_COLUMN:
+                if gid is None:
+                    gid = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+                index = grouped.size().index
+                out[name] = pd.Series(self.distinct_invoices(gid, len(index)), index=index)
+            elif how == "nunique" and col in self.cube.dimensions:
+                out[name] = grouped[col].nunique()
+            else:
+                raise ValueError(f"SalesCube cannot aggregate {col!r} with {how!r}")
+        return pd.DataFrame(out)
+
+
+class DateLabel:
+    """
+    rollup() key: DATE formatted with strftime(fmt), as the index `name`; undated lines are left out.
+    Month formats are exact on cube cells too (cells are monthly).
+    """
+
+    def __init__(self, fmt: str, name: str):
+        self.fmt = fmt
+        self.name = name
+
+    def labels(self, src) -> pd.Series:
+        """Per-row key over a raw frame or a CubeSlice."""
+        return src["DATE"].dt.strftime(self.fmt).rename(self.name)
+
+
+def rollup(src, by, **aggs) -> pd.DataFrame:
+    """
+    Named aggregation over a filtered raw frame, a CubeSlice or a sql_pushdown.SqlAggregates (same result).
+    Anything with its own rollup()/aggregate() is treated as a pre-aggregated source.
+    """
+    if isinstance(by, DateLabel) and isinstance(src, (pd.DataFrame, CubeSlice)):
+        by = by.labels(src)
+    if hasattr(src, "rollup"):
+        return src.rollup(by, **aggs)
+    return src.groupby(by, observed=True).agg(**aggs)
+
+
+def aggregate(src, **aggs) -> dict:
+    """Grand totals as {name: value}, aggs as (column, "sum"|"nunique"|"max")."""
+    if hasattr(src, "aggregate") and not isinstance(src, pd.DataFrame):
+        return src.aggregate(**aggs)
+    return {name: src[col].agg(how) for name, (col, how) in aggs.items()}
+
+
+def distinct_count(src, column: str) -> int:
+    """nunique() of a column over either a filtered raw frame or a CubeSlice."""
+    if isinstance(src, CubeSlice):
+        if column == INVOICE_COLUMN:
+            return int(src.distinct_invoices().sum()) if not src.empty else 0
+        return int(src.cells[column].nunique())
+    return int(src[column].nunique())
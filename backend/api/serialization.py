@@ -0,0 +1,114 @@
+"""
+DataFrame -> response encoding shared by every route.
+
+Tables are encoded straight from the NumPy columns with to_json (NaN/inf/NaT -> null, ISO datetimes).
+The shape follows the request's `format` query parameter, read once per request by FormatRoute:
+  records  (default)  [{col: value, ...}, ...]
+  columnar            {"columns": [...], "data": {col: [...]}} — each key once instead of once per row
+  arrow               Arrow IPC stream (application/vnd.apache.arrow.stream) for endpoints that return a
+                      single table via json_bytes_response; pyarrow is in requirements.txt, without it (local
+                      installs) arrow falls back to columnar JSON.
+Tables nested inside a larger JSON object use columnar when arrow is requested.
+"""
+import io
+import json
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+import pandas as pd
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+FORMATS = ("records", "columnar", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+_response_format = ContextVar("response_format", default="records")
+
+
+def response_format() -> str:
+    return _response_format.get()
+
+
+class ArrowIPC(bytes):
+    """Encoded Arrow stream (as opposed to JSON bytes) — json_bytes_response picks the media type from it."""
+
+
+def _columnar_json(df: pd.DataFrame) -> bytes:
+    columns = [str(c) for c in df.columns]
+    parts = [
+        json.dumps(name).encode("utf-8") + b":" + df[col].to_json(orient="values", date_format="iso").encode("utf-8")
+        for name, col in zip(columns, df.columns)
+    ]
+    return b'{"columns":' + json.dumps(columns).encode("utf-8") + b',"data":{' + b",".join(parts) + b"}}"
+
+
+def _arrow_ipc(df: pd.DataFrame):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return ArrowIPC(sink.getvalue())
+    except Exception as e:
+        logging.warning("arrow encoding failed, sending columnar JSON: %s", e)
+        return None
+
+
+def _empty(fmt: str) -> bytes:
+    return b'{"columns":[],"data":{}}' if fmt != "records" else b"[]"
+
+
+def records_json(df: pd.DataFrame, fmt: Optional[str] = None) -> bytes:
+    """
+    Encode a table in one pass over its columns, in the request's format (see module doc).
+    Returns the empty table on error to avoid 500s.
+    """
+    fmt = fmt or response_format()
+    if df is None or df.empty:
+        return _empty(fmt)
+    try:
+        if fmt == "arrow":
+            encoded = _arrow_ipc(df)
+            if encoded is not None:
+                return encoded
+            fmt = "columnar"
+        if fmt == "columnar":
+            return _columnar_json(df)
+        return df.to_json(orient="records", date_format="iso").encode("utf-8")
+    except Exception:
+        return _empty(fmt)
+
+
+def json_bytes_response(content: bytes) -> Response:
+    """Pre-encoded table (records_json) returned as-is, skipping FastAPI's re-encoding."""
+    media_type = ARROW_MEDIA_TYPE if isinstance(content, ArrowIPC) else "application/json"
+    return Response(content=content, media_type=media_type)
+
+
+def serialize_df(df: pd.DataFrame):
+    """Table as Python objects, for payloads nested in a larger JSON response. Empty table on error."""
+    fmt = "columnar" if response_format() == "arrow" else response_format()
+    try:
+        return json.loads(records_json(df, fmt))
+    except Exception:
+        return json.loads(_empty(fmt))
+
+
+class FormatRoute(APIRoute):
+    """Reads ?format=records|columnar|arrow for the duration of the request (unknown values = records)."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def format_handler(request: Request) -> Response:
+            fmt = request.query_params.get("format", "records").strip().lower()
+            # Each request runs in its own task context; left set so streamed bodies see it too
+            _response_format.set(fmt if fmt in FORMATS else "records")
+            return await handler(request)
+
+        return format_handler
@@ -0,0 +1,259 @@
+"""
+SQL aggregation pushdown for very large tenants.
+
+Tenants with at least SQL_PUSHDOWN_MIN_ROWS rows in sales_master (0 = off, the default) are never loaded
+into API memory: the dashboard filters compile into one parameterized GROUP BY per widget, filter options
+into one SELECT DISTINCT (GROUPING SETS) scan, and line-level endpoints read only the filtered rows
+(db.get_filtered_data), which are not cached. SqlAggregates follows the same rollup()/aggregate() protocol
+as sales_cube.CubeSlice, and reproduces the cached frame's semantics (stripped labels, derived
+FINANCIAL_YEAR / MONTH, normalized fiscal-year keys, NaT/NULL handling), so responses are unchanged.
+"""
+import logging
+import os
+import pandas as pd
+from cachetools import TTLCache
+from sqlalchemy import bindparam, text
+
+from .filter_index import MATERIAL_GROUP_COLUMNS, fiscal_year_key, parse_filter_list
+from .bulk_copy import LINE_KEY_COLUMN
+from .sales_cube import DateLabel
+from .tenant_snapshot import ROW_ID_COLUMN
+
+TABLE = "sales_master"
+# strftime formats DateLabel keys use -> TO_CHAR patterns
+_TO_CHAR = {"%Y-%m": "YYYY-MM", "%Y-%m-%d": "YYYY-MM-DD"}
+
+_row_counts = TTLCache(maxsize=256, ttl=300)
+_table_columns = TTLCache(maxsize=1, ttl=300)
+
+
+def pushdown_min_rows() -> int:
+    """Row count from which a tenant is aggregated in SQL. Set SQL_PUSHDOWN_MIN_ROWS in env; 0 disables."""
+    try:
+        return max(0, int(os.environ.get("SQL_PUSHDOWN_MIN_ROWS", "0")))
+    except ValueError:
+        return 0
+
+
+def table_columns(eng) -> list:
+    """sales_master column names as stored (cached for 5 minutes)."""
+    if "cols" not in _table_columns:
+        with eng.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
+                ORDER BY ordinal_position
+            """), {"t": TABLE}).fetchall()
+        _table_columns["cols"] = [r[0] for r in rows]
+    return _table_columns["cols"]
+
+
+def tenant_row_count(eng, tenant_id: str) -> int:
+    """COUNT(*) of a tenant's rows (cached for 5 minutes, dropped on upload/clear)."""
+    if tenant_id not in _row_counts:
+        with eng.connect() as conn:
+            _row_counts[tenant_id] = int(conn.execute(
+                text(f"SELECT COUNT(*) FROM {TABLE} WHERE tenant_id = :tid"), {"tid": tenant_id}
+            ).scalar() or 0)
+    return _row_counts[tenant_id]
+
+
+def forget_tenant(tenant_id: str) -> None:
+    _row_counts.pop(tenant_id, None)
+    _table_columns.clear()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqlAggregates:
+    """One tenant + filter set, aggregated by Postgres. Build with db.get_sql_pushdown()."""
+
+    def __init__(self, eng, columns: list, tenant_id: str, bounds: tuple, egress_years: int = 0, **filters):
+        self.eng = eng
+        present = [c for c in columns if c not in ("tenant_id", ROW_ID_COLUMN, LINE_KEY_COLUMN)]
+        upper = {str(c).upper(): c for c in present}
+        if "DATE" not in upper or "AMOUNT" not in upper:
+            raise ValueError("sales_master has no DATE/AMOUNT column")
+        self._date = f"CAST({_quote(upper['DATE'])} AS TIMESTAMP)"
+        self._amount = f"CAST({_quote(upper['AMOUNT'])} AS DOUBLE PRECISION)"
+        self._exprs = {c: f"BTRIM(CAST({_quote(c)} AS TEXT))" for c in present}
+        # Same read-time enrichment as the cached frame when the table lacks these columns
+        if "FINANCIAL_YEAR" not in self._exprs:
+            self._exprs["FINANCIAL_YEAR"] = (
+                f"(CASE WHEN {self._date} IS NULL THEN 'UNKNOWN' ELSE 'FY' || {self._fy_key_sql(derived=True)} END)"
+            )
+        if "MONTH" not in self._exprs:
+            self._exprs["MONTH"] = f"UPPER(TO_CHAR({self._date}, 'Mon-YY'))"
+        self.columns = pd.Index(present + [c for c in ("FINANCIAL_YEAR", "MONTH") if c not in present])
+
+        self._params = {"tid": tenant_id}
+        self._expanding = []
+        where = ["tenant_id = :tid"]
+        if egress_years > 0:
+            where.append(f"{self._date} >= (CURRENT_DATE - make_interval(years => :egress_years))")
+            self._params["egress_years"] = int(egress_years)
+        start_dt, end_dt, end_inclusive = bounds
+        if start_dt is not None:
+            where.append(f"{self._date} >= :start_dt")
+            self._params["start_dt"] = start_dt.to_pydatetime()
+        if end_dt is not None:
+            where.append(f"{self._date} {'<=' if end_inclusive else '<'} :end_dt")
+            self._params["end_dt"] = end_dt.to_pydatetime()
+
+        grp_col = next((c for c in MATERIAL_GROUP_COLUMNS if c in present), None)
+        filter_columns = {
+            "states": "STATE", "cities": "CITY", "customers": "CUSTOMER_NAME",
+            "material_groups": grp_col, "fiscal_years": "FINANCIAL_YEAR", "months": "MONTH",
+        }
+        for name, col in filter_columns.items():
+            values = parse_filter_list(filters.get(name))
+            if not values or col is None or col not in self._exprs:
+                continue
+            expr = self._exprs[col]
+            if name == "fiscal_years":
+                values = [fiscal_year_key(v) for v in values]
+                expr = self._fy_key_sql(derived="FINANCIAL_YEAR" not in present)
+            param = f"f_{name}"
+            where.append(f"{expr} IN :{param}")
+            self._params[param] = values
+            self._expanding.append(param)
+        self._where = " AND ".join(where)
+        self._empty = None
+
+    def _fy_key_sql(self, derived: bool) -> str:
+        """SQL twin of filter_index.fiscal_year_key over the stored or date-derived fiscal year."""
+        if derived:
+            d = self._date
+            y = f"CAST(EXTRACT(YEAR FROM {d}) AS INTEGER)"
+            return (
+                f"(CASE WHEN {d} IS NULL THEN 'UNKNOWN' "
+                f"WHEN EXTRACT(MONTH FROM {d}) >= 4 THEN CAST({y} % 100 AS TEXT) || '-' || CAST(({y} + 1) % 100 AS TEXT) "
+                f"ELSE CAST({y} % 100 - 1 AS TEXT) || '-' || CAST({y} % 100 AS TEXT) END)"
+            )
+        t = self._exprs["FINANCIAL_YEAR"]
+        return f"(CASE WHEN LEFT(UPPER({t}), 2) = 'FY' AND LENGTH({t}) > 2 THEN BTRIM(SUBSTRING({t} FROM 3)) ELSE {t} END)"
+
+    def _agg_sql(self, col: str, how: str) -> str:
+        if how == "sum" and str(col).upper() == "AMOUNT":
+            return f"COALESCE(SUM({self._amount}), 0)"
+        if how == "mean" and str(col).upper() == "AMOUNT":
+            # The cached frame reads missing amounts as 0
+            return f"AVG(COALESCE({self._amount}, 0))"
+        if how == "max" and str(col).upper() == "DATE":
+            return f"MAX({self._date})"
+        if how == "nunique" and col in self._exprs:
+            return f"COUNT(DISTINCT {self._exprs[col]})"
+        if how == "size":
+            return "COUNT(*)"
+        raise ValueError(f"SQL pushdown cannot aggregate {col!r} with {how!r}")
+
+    @staticmethod
+    def _convert(values: pd.Series, how: str) -> pd.Series:
+        if how in ("sum", "mean"):
+            return values.astype("float64")
+        if how == "max":
+            return pd.to_datetime(values)
+        return values.astype("int64")
+
+    def _statement(self, sql: str):
+        stmt = text(sql)
+        if self._expanding:
+            stmt = stmt.bindparams(*[bindparam(p, expanding=True) for p in self._expanding])
+        return stmt
+
+    def _query(self, sql: str) -> list:
+        try:
+            with self.eng.connect() as conn:
+                return conn.execute(self._statement(sql), self._params).fetchall()
+        except Exception as e:
+            logging.error("sql_pushdown: query failed: %s", e)
+            raise
+
+    @property
+    def empty(self) -> bool:
+        if self._empty is None:
+            rows = self._query(f"SELECT EXISTS (SELECT 1 FROM {TABLE} WHERE {self._where})")
+            self._empty = not rows[0][0]
+        return self._empty
+
+    def aggregate(self, **aggs) -> dict:
+        """Grand totals, e.g. aggregate(revenue=("AMOUNT", "sum"), orders=("INVOICE_NO", "nunique"))."""
+        names = list(aggs)
+        select = ", ".join(self._agg_sql(*aggs[n]) for n in names)
+        row = self._query(f"SELECT {select} FROM {TABLE} WHERE {self._where}")[0]
+        out = {}
+        for n, v in zip(names, row):
+            how = aggs[n][1]
+            if v is None:
+                out[n] = pd.NaT if how == "max" else float("nan")
+            elif how == "max":
+                out[n] = pd.Timestamp(v)
+            else:
+                out[n] = float(v) if how in ("sum", "mean") else int(v)
+        return out
+
+    def rollup(self, by, **aggs) -> pd.DataFrame:
+        """
+        GROUP BY twin of df.groupby(by, observed=True).agg(**aggs); by is a column, a sales_cube.DateLabel
+        or pd.Grouper(key=DATE, freq="ME").
+        """
+        monthly = isinstance(by, pd.Grouper)
+        if monthly:
+            key_sql = f"DATE_TRUNC('month', {self._date})"
+            index_name = by.key
+        elif isinstance(by, DateLabel) and by.fmt in _TO_CHAR:
+            key_sql = f"TO_CHAR({self._date}, '{_TO_CHAR[by.fmt]}')"
+            index_name = by.name
+        elif by in self._exprs:
+            key_sql = self._exprs[by]
+            index_name = by
+        else:
+            raise ValueError(f"SQL pushdown cannot group by {by!r}")
+        names = list(aggs)
+        select = ", ".join([f"{key_sql} AS k"] + [f"{self._agg_sql(*aggs[n])} AS a{i}" for i, n in enumerate(names)])
+        rows = self._query(f"SELECT {select} FROM {TABLE} WHERE {self._where} AND {key_sql} IS NOT NULL GROUP BY 1")
+        out = pd.DataFrame.from_records(rows, columns=["k"] + names)
+        for n in names:
+            out[n] = self._convert(out[n], aggs[n][1])
+        if monthly:
+            # pd.Grouper(freq="ME") labels bins by month end and zero-fills months without rows
+            out["k"] = pd.to_datetime(out["k"]) + pd.offsets.MonthEnd(0)
+            out = out.set_index("k").sort_index()
+            if not out.empty:
+                out = out.reindex(pd.date_range(out.index[0], out.index[-1], freq="ME"), fill_value=0)
+        else:
+            # Python string order, same as the sorted categories of the cached frame
+            out = out.set_index("k").sort_index()
+        out.index.name = index_name
+        return out
+
+    def distinct_values(self, columns: list) -> dict:
+        """{column: distinct non-NULL values} of the selection in one GROUPING SETS scan; unknown columns are left out."""
+        cols = [c for c in columns if c in self._exprs]
+        if not cols:
+            return {}
+        keys = ", ".join(f"{self._exprs[c]} AS k{i}" for i, c in enumerate(cols))
+        sets = ", ".join(f"(k{i})" for i in range(len(cols)))
+        rows = self._query(
+            f"SELECT * FROM (SELECT {keys} FROM {TABLE} WHERE {self._where}) s GROUP BY GROUPING SETS ({sets})"
+        )
+        # Each row carries one set's value; the other keys are NULL
+        out = {c: [] for c in cols}
+        for row in rows:
+            for c, v in zip(cols, row):
+                if v is not None:
+                    out[c].append(v)
+        return out
+
+    def lines(self) -> pd.DataFrame:
+        """The selected rows as stored (SELECT *), in table order; db normalizes them like the cached frame."""
+        try:
+            with self.eng.connect() as conn:
+                return pd.read_sql(
+                    self._statement(f"SELECT * FROM {TABLE} WHERE {self._where} ORDER BY ctid"), conn, params=self._params
+                )
+        except Exception as e:
+            logging.error("sql_pushdown: query failed: %s", e)
+            raise
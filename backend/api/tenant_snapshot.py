@@ -0,0 +1,242 @@
+"""
+Local Parquet snapshot of each tenant frame, beneath the in-memory tenant cache.
+
+Set TENANT_SNAPSHOT_DIR to enable (needs pyarrow; the API refuses to start without it when the setting
+is on). A cold load (restart, TTL expiry) then reads the normalized frame from disk and fetches only the
+rows inserted since, instead of re-downloading the whole tenant from Postgres. Rows are versioned by
+sales_master._row_id (BIGSERIAL, added by the migration in docs/sql/sales_master_indexes.sql; without it
+snapshots stay off). A snapshot records the highest _row_id it holds, how many tenant rows existed up to
+it and the tenant's revision in tenant_revisions. If the count no longer matches (rows deleted, table
+replaced) or the revision moved (rows updated in place, e.g. customer_master.reenrich_sales) the snapshot
+is discarded and the tenant reloaded in full. Writers that UPDATE sales_master rows must call
+bump_revision in their transaction; changes made by other tools are only caught by the row count.
+
+The rows, their high-water mark, the count and the revision must come from one REPEATABLE READ
+transaction (db._load_tenant_frame): a row with a lower _row_id that commits after the SELECT is then
+missing from the count as well, so the next read() sees the count move and reloads.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+ROW_ID_COLUMN = "_row_id"
+_META_KEY = b"sales_snapshot"
+_FORMAT_VERSION = 2
+
+_ensured = False
+_warned = False
+_ensure_lock = threading.Lock()
+
+
+def snapshot_dir() -> str:
+    """Snapshot directory from TENANT_SNAPSHOT_DIR; empty (the default) disables snapshots."""
+    return os.environ.get("TENANT_SNAPSHOT_DIR", "").strip()
+
+
+def enabled() -> bool:
+    if not snapshot_dir():
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logging.warning("TENANT_SNAPSHOT_DIR is set but pyarrow is not installed — snapshots disabled.")
+        return False
+    return True
+
+
+def snapshot_path(tenant_id: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", tenant_id)[:64]
+    digest = hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(snapshot_dir(), f"{safe}-{digest}.parquet")
+
+
+def check_config() -> None:
+    """Raise at startup when TENANT_SNAPSHOT_DIR is set but pyarrow is missing (snapshots would silently stay off)."""
+    if not snapshot_dir():
+        return
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("TENANT_SNAPSHOT_DIR is set but pyarrow is not installed (see backend/requirements.txt).") from e
+
+
+def ensure_row_id_column(eng, create: bool = False) -> bool:
+    """
+    True when sales_master has the _row_id column (checked once per process). create=True adds it, only for
+    a table an upload just created (empty, so the ALTER is instant); existing tables are migrated with
+    docs/sql/sales_master_indexes.sql, since adding a BIGSERIAL rewrites the whole table.
+    """
+    global _ensured, _warned
+    if _ensured:
+        return True
+    with _ensure_lock:
+        if _ensured:
+            return True
+        try:
+            if create:
+                with eng.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE sales_master ADD COLUMN IF NOT EXISTS {ROW_ID_COLUMN} BIGSERIAL"))
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS idx_sales_master_tenant_row_id ON sales_master (tenant_id, {ROW_ID_COLUMN})"
+                    ))
+            with eng.connect() as conn:
+                _ensured = bool(conn.execute(text(
+                    "SELECT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'public' "
+                    "AND table_name = 'sales_master' AND column_name = :col)"
+                ), {"col": ROW_ID_COLUMN}).scalar())
+        except Exception as e:
+            logging.warning("tenant_snapshot: could not check %s on sales_master: %s", ROW_ID_COLUMN, e)
+        if not _ensured and not _warned:
+            logging.warning(
+                "tenant_snapshot: sales_master has no %s column — snapshots off until the migration in "
+                "docs/sql/sales_master_indexes.sql is applied.", ROW_ID_COLUMN,
+            )
+            _warned = True
+        return _ensured
+
+
+def _ensure_revisions_table(conn) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS tenant_revisions (
+            tenant_id VARCHAR(128) PRIMARY KEY,
+            revision BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def bump_revision(conn, tenant_id: str) -> None:
+    """Record an in-place change of the tenant's rows; call inside the writer's transaction."""
+    _ensure_revisions_table(conn)
+    conn.execute(text(
+        "INSERT INTO tenant_revisions (tenant_id, revision) VALUES (:tid, 1) "
+        "ON CONFLICT (tenant_id) DO UPDATE SET revision = tenant_revisions.revision + 1, updated_at = CURRENT_TIMESTAMP"
+    ), {"tid": tenant_id})
+
+
+def revision(conn, tenant_id: str) -> int:
+    """Current in-place revision of the tenant's rows (0 = never updated in place)."""
+    # Created by the first bump_revision; no table yet means no in-place update yet
+    if conn.execute(text("SELECT to_regclass('public.tenant_revisions')")).scalar() is None:
+        return 0
+    return int(conn.execute(
+        text("SELECT revision FROM tenant_revisions WHERE tenant_id = :tid"), {"tid": tenant_id},
+    ).scalar() or 0)
+
+
+def forget_row_id_column() -> None:
+    """The table was recreated (to_sql replace): re-check the column on next use."""
+    global _ensured
+    _ensured = False
+
+
+def high_water(raw: pd.DataFrame) -> Optional[int]:
+    """Highest _row_id in freshly read sales_master rows, or None if the column is missing."""
+    if ROW_ID_COLUMN not in raw.columns or raw.empty:
+        return None
+    hw = pd.to_numeric(raw[ROW_ID_COLUMN], errors="coerce").max()
+    return None if pd.isna(hw) else int(hw)
+
+
+def source_rows(conn, tenant_id: str, high_water_mark: int) -> int:
+    """Tenant rows up to the high-water mark; run it in the transaction that read the rows."""
+    return int(conn.execute(
+        text(f"SELECT COUNT(*) FROM sales_master WHERE tenant_id = :tid AND {ROW_ID_COLUMN} <= :hw"),
+        {"tid": tenant_id, "hw": high_water_mark},
+    ).scalar() or 0)
+
+
+def read(conn, tenant_id: str, egress_years: int):
+    """
+    (normalized frame, high-water mark, revision) from the tenant's snapshot if it is still a prefix of
+    sales_master, else None. Checked on conn, the transaction that then fetches the delta. Never raises
+    on a bad snapshot file; database errors propagate (the transaction is unusable after them).
+    """
+    path = snapshot_path(tenant_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, memory_map=True)
+        meta = json.loads((table.schema.metadata or {}).get(_META_KEY, b"{}"))
+        if (
+            meta.get("version") != _FORMAT_VERSION
+            or meta.get("tenant_id") != tenant_id
+            or meta.get("egress_years") != egress_years
+        ):
+            return None
+        hw = int(meta["high_water"])
+        expected_rows = int(meta["source_rows"])
+        expected_revision = meta.get("revision")
+    except Exception as e:
+        logging.warning("tenant_snapshot: ignoring snapshot for %s: %s", tenant_id, e)
+        return None
+    current = revision(conn, tenant_id)
+    if current != expected_revision:
+        logging.info("tenant_snapshot: %s rows were updated in place, full reload", tenant_id)
+        return None
+    if source_rows(conn, tenant_id, hw) != expected_rows:
+        logging.info("tenant_snapshot: %s changed below the high-water mark, full reload", tenant_id)
+        return None
+    try:
+        df = table.to_pandas()
+    except Exception as e:
+        logging.warning("tenant_snapshot: ignoring snapshot for %s: %s", tenant_id, e)
+        return None
+    if meta.get("sorted_by"):
+        df.attrs["sorted_by"] = meta["sorted_by"]
+    return df, hw, current
+
+
+def write(tenant_id: str, df: pd.DataFrame, high_water_mark: Optional[int], rows_up_to_mark: int, egress_years: int, rev: int) -> bool:
+    """
+    Atomically replace the tenant's snapshot with the normalized frame. high_water_mark, rows_up_to_mark
+    (source_rows) and rev must come from the transaction that read the rows. Never raises.
+    """
+    if high_water_mark is None or df.empty:
+        return False
+    path = snapshot_path(tenant_id)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        meta = {
+            "version": _FORMAT_VERSION,
+            "tenant_id": tenant_id,
+            "high_water": high_water_mark,
+            "source_rows": rows_up_to_mark,
+            "egress_years": egress_years,
+            "revision": rev,
+            "sorted_by": df.attrs.get("sorted_by"),
+        }
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        logging.warning("tenant_snapshot: could not write snapshot for %s: %s", tenant_id, e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+
+
+def remove(tenant_id: str) -> None:
+    if not snapshot_dir():
+        return
+    try:
+        os.remove(snapshot_path(tenant_id))
+    except OSError:
+        pass
@@ -62,7 +62,7 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "ETag", "X-Next-Cursor"],
 )
 
 app.include_router(api_router, prefix="/api")
@@ -70,8 +70,21 @@ app.include_router(api_router, prefix="/api")
 
 @app.on_event("startup")
 def _startup():
-    """Startup: log that server is ready. Data loads on first request to keep RAM low."""
+    """
+    Startup: check settings that need optional packages, add the upload dedup index to sales_master if missing,
+    log that server is ready. Data loads on first request to keep RAM low.
+    """
     import logging
+    from sqlalchemy.exc import OperationalError
+    from api import bulk_copy, db, tenant_snapshot
+    tenant_snapshot.check_config()
+    eng = db.get_engine()
+    if eng is not None:
+        try:
+            bulk_copy.ensure_line_key_index(eng)
+        except OperationalError as e:
+            # Database unreachable or table busy (lock_timeout): the first upload retries the migration
+            logging.warning(f"LINE_KEY index migration deferred to the first upload: {e}")
     logging.info("ELETTRO API started. Data will load on first dashboard request.")
 
 
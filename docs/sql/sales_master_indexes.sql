@@ -9,5 +9,39 @@ CREATE INDEX IF NOT EXISTS idx_sales_master_tenant_id
 CREATE INDEX IF NOT EXISTS idx_sales_master_tenant_date
   ON sales_master (tenant_id, date);
 
+-- Local tenant snapshots (TENANT_SNAPSHOT_DIR): monotonic row id for delta fetches.
+-- Required for snapshots on an existing table (the backend never alters it; snapshots stay off without
+-- the column). Adding a BIGSERIAL rewrites the table under an ACCESS EXCLUSIVE lock: run it in a
+-- maintenance window. The index is built CONCURRENTLY, as its own statement outside a transaction.
+ALTER TABLE sales_master ADD COLUMN IF NOT EXISTS _row_id BIGSERIAL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sales_master_tenant_row_id
+  ON sales_master (tenant_id, _row_id);
+
+-- In-place updates per tenant (created by the backend on first use): snapshots taken at an older
+-- revision are discarded. Tools that UPDATE sales_master rows directly should bump it as well:
+--   INSERT INTO tenant_revisions (tenant_id, revision) VALUES ('<tenant>', 1)
+--   ON CONFLICT (tenant_id) DO UPDATE SET revision = tenant_revisions.revision + 1;
+CREATE TABLE IF NOT EXISTS tenant_revisions (
+  tenant_id VARCHAR(128) PRIMARY KEY,
+  revision BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Upload deduplication: one key per sales line (hash of invoice/date/customer/item/qty/rate/amount).
+-- The backend applies this itself at startup (bulk_copy.ensure_line_key_index, autocommit connection)
+-- and again before the first upload if the table was busy or created since; run it by hand only to
+-- control when the index is built. Adding a nullable column without default is metadata-only; the index
+-- is built CONCURRENTLY so reads and writes continue meanwhile. CONCURRENTLY cannot run inside a
+-- transaction block: run that statement on its own. If it fails it leaves an INVALID index; DROP INDEX
+-- CONCURRENTLY it and run it again (the backend does this too).
+-- Existing rows are keyed per tenant on its next upload (bulk_copy.backfill_line_keys).
+ALTER TABLE sales_master ADD COLUMN IF NOT EXISTS "LINE_KEY" TEXT;
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_sales_master_tenant_line_key
+  ON sales_master (tenant_id, "LINE_KEY");
+
+-- Customer master re-enrichment (POST /data/reenrich): joins the tenant's rows on customer name.
+CREATE INDEX IF NOT EXISTS idx_sales_master_tenant_customer
+  ON sales_master (tenant_id, "CUSTOMER_NAME");
+
 -- ANALYZE after bulk loads
 -- ANALYZE sales_master;
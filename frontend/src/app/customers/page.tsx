@@ -3,7 +3,7 @@
 import { useEffect, useState } from "react";
 import { format } from "date-fns";
 import { useFilter } from "@/components/FilterContext";
-import { fetchAllCustomers, fetchRfmSegments } from "@/lib/api";
+import { fetchWidgets } from "@/lib/api";
 import { Users, Crown, AlertTriangle, UserX } from "lucide-react";
 import { KpiCard } from "@/components/ui/KpiCard";
 import { DataTable } from "@/components/ui/DataTable";
@@ -39,11 +39,8 @@ export default function CustomersPage() {
             };
 
             try {
-                const [customers, rfm] = await Promise.all([
-                    fetchAllCustomers(p).catch(() => []),
-                    fetchRfmSegments(p).catch(() => []),
-                ]);
-                setData({ customers, rfm });
+                const r = await fetchWidgets(["customers", "rfm"], p);
+                setData({ customers: r.customers || [], rfm: r.rfm || [] });
             } catch (e) {
                 console.error("Failed to fetch customer data", e);
             } finally {
@@ -4,7 +4,7 @@ import { useState, useCallback, useEffect } from "react";
 import { useDropzone } from "react-dropzone";
 import { UploadCloud, FileSpreadsheet, CheckCircle2, AlertCircle, Loader2, Activity } from "lucide-react";
 import { useFilter } from "@/components/FilterContext";
-import { fetchDataHealth, API_BASE_URL } from "@/lib/api";
+import { fetchDataHealth, waitForJob, API_BASE_URL } from "@/lib/api";
 
 export default function DataUploadPage() {
     const { tenant } = useFilter();
@@ -12,6 +12,7 @@ export default function DataUploadPage() {
     const [status, setStatus] = useState<"idle" | "uploading" | "success" | "error">("idle");
     const [message, setMessage] = useState("");
     const [progress, setProgress] = useState({ current: 0, total: 0 });
+    const [jobStage, setJobStage] = useState("");
     const [health, setHealth] = useState<{ total_rows: number; missing_dates: number; duplicate_invoices: number; negative_amounts: number; score: number; status: string; message: string } | null>(null);
     const [healthLoading, setHealthLoading] = useState(true);
 
@@ -52,6 +53,7 @@ export default function DataUploadPage() {
         setStatus("uploading");
         setProgress({ current: 0, total: files.length });
         let totalRows = 0;
+        let skippedRows = 0;
         let failedFiles: string[] = [];
 
         for (let i = 0; i < files.length; i++) {
@@ -65,24 +67,33 @@ export default function DataUploadPage() {
                     method: "POST",
                     body: formData,
                 });
-                const result = await response.json();
-                if (response.ok) {
-                    totalRows += result.rows_inserted || 0;
+                const queued = await response.json();
+                if (!response.ok) {
+                    failedFiles.push(`${files[i].name}: ${queued.detail || "failed"}`);
+                    continue;
+                }
+                // Processing runs as a background job on the server; follow its progress
+                const job = await waitForJob(queued.job_id, (j) => setJobStage(`${j.stage} ${j.percent}%`));
+                if (job.status === "completed") {
+                    totalRows += job.result?.rows_inserted || 0;
+                    skippedRows += job.result?.rows_skipped || 0;
                 } else {
-                    failedFiles.push(`${files[i].name}: ${result.detail || "failed"}`);
+                    failedFiles.push(`${files[i].name}: ${job.error || "failed"}`);
                 }
             } catch {
                 failedFiles.push(`${files[i].name}: network error`);
             }
         }
+        setJobStage("");
 
+        const skipped = skippedRows > 0 ? `, ${skippedRows.toLocaleString()} already present` : "";
         if (failedFiles.length === 0) {
             setStatus("success");
-            setMessage(`Successfully processed ${files.length} file${files.length > 1 ? "s" : ""} — ${totalRows.toLocaleString()} rows inserted.`);
+            setMessage(`Successfully processed ${files.length} file${files.length > 1 ? "s" : ""} — ${totalRows.toLocaleString()} rows inserted${skipped}.`);
             setFiles([]);
         } else if (failedFiles.length < files.length) {
             setStatus("success");
-            setMessage(`Processed ${files.length - failedFiles.length} of ${files.length} files (${totalRows.toLocaleString()} rows). Failed: ${failedFiles.join("; ")}`);
+            setMessage(`Processed ${files.length - failedFiles.length} of ${files.length} files (${totalRows.toLocaleString()} rows${skipped}). Failed: ${failedFiles.join("; ")}`);
             setFiles([]);
         } else {
             setStatus("error");
@@ -92,20 +103,40 @@ export default function DataUploadPage() {
 
     const [masterStatus, setMasterStatus] = useState<"idle" | "uploading" | "success" | "error">("idle");
     const [masterMsg, setMasterMsg] = useState("");
+    const [applyToStored, setApplyToStored] = useState(false);
 
     const handleMasterUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
         const f = e.target.files?.[0];
+        e.target.value = "";
         if (!f) return;
+        // Rewrites STATE/CITY and taxes of rows already uploaded: opt-in, and confirmed
+        const reenrich = applyToStored && confirm("This will update STATE, CITY and taxes of sales rows already uploaded for this tenant wherever the master knows the customer. Continue?");
         setMasterStatus("uploading");
+        setMasterMsg("");
         const formData = new FormData();
         formData.append("file", f);
         formData.append("tenant_id", tenant);
+        formData.append("reenrich", reenrich ? "true" : "false");
         try {
             const res = await fetch(`${API_BASE_URL}/upload/customer-master`, { method: "POST", body: formData });
             const data = await res.json();
             if (res.ok) {
-                setMasterStatus("success");
-                setMasterMsg(`Customer master loaded: ${data.rows} rows, columns: ${data.columns?.join(", ")}`);
+                const loaded = `Customer master loaded: ${data.rows} rows, columns: ${data.columns?.join(", ")}`;
+                if (!data.reenrich_job_id) {
+                    setMasterStatus("success");
+                    setMasterMsg(loaded);
+                    return;
+                }
+                // Updating stored rows runs as a background job on the server; follow its progress
+                setMasterMsg(`${loaded}; updating stored rows...`);
+                const job = await waitForJob(data.reenrich_job_id, (j) => setMasterMsg(`${loaded}; updating stored rows ${j.percent}%`));
+                if (job.status === "completed") {
+                    setMasterStatus("success");
+                    setMasterMsg(`${loaded}; ${Number(job.result?.updated_rows || 0).toLocaleString()} stored rows updated`);
+                } else {
+                    setMasterStatus("error");
+                    setMasterMsg(`${loaded}, but updating stored rows failed: ${job.error || "failed"}`);
+                }
             } else {
                 setMasterStatus("error");
                 setMasterMsg(data.detail || "Upload failed.");
@@ -134,10 +165,15 @@ export default function DataUploadPage() {
                     </label>
                     {masterStatus === "success" && <span className="text-sm text-green-400">{masterMsg}</span>}
                     {masterStatus === "error" && <span className="text-sm text-red-400">{masterMsg}</span>}
+                    {masterStatus === "uploading" && masterMsg && <span className="text-sm text-gray-400">{masterMsg}</span>}
                 </div>
+                <label className="flex items-center gap-2 mt-3 text-sm text-gray-400">
+                    <input type="checkbox" checked={applyToStored} onChange={(e) => setApplyToStored(e.target.checked)} disabled={masterStatus === "uploading"} />
+                    Also update sales rows already uploaded (STATE, CITY and taxes)
+                </label>
                 <p className="text-xs text-gray-500 mt-2">Upload this <strong>before</strong> uploading sales files. The master is used to add STATE/CITY to each row during upload.</p>
                 <div className="mt-4 pt-4 border-t border-[#30363d]">
-                    <p className="text-sm text-gray-400 mb-2">Already uploaded data without the master? Clear existing data and re-upload with the master loaded.</p>
+                    <p className="text-sm text-gray-400 mb-2">Rows uploaded before the master keep their STATE/CITY unless you tick "Also update sales rows already uploaded" when loading it. To start over, clear existing data and re-upload.</p>
                     <button
                         onClick={async () => {
                             if (!confirm("This will DELETE all sales data for this tenant. You will need to re-upload your Excel files. Continue?")) return;
@@ -289,7 +325,7 @@ export default function DataUploadPage() {
                         {status === "uploading" ? (
                             <>
                                 <Loader2 className="animate-spin h-5 w-5 mr-2" />
-                                Processing {progress.current}/{progress.total}...
+                                Processing {progress.current}/{progress.total}{jobStage ? ` — ${jobStage}` : "..."}
                             </>
                         ) : (
                             <>
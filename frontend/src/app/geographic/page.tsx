@@ -4,7 +4,7 @@
 import React, { useEffect, useState, useMemo } from "react";
 import { format } from "date-fns";
 import { useFilter } from "@/components/FilterContext";
-import { fetchStateData, fetchCityData } from "@/lib/api";
+import { fetchWidgets } from "@/lib/api";
 import { BarChart } from "@/components/ui/Charts";
 import { KpiCard } from "@/components/ui/KpiCard";
 import { DataTable } from "@/components/ui/DataTable";
@@ -37,11 +37,8 @@ export default function GeographicPage() {
             };
 
             try {
-                const [states, cities] = await Promise.all([
-                    fetchStateData(p).catch(() => []),
-                    fetchCityData(p).catch(() => []),
-                ]);
-                setData({ states, cities });
+                const r = await fetchWidgets(["states", "cities"], p);
+                setData({ states: r.states || [], cities: r.cities || [] });
             } catch (e) {
                 console.error("Failed to fetch geographic data", e);
             } finally {
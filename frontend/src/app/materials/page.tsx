@@ -3,7 +3,7 @@
 import React, { useEffect, useState } from "react";
 import { format } from "date-fns";
 import { useFilter } from "@/components/FilterContext";
-import { fetchMaterialPerformance, fetchParetoData } from "@/lib/api";
+import { fetchWidgets } from "@/lib/api";
 import { ModernTreemap, CategoryHorizontalBarChart } from "@/components/ui/Charts";
 import { KpiCard } from "@/components/ui/KpiCard";
 import { DataTable } from "@/components/ui/DataTable"; // Added this import
@@ -32,11 +32,8 @@ export default function MaterialsPage() {
             };
 
             try {
-                const [performance, pareto] = await Promise.all([
-                    fetchMaterialPerformance(p).catch(() => []),
-                    fetchParetoData(p).catch(() => []),
-                ]);
-                setData({ performance, pareto });
+                const r = await fetchWidgets(["materials", "pareto"], p);
+                setData({ performance: r.materials || [], pareto: r.pareto || [] });
             } catch (e) {
                 console.error("Failed to fetch material data", e);
             } finally {
@@ -6,7 +6,7 @@ import { useFilter } from "@/components/FilterContext";
 import { KpiCard } from "@/components/ui/KpiCard";
 import { GradientAreaChart } from "@/components/ui/Charts";
 import { DataTable } from "@/components/ui/DataTable"; // Added DataTable import
-import { fetchMonthlySales, fetchDailySales, fetchGrowthMetrics } from "@/lib/api";
+import { fetchWidgets } from "@/lib/api";
 import { TrendingUp, ArrowUpRight, ArrowDownRight, DollarSign } from "lucide-react";
 import { formatAmount } from "@/lib/format";
 
@@ -31,12 +31,12 @@ export default function SalesPage() {
             };
 
             try {
-                const [monthly, daily, growth] = await Promise.all([
-                    fetchMonthlySales(p).catch(() => []),
-                    fetchDailySales(30, p).catch(() => []),
-                    fetchGrowthMetrics(p).catch(() => ({ mom_growth: 0, current_month_rev: 0, prev_month_rev: 0 })),
-                ]);
-                setData({ monthly, daily, growth });
+                const r = await fetchWidgets(["monthly", { name: "daily", days: 30 }, "growth"], p);
+                setData({
+                    monthly: r.monthly || [],
+                    daily: r.daily || [],
+                    growth: r.growth || { mom_growth: 0, current_month_rev: 0, prev_month_rev: 0 },
+                });
             } catch (e) {
                 console.error("Failed to fetch sales data", e);
             } finally {
@@ -62,15 +62,33 @@ function buildQueryString(params: FilterParams = {}) {
     return str ? `?${str}` : "";
 }
 
-async function apiFetch(path: string, params?: FilterParams) {
+/** Rebuild row objects from a format=columnar table ({columns, data: {col: [...]}}); other values pass through. */
+export function fromColumnar(payload: any): any {
+    if (!payload || typeof payload !== "object" || Array.isArray(payload)) return payload;
+    const { columns, data } = payload;
+    if (!Array.isArray(columns) || !data || typeof data !== "object") return payload;
+    const n = columns.length ? (data[columns[0]] || []).length : 0;
+    const rows = new Array(n);
+    for (let i = 0; i < n; i++) {
+        const row: Record<string, unknown> = {};
+        for (const c of columns) row[c] = data[c][i];
+        rows[i] = row;
+    }
+    return rows;
+}
+
+/** columnar: ask for {columns, data} (each key sent once, not per row) and rebuild rows here — for long lists. */
+async function apiFetch(path: string, params?: FilterParams, columnar = false) {
     const qs = buildQueryString(params);
-    const key = `${path}${qs}`;
+    let url = `${API_BASE_URL}${path}${qs}`;
+    if (columnar) url += `${url.includes("?") ? "&" : "?"}format=columnar`;
+    const key = url;
     const cached = getCached(key);
     if (cached !== null) return cached;
-    const url = `${API_BASE_URL}${path}${qs}`;
-    const res = await fetchWithTimeout(url, { cache: "no-store" });
+    // no-cache: the browser revalidates with If-None-Match and the API answers 304 while tenant data is unchanged
+    const res = await fetchWithTimeout(url, { cache: "no-cache" });
     if (!res.ok) throw new Error(`API ${res.status}: ${res.statusText}`);
-    const data = await res.json();
+    const data = columnar ? fromColumnar(await res.json()) : await res.json();
     setCached(key, data);
     return data;
 }
@@ -84,6 +102,113 @@ export const fetchTopCustomers = (p?: FilterParams) => apiFetch("/charts/top-cus
 // Single dashboard payload (throws on failure so dashboard can show "slow/unreachable" + retry)
 export const fetchDashboardSummary = (p?: FilterParams) => apiFetch("/dashboard/summary", p);
 
+// Batched widgets: one POST /query/batch per page, the backend filters the tenant once for all of them.
+// Falls back to the per-widget GET endpoints if the batch call fails (e.g. older backend).
+const WIDGET_PATHS: Record<string, string> = {
+    kpis: "/metrics/summary",
+    trend: "/charts/trend",
+    material_groups: "/charts/material-groups",
+    top_customers: "/charts/top-customers",
+    monthly: "/sales/monthly",
+    daily: "/sales/daily",
+    growth: "/sales/growth",
+    customers: "/customers/all",
+    rfm: "/customers/rfm",
+    states: "/geographic/states",
+    cities: "/geographic/cities",
+    materials: "/materials/performance",
+    pareto: "/materials/pareto",
+};
+
+export type BatchWidget = string | { name: string; limit?: number; days?: number };
+
+export async function fetchWidgets(widgets: BatchWidget[], p: FilterParams = {}): Promise<Record<string, any>> {
+    const body = {
+        tenant_id: p.tenant,
+        start_date: p.startDate,
+        end_date: p.endDate,
+        states: p.states,
+        cities: p.cities,
+        customers: p.customers,
+        material_groups: p.materialGroups,
+        fiscal_years: p.fiscalYears,
+        months: p.months,
+        widgets,
+    };
+    const key = `/query/batch:${JSON.stringify(body)}`;
+    const cached = getCached<Record<string, any>>(key);
+    if (cached !== null) return cached;
+    try {
+        const res = await fetchWithTimeout(`${API_BASE_URL}/query/batch?format=columnar`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(body),
+            cache: "no-store",
+        });
+        if (!res.ok) throw new Error(`API ${res.status}: ${res.statusText}`);
+        const data = await res.json();
+        const results = Object.fromEntries(Object.entries(data.results || {}).map(([k, v]) => [k, fromColumnar(v)]));
+        setCached(key, results);
+        return results;
+    } catch {
+        const entries = await Promise.all(widgets.map(async (w) => {
+            const spec = typeof w === "string" ? { name: w } : w;
+            const extra = new URLSearchParams();
+            if ("limit" in spec && spec.limit != null) extra.append("limit", String(spec.limit));
+            if ("days" in spec && spec.days != null) extra.append("days", String(spec.days));
+            const qs = buildQueryString(p);
+            const suffix = extra.toString() ? `${qs ? "&" : "?"}${extra.toString()}` : "";
+            const data = await apiFetch(`${WIDGET_PATHS[spec.name]}${qs}${suffix}`, undefined, true).catch(() => null);
+            return [spec.name, data] as const;
+        }));
+        return Object.fromEntries(entries.filter(([, d]) => d !== null));
+    }
+}
+
+export type UploadJob = {
+    job_id: string;
+    status: "queued" | "running" | "completed" | "failed";
+    stage: string;
+    percent: number;
+    message: string;
+    result: any;
+    error: string | null;
+};
+
+/** Follow a background job (uploads) until it finishes: SSE against the API directly, polling via the proxy (it buffers responses). */
+export function waitForJob(jobId: string, onProgress?: (job: UploadJob) => void): Promise<UploadJob> {
+    const url = `${API_BASE_URL}/jobs/${encodeURIComponent(jobId)}`;
+    const finished = (job: UploadJob) => job.status === "completed" || job.status === "failed";
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetchWithTimeout(url)
+                .then(res => (res.ok ? res.json() : Promise.reject(new Error(`Job status ${res.status}`))))
+                .then((job: UploadJob) => {
+                    onProgress?.(job);
+                    if (finished(job)) resolve(job);
+                    else setTimeout(poll, 1000);
+                })
+                .catch(reject);
+        };
+        if (USE_PROXY || typeof EventSource === "undefined") {
+            poll();
+            return;
+        }
+        const events = new EventSource(`${url}/events`);
+        events.addEventListener("progress", (e) => onProgress?.(JSON.parse((e as MessageEvent).data)));
+        events.addEventListener("done", (e) => {
+            events.close();
+            const job = JSON.parse((e as MessageEvent).data);
+            onProgress?.(job);
+            resolve(job);
+        });
+        events.onerror = () => {
+            events.close();
+            poll();
+        };
+    });
+}
+
 export type SalesTargetsPayload = { tenant_id: string; target_revenue: number | null; target_orders: number | null };
 
 export const fetchSalesTargets = (tenant: string) =>
@@ -155,8 +280,8 @@ export const fetchDailySales = (days = 30, p?: FilterParams) => apiFetch(`/sales
 export const fetchGrowthMetrics = (p?: FilterParams) => apiFetch("/sales/growth", p).catch(() => null);
 
 // Customer Intelligence
-export const fetchAllCustomers = (p?: FilterParams) => apiFetch("/customers/all", p).then(d => d || []).catch(() => []);
-export const fetchRfmSegments = (p?: FilterParams) => apiFetch("/customers/rfm", p).then(d => d || []).catch(() => []);
+export const fetchAllCustomers = (p?: FilterParams) => apiFetch("/customers/all", p, true).then(d => d || []).catch(() => []);
+export const fetchRfmSegments = (p?: FilterParams) => apiFetch("/customers/rfm", p, true).then(d => d || []).catch(() => []);
 
 // Geographic
 export const fetchStateData = (p?: FilterParams) => apiFetch("/geographic/states", p).then(d => d || []).catch(() => []);
@@ -167,7 +292,7 @@ export const fetchMaterialPerformance = (p?: FilterParams) => apiFetch("/materia
 export const fetchParetoData = (p?: FilterParams) => apiFetch("/materials/pareto", p).then(d => d || []).catch(() => []);
 
 // Reports
-export const fetchItemDetails = (p?: FilterParams) => apiFetch("/reports/item-details", p).then(d => d || []).catch(() => []);
+export const fetchItemDetails = (p?: FilterParams) => apiFetch("/reports/item-details", p, true).then(d => d || []).catch(() => []);
 
 // Data quality (with timeout)
 export const fetchDataHealth = (tenant?: string) =>
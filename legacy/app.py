@@ -86,6 +86,32 @@ with st.sidebar:
 # ---------------------------------------------------------
 # 3. Data Loading
 # ---------------------------------------------------------
+def _fetch_api_data(tenant_id, retries=1):
+    """Page through /api/v1/data (X-Next-Cursor) so no single request has to carry the whole tenant."""
+    params = {"tenant_id": tenant_id, "limit": config.API_PAGE_ROWS}
+    if config.API_DATA_COLUMNS:
+        params["columns"] = config.API_DATA_COLUMNS
+    pages = []
+    cursor = None
+    while True:
+        resp = requests.get(
+            f"{config.API_URL}/api/v1/data",
+            params={**params, "cursor": cursor} if cursor else params,
+            timeout=30,
+        )
+        if resp.status_code == 409 and retries > 0:
+            # Data changed between pages: start over on the new version
+            return _fetch_api_data(tenant_id, retries - 1)
+        resp.raise_for_status()
+        data = resp.json()
+        if data:
+            pages.append(pd.DataFrame(data))
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+
 @st.cache_data(ttl=900, show_spinner="Loading data from cloud...")
 def get_data(tenant_id="default_elettro"):
     df = pd.DataFrame()
@@ -102,13 +128,7 @@ def get_data(tenant_id="default_elettro"):
     # Strategy 2: Fallback to API if direct DB failed
     if df is None or df.empty:
         try:
-            import requests
-            api_url = config.API_URL
-            resp = requests.get(f"{api_url}/api/v1/data", params={"tenant_id": tenant_id}, timeout=30)
-            if resp.status_code == 200:
-                data = resp.json()
-                if data:
-                    df = pd.DataFrame(data)
+            df = _fetch_api_data(tenant_id)
         except Exception as e:
             api_error = str(e)
     
@@ -3,6 +3,23 @@ import pandas as pd
 import requests
 import config
 
+def _wait_for_job(job_id, status_text, filename, poll_seconds=1.0):
+    """Poll /api/jobs/{id} until the upload job completes or fails; shows its stage while waiting."""
+    import time
+
+    if not job_id:
+        return {"status": "completed"}
+    while True:
+        resp = requests.get(f"{config.API_URL}/api/jobs/{job_id}", timeout=30)
+        if resp.status_code != 200:
+            return {"status": "failed", "error": f"job status {resp.status_code}: {resp.text}"}
+        job = resp.json()
+        if job.get("status") in ("completed", "failed"):
+            return job
+        status_text.text(f"Processing {filename}: {job.get('stage', '')} {job.get('percent', 0)}%")
+        time.sleep(poll_seconds)
+
+
 def render_cloud_uploader():
     """
     Adds a file uploader to the sidebar for Cloud Deployments.
@@ -54,7 +71,12 @@ def render_cloud_uploader():
                             timeout=90 # Prevent Render 100s drops
                         )
                         
-                        if response.status_code == 200:
+                        if response.status_code in (200, 202):
+                            # The API queues the files as a background job; wait for it to finish
+                            job = _wait_for_job(response.json().get("job_id"), status_text, chunk[0].name)
+                            if job.get("status") != "completed":
+                                st.error(f"Failed on file {idx + 1}: {job.get('error') or 'processing failed'}")
+                                break # Stop on error
                             success_count += len(chunk)
                             time.sleep(1.5) # Stagger requests so we don't hit cloud WAF limits
                         else:
@@ -1,8 +1,12 @@
 import os
+import sys
 
 # Repo root (parent of legacy/), so data/ and assets/ stay at repo root
 _BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 BASE_DIR = _BASE
+# Repo-root packages (shared/) importable when run from legacy/ (Docker copies shared/ into /app)
+if os.path.isdir(os.path.join(_BASE, "shared")) and _BASE not in sys.path:
+    sys.path.append(_BASE)
 # For Cloud Deployments with persistent storage, we read the DATA_DIR env variable
 # If not set (like local dev), we use the repo-root "data" folder.
 DATA_DIR = os.environ.get("DATA_DIR", os.path.join(BASE_DIR, "data"))
@@ -23,6 +27,9 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
 # FastAPI Backend URL
 API_URL = os.environ.get("API_URL", "http://localhost:8000")
+# /api/v1/data paging: rows per request, and optional comma-separated column projection (empty = all columns)
+API_PAGE_ROWS = int(os.environ.get("API_PAGE_ROWS", "100000") or 100000)
+API_DATA_COLUMNS = os.environ.get("API_DATA_COLUMNS", "").strip()
 
 # Files
 CUSTOMER_MASTER_FILE = os.path.join(MASTER_FOLDER, "customer_master.xlsx")
@@ -34,21 +41,5 @@ MONTHLY_SUMMARY_FILE = os.path.join(OUTPUT_FOLDER, "monthly_summary.xlsx")
 # Business Logic
 FY_START_MONTH = 4
 
-# Exclusion List (Material Groups to Ignore) - keyword match: row excluded if MATERIALGROUP contains any of these.
-# Keep in sync with backend/api/routes.py EXCLUDED_MATERIAL_GROUPS (exact names there).
-EXCLUDE_KEYWORDS = [
-    "SERVICE", "AIR VENT", "PACKING", "RAW", "BRASS", "PANEL",
-    "SALES ACCOUNT", "MASTER BATCH", "SEMI", "PPCP", "FIXED",
-    "PROTECTION", "HIPS", "ABS", "INDIRECT", "NYLOAN", "PP BLACK",
-    "NASER MILES PARIS", "DOCUMENT HOLDER",
-    "SWISS MILITARY MODLE MAZE",
-    "SELF ADHESIVE TIE MOUNT", "SCREW TYPE TIE MOUNT",
-    "FINISHED GOOD",  # Finished goods
-]
-
-# Rename Mappings (Standardizing Material Groups)
-MATERIAL_GROUP_MAPPINGS = {
-    r"CONDUIT.*GLAND": "POLYAMIDE CONDUIT GLAND",
-    r"REVER": "REVERSE FORWARD",
-    r"REVERSE FORWORD": "REVERSE FORWARD"
-}
+# Material group rules (renames, then keyword exclusion), shared with the backend upload pipeline
+from shared.material_rules import EXCLUDE_KEYWORDS, MATERIAL_GROUP_MAPPINGS  # noqa: E402
@@ -6,6 +6,10 @@ from sqlalchemy import text
 from datetime import datetime
 import config
 import pipeline_monitor
+from shared.date_enrichment import UNKNOWN_FY, add_date_columns, fy_label
+from shared.dict_encoding import mask_unique, text_value
+from shared.geo_resolver import fill_missing_states
+from shared.material_rules import apply_material_rules
 
 # Configure Logging
 log_handlers = [logging.StreamHandler()]
@@ -76,12 +80,8 @@ def standardize(df):
 def calculate_fy(date):
     """Calculates Financial Year from a date object."""
     if pd.isna(date):
-        return "UNKNOWN"
-    
-    if date.month >= config.FY_START_MONTH:
-        return f"FY{date.year % 100}-{(date.year + 1) % 100}"
-    else:
-        return f"FY{(date.year - 1) % 100}-{date.year % 100}"
+        return UNKNOWN_FY
+    return fy_label(date.year - (date.month < config.FY_START_MONTH))
 
 def ingest_raw_data():
     """Reads all Excel files from the raw folder and combines them."""
@@ -126,29 +126,21 @@ def clean_and_transform(df):
 
     initial_count = len(df)
 
-    # 2. Exclude Keywords (use any column that holds material group, same idea as backend)
+    # 2-3. Rename material groups, then exclude non-sales keywords (shared rules, same as the backend)
     grp_col = None
     for c in ["ITEM_NAME_GROUP", "MATERIALGROUP", "MATERIAL_GROUP", "PRODUCT_CATEGORY", "CATEGORY"]:
         if c in df.columns:
             grp_col = c
             break
     if grp_col:
-        for keyword in config.EXCLUDE_KEYWORDS:
-            df = df[~df[grp_col].astype(str).str.contains(keyword, case=False, na=False)]
+        df = apply_material_rules(df, grp_col)
     logging.info(f"Rows excluded by keywords: {initial_count - len(df)}")
 
-    # 3. Apply Mappings (same column as exclusion)
-    if grp_col:
-        for pattern, replacement in config.MATERIAL_GROUP_MAPPINGS.items():
-            df.loc[df[grp_col].astype(str).str.contains(pattern, case=False, na=False), grp_col] = replacement
-
     # 4. Add Financial Year
     if "DATE" in df.columns:
         df["DATE"] = pd.to_datetime(df["DATE"])
-        df["FINANCIAL_YEAR"] = df["DATE"].apply(calculate_fy)
-        # Create Month column for easy grouping
-        # Create Month column for easy grouping (MMM-YY)
-        df["MONTH"] = df["DATE"].dt.strftime("%b-%y").str.upper()
+        # FINANCIAL_YEAR + MONTH (MMM-YY) for easy grouping, vectorized (shared with the backend)
+        add_date_columns(df, "DATE", start_month=config.FY_START_MONTH)
 
     # 6. Ensure CITY column exists
     if "CITY" not in df.columns:
@@ -184,14 +176,15 @@ def calculate_taxes(df):
     company_state = "MAHARASHTRA"
     
     # Use the FINAL State column (after merge)
-    calc_state_series = df["STATE"].copy() if "STATE" in df.columns else pd.Series(["Unknown"] * len(df))
-    calc_state_series = calc_state_series.fillna("Unknown").str.upper().str.strip()
-    
     # 18% Tax Rate
     tax_rate = 0.18
         
-    # Logic: If State is Company State OR Unknown -> CGST/SGST (Intra)
-    intra_state = calc_state_series.isin([company_state, "UNKNOWN", "MAHARASHTRA", "STATE NOT FOUND", "State Not Found"])
+    # Logic: If State is Company State OR Unknown -> CGST/SGST (Intra); checked once per distinct STATE
+    intra_states = {company_state, "UNKNOWN", "STATE NOT FOUND"}
+    if "STATE" in df.columns:
+        intra_state = mask_unique(df["STATE"], lambda v: text_value(v, "Unknown", upper=True) in intra_states)
+    else:
+        intra_state = pd.Series(True, index=df.index)
     inter_state = ~intra_state
         
     # IGST
@@ -252,54 +245,13 @@ def merge_customer_master(sales_df):
 
     # ---------------------------------------------------------
     # FALLBACK LOGIC: GUESS STATE FROM CITY IF STILL MISSING
+    # (shared city index, resolved once per distinct city)
     # ---------------------------------------------------------
     if "STATE" not in sales_df.columns:
         sales_df["STATE"] = pd.NA
-        
-    CITY_STATE_MAP = {
-        "MUMBAI": "MAHARASHTRA",
-        "PUNE": "MAHARASHTRA",
-        "NAGPUR": "MAHARASHTRA",
-        "NASHIK": "MAHARASHTRA",
-        "THANE": "MAHARASHTRA",
-        "AURANGABAD": "MAHARASHTRA",
-        "DELHI": "DELHI",
-        "NEW DELHI": "DELHI",
-        "GURGAON": "HARYANA",
-        "NOIDA": "UTTAR PRADESH",
-        "BANGALORE": "KARNATAKA",
-        "BENGALURU": "KARNATAKA",
-        "CHENNAI": "TAMIL NADU",
-        "HYDERABAD": "TELANGANA",
-        "KOLKATA": "WEST BENGAL",
-        "AHMEDABAD": "GUJARAT",
-        "SURAT": "GUJARAT",
-        "VADODARA": "GUJARAT",
-        "JAIPUR": "RAJASTHAN",
-        "LUCKNOW": "UTTAR PRADESH",
-        "KANPUR": "UTTAR PRADESH",
-        "INDORE": "MADHYA PRADESH",
-        "BHOPAL": "MADHYA PRADESH",
-        "VAPI": "GUJARAT",
-        "CHANDIGARH": "CHANDIGARH",
-        "SECUNDERABAD": "TELANGANA",
-        "PANVEL": "MAHARASHTRA",
-        "BHIWANDI": "MAHARASHTRA",
-        "VASAI": "MAHARASHTRA",
-        "RAJKOT": "GUJARAT",
-        "HOSUR": "TAMIL NADU",
-        "BANGALORE": "KARNATAKA"
-    }
 
     if "CITY" in sales_df.columns:
-        # Fill missing states by looking up the city (case-insensitive)
-        def guess_state(row):
-            if pd.isna(row.get("STATE")) or str(row.get("STATE")).strip() == "" or "NOT FOUND" in str(row.get("STATE")).upper():
-                city = str(row.get("CITY", "")).upper().strip()
-                return CITY_STATE_MAP.get(city, "State Not Found")
-            return row["STATE"]
-            
-        sales_df["STATE"] = sales_df.apply(guess_state, axis=1)
+        sales_df = fill_missing_states(sales_df, placeholder="State Not Found")
     else:
         sales_df["STATE"] = sales_df["STATE"].fillna("State Not Found")
 
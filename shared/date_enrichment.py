@@ -0,0 +1,70 @@
+"""
+Vectorized FINANCIAL_YEAR / MONTH derivation from a DATE column, shared by the backend and the legacy ETL.
+
+Labels are computed once per distinct fiscal year / calendar month and broadcast back with integer codes,
+instead of formatting a string per row (Series.apply / dt.strftime):
+  FINANCIAL_YEAR  "FY24-25" for April 2024 .. March 2025 ("UNKNOWN" for missing dates)
+  MONTH           "APR-24" (strftime "%b-%y", upper case; missing for missing dates)
+"""
+import numpy as np
+import pandas as pd
+
+FY_START_MONTH = 4
+UNKNOWN_FY = "UNKNOWN"
+MONTH_ABBR = np.array(["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], dtype=object)
+
+
+def fy_label(start_year: int) -> str:
+    """Label of the fiscal year starting in start_year (same as the old per-row calculate_fy)."""
+    return f"FY{start_year % 100}-{(start_year + 1) % 100}"
+
+
+def _year_month(dates) -> tuple:
+    """(year, month, valid) integer arrays of a date-like Series/array; invalid entries are masked."""
+    dates = pd.to_datetime(pd.Series(dates), errors="coerce")
+    if getattr(dates.dtype, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    valid = dates.notna().to_numpy()
+    year = dates.dt.year.fillna(0).to_numpy(dtype=np.int64)
+    month = dates.dt.month.fillna(1).to_numpy(dtype=np.int64)
+    return year, month, valid
+
+
+def _labels_by_key(keys: np.ndarray, valid: np.ndarray, label, missing, index) -> pd.Series:
+    """Format label(key) once per distinct key and broadcast it to every row."""
+    out = np.full(len(keys), missing, dtype=object)
+    if valid.any():
+        uniques, inverse = np.unique(keys[valid], return_inverse=True)
+        table = np.array([label(int(k)) for k in uniques], dtype=object)
+        out[valid] = table[inverse]
+    return pd.Series(out, index=index)
+
+
+def financial_year(dates, start_month: int = FY_START_MONTH) -> pd.Series:
+    """FINANCIAL_YEAR label per date; fiscal years start on the 1st of start_month."""
+    index = dates.index if isinstance(dates, pd.Series) else None
+    year, month, valid = _year_month(dates)
+    start_year = year - (month < start_month)
+    return _labels_by_key(start_year, valid, fy_label, UNKNOWN_FY, index)
+
+
+def month_label(dates) -> pd.Series:
+    """MONTH label ("APR-24") per date; missing dates give a missing label."""
+    index = dates.index if isinstance(dates, pd.Series) else None
+    year, month, valid = _year_month(dates)
+    return _labels_by_key(
+        year * 12 + (month - 1), valid,
+        lambda k: f"{MONTH_ABBR[k % 12]}-{(k // 12) % 100:02d}",
+        np.nan, index,
+    )
+
+
+def add_date_columns(df: pd.DataFrame, date_col: str = "DATE", start_month: int = FY_START_MONTH, overwrite: bool = True) -> pd.DataFrame:
+    """Set FINANCIAL_YEAR and MONTH from df[date_col] (kept as is when present and overwrite=False)."""
+    if date_col not in df.columns:
+        return df
+    if overwrite or "FINANCIAL_YEAR" not in df.columns:
+        df["FINANCIAL_YEAR"] = financial_year(df[date_col], start_month)
+    if overwrite or "MONTH" not in df.columns:
+        df["MONTH"] = month_label(df[date_col])
+    return df
@@ -0,0 +1,52 @@
+"""
+Dictionary-encoded string cleanup for low-cardinality columns (STATE, CITY, CUSTOMER_NAME, material group).
+
+pd.factorize splits a column into integer codes and its distinct values once; the Python-level work
+(fillna/str/strip/upper, placeholder checks) then runs on the distinct values only and is broadcast back
+with Index.take, so a transform costs O(distinct values) string operations instead of O(rows).
+Results match the equivalent `.fillna(fill).astype(str).str.strip()` chains, dtype included.
+"""
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+
+def _encode(s: pd.Series) -> tuple:
+    """(codes, distinct values) with missing values kept as a distinct value (never code -1)."""
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    values = list(uniques)
+    if s.dtype == object and any(not isinstance(v, str) and not pd.isna(v) for v in values):
+        # factorize treats 5, 5.0 and True, 1 as one value; as text they differ, so encode mixed columns by str()
+        codes, uniques = pd.factorize(s.where(s.isna(), s.astype(str)), use_na_sentinel=False)
+        values = list(uniques)
+    return codes, values
+
+
+def map_unique(s: pd.Series, fn: Callable) -> pd.Series:
+    """fn applied to each distinct value of s (missing values included) and broadcast to every row."""
+    codes, values = _encode(s)
+    if not values:
+        return s.astype(str)
+    table = pd.Index([fn(v) for v in values], dtype=object)
+    if all(isinstance(v, str) for v in table):
+        table = table.astype(str)
+    return pd.Series(table.take(codes), index=s.index, name=s.name)
+
+
+def mask_unique(s: pd.Series, predicate: Callable) -> pd.Series:
+    """Boolean Series: predicate evaluated once per distinct value of s (missing values included)."""
+    codes, values = _encode(s)
+    table = np.fromiter((bool(predicate(v)) for v in values), dtype=bool, count=len(values))
+    return pd.Series(table[codes] if len(values) else np.zeros(len(s), dtype=bool), index=s.index, name=s.name)
+
+
+def text_value(value, fill: str = "", upper: bool = False) -> str:
+    """Scalar form of s.fillna(fill).astype(str).str.strip() (then .str.upper())."""
+    value = (fill if pd.isna(value) else str(value)).strip()
+    return value.upper() if upper else value
+
+
+def clean_text(s: pd.Series, fill: str = "", upper: bool = False) -> pd.Series:
+    """s.fillna(fill).astype(str).str.strip() (and .str.upper()), computed per distinct value."""
+    return map_unique(s, lambda v: text_value(v, fill, upper))
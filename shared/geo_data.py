@@ -77,6 +77,62 @@ CITY_COORDS = {
     "THRISSUR": [10.5276, 76.2144], "KOLLAM": [8.8932, 76.6141], "KANNUR": [11.8745, 75.3704]
 }
 
+# State of each city (upper case, as stored in STATE), for filling STATE from CITY (shared/geo_resolver.py).
+# Covers every CITY_COORDS entry plus common cities / old names that have no map coordinates.
+CITY_STATES = {
+    "MAHARASHTRA": [
+        "MUMBAI", "PUNE", "NAGPUR", "NASHIK", "THANE", "AURANGABAD", "SOLAPUR", "AMRAVATI", "KOLHAPUR",
+        "AKOLA", "JALGAON", "LATUR", "DHULE", "AHMEDNAGAR", "CHANDRAPUR", "PARBHANI", "SANGLI", "NANDED",
+        "MALEGAON", "JALNA", "BEED", "BOMBAY", "NAVI MUMBAI", "PANVEL", "BHIWANDI", "VASAI", "KALYAN",
+        "PIMPRI CHINCHWAD",
+    ],
+    "KARNATAKA": [
+        "BANGALORE", "BENGALURU", "MYSORE", "HUBLI", "DHARWAD", "MANGALORE", "BELGAUM", "GULBARGA",
+        "DAVANAGERE", "BELLARY", "BIJAPUR", "SHIMOGA", "TUMKUR", "UDUPI", "BIDAR", "MYSURU", "BELAGAVI",
+    ],
+    "TAMIL NADU": [
+        "CHENNAI", "COIMBATORE", "MADURAI", "TIRUCHIRAPPALLI", "SALEM", "TIRUNELVELI", "TIRUPPUR",
+        "THOOTHUKUDI", "NAGERCOIL", "THANJAVUR", "DINDIGUL", "VELLORE", "CUDDALORE", "KANCHIPURAM", "ERODE",
+        "MADRAS", "HOSUR",
+    ],
+    "GUJARAT": [
+        "AHMEDABAD", "SURAT", "VADODARA", "RAJKOT", "BHAVNAGAR", "JAMNAGAR", "JUNAGADH", "GANDHINAGAR",
+        "ANAND", "NAVSARI", "MORBI", "NADIAD", "BHARUCH", "PORBANDAR", "MEHSANA", "BARODA", "VAPI",
+        "ANKLESHWAR",
+    ],
+    "UTTAR PRADESH": [
+        "LUCKNOW", "KANPUR", "VARANASI", "AGRA", "MEERUT", "GHAZIABAD", "PRAYAGRAJ", "ALLAHABAD",
+        "BAREILLY", "ALIGARH", "MORADABAD", "SAHARANPUR", "GORAKHPUR", "NOIDA", "FIROZABAD", "JHANSI",
+        "MUZAFFARNAGAR", "MATHURA", "GREATER NOIDA",
+    ],
+    "TELANGANA": ["HYDERABAD", "WARANGAL", "NIZAMABAD", "KARIMNAGAR", "KHAMMAM", "RAMAGUNDAM", "SECUNDERABAD"],
+    "ANDHRA PRADESH": [
+        "VISAKHAPATNAM", "VIJAYAWADA", "GUNTUR", "NELLORE", "KURNOOL", "TIRUPATI", "RAJAHMUNDRY",
+        "KAKINADA", "ANANTAPUR", "VIZAG",
+    ],
+    "RAJASTHAN": ["JAIPUR", "JODHPUR", "KOTA", "BIKANER", "AJMER", "UDAIPUR", "BHILWARA", "ALWAR", "SRI GANGANAGAR"],
+    "MADHYA PRADESH": ["INDORE", "BHOPAL", "JABALPUR", "GWALIOR", "UJJAIN", "SAGAR", "DEWAS", "SATNA", "RATLAM"],
+    "WEST BENGAL": ["KOLKATA", "HOWRAH", "SILIGURI", "DURGAPUR", "ASANSOL", "CALCUTTA"],
+    "ODISHA": ["BHUBANESWAR", "CUTTACK"],
+    "BIHAR": ["PATNA", "GAYA"],
+    "JHARKHAND": ["RANCHI", "JAMSHEDPUR", "DHANBAD"],
+    "ASSAM": ["GUWAHATI"],
+    "TRIPURA": ["AGARTALA"],
+    "MEGHALAYA": ["SHILLONG"],
+    "DELHI": ["DELHI", "NEW DELHI"],
+    "CHANDIGARH": ["CHANDIGARH"],
+    "PUNJAB": ["LUDHIANA", "AMRITSAR", "JALANDHAR", "PATIALA", "MOHALI"],
+    "HARYANA": ["FARIDABAD", "GURGAON", "ROHTAK", "GURUGRAM", "PANIPAT", "SONIPAT"],
+    "HIMACHAL PRADESH": ["SHIMLA"],
+    "UTTARAKHAND": ["DEHRADUN"],
+    "JAMMU AND KASHMIR": ["SRINAGAR", "JAMMU"],
+    "KERALA": [
+        "THIRUVANANTHAPURAM", "KOCHI", "KOZHIKODE", "THRISSUR", "KOLLAM", "KANNUR", "TRIVANDRUM",
+        "COCHIN", "CALICUT",
+    ],
+    "GOA": ["PANAJI", "MARGAO", "VASCO DA GAMA"],
+}
+
 STATE_COORDS = {
     "Maharashtra": [19.7515, 75.7139], "Delhi": [28.7041, 77.1025], "Karnataka": [15.3173, 75.7139],
     "Gujarat": [22.2587, 71.1924], "Tamil Nadu": [11.1271, 78.6569], "Uttar Pradesh": [26.8467, 80.9462],
@@ -0,0 +1,97 @@
+"""
+CITY -> STATE resolution shared by the legacy ETL and the backend upload pipeline.
+
+The index is built once from shared.geo_data.CITY_STATES, keyed by normalized city name (upper case,
+dots dropped, whitespace collapsed). Rows are resolved per distinct city (shared/dict_encoding.py), so
+filling STATE costs one dict lookup per city rather than a Python call per row. Names the index does not
+know can be matched to the closest known city with difflib (typos such as "AHMEDABD"): pass
+fuzzy_cutoff, or set CITY_FUZZY_CUTOFF (0-1, default 0 = exact names only).
+"""
+import difflib
+import os
+import re
+from functools import lru_cache
+from typing import Optional
+
+import pandas as pd
+
+from shared.dict_encoding import map_unique, mask_unique
+from shared.geo_data import CITY_STATES
+
+_SEPARATORS = re.compile(r"[\s.]+")
+
+
+def default_fuzzy_cutoff() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.environ.get("CITY_FUZZY_CUTOFF", "0"))))
+    except ValueError:
+        return 0.0
+
+
+def normalize_city(value) -> str:
+    """Form cities are looked up by: "New  Delhi." -> "NEW DELHI"; missing -> ""."""
+    if value is None or pd.isna(value):
+        return ""
+    return _SEPARATORS.sub(" ", str(value)).strip().upper()
+
+
+@lru_cache(maxsize=1)
+def city_state_index() -> dict:
+    """Normalized city name -> STATE."""
+    return {normalize_city(city): state for state, cities in CITY_STATES.items() for city in cities}
+
+
+@lru_cache(maxsize=4096)
+def _closest_state(city: str, cutoff: float) -> Optional[str]:
+    index = city_state_index()
+    match = difflib.get_close_matches(city, index.keys(), n=1, cutoff=cutoff)
+    return index[match[0]] if match else None
+
+
+def state_for_city(value, fuzzy_cutoff: Optional[float] = None) -> Optional[str]:
+    """STATE of one city name, or None when unknown."""
+    city = normalize_city(value)
+    if not city:
+        return None
+    state = city_state_index().get(city)
+    cutoff = default_fuzzy_cutoff() if fuzzy_cutoff is None else fuzzy_cutoff
+    if state is None and cutoff > 0:
+        state = _closest_state(city, cutoff)
+    return state
+
+
+def resolve_states(cities: pd.Series, fuzzy_cutoff: Optional[float] = None) -> pd.Series:
+    """STATE per row of a CITY column (None where the city is unknown), looked up once per distinct city."""
+    return map_unique(cities, lambda v: state_for_city(v, fuzzy_cutoff))
+
+
+def _state_missing(value) -> bool:
+    if value is None or pd.isna(value):
+        return True
+    value = str(value).strip()
+    return value == "" or "NOT FOUND" in value.upper()
+
+
+def fill_missing_states(
+    df: pd.DataFrame,
+    state_col: str = "STATE",
+    city_col: str = "CITY",
+    placeholder: str = "State Not Found",
+    fuzzy_cutoff: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Where STATE is missing, blank or a "not found" placeholder, set it from CITY; rows whose city is
+    unknown get the placeholder. Other rows keep their STATE.
+    """
+    if df is None or df.empty or city_col not in df.columns:
+        return df
+    if state_col not in df.columns:
+        df[state_col] = None
+    missing = mask_unique(df[state_col], _state_missing).to_numpy()
+    if not missing.any():
+        return df
+    guessed = resolve_states(df.loc[missing, city_col], fuzzy_cutoff).fillna(placeholder)
+    if isinstance(df[state_col].dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(df[state_col]):
+        df[state_col] = df[state_col].astype(object)
+    df.loc[missing, state_col] = guessed.to_numpy(dtype=object)
+    return df
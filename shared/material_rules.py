@@ -0,0 +1,84 @@
+"""
+Material-group rules shared by the backend upload pipeline and the legacy ETL: renames, then keyword exclusion.
+
+  MATERIAL_GROUP_MAPPINGS  regex -> standard name, applied in order (case-insensitive "contains")
+  EXCLUDE_KEYWORDS         a row is dropped when its (renamed) group, whitespace-normalized and upper-cased,
+                           contains any of these
+
+The keywords are compiled into one alternation regex and the rules are evaluated once per distinct group
+value (a few hundred per upload, not one pass per keyword over every row); pd.factorize codes broadcast
+the keep/rename result back to the rows. Missing groups are kept unchanged.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+EXCLUDE_KEYWORDS = [
+    "SERVICE", "AIR VENT", "PACKING", "RAW", "BRASS", "PANEL",
+    "SALES ACCOUNT", "MASTER BATCH", "SEMI", "PPCP", "FIXED",
+    "PROTECTION", "HIPS", "ABS", "INDIRECT", "NYLOAN", "PP BLACK",
+    "NASER MILES PARIS", "DOCUMENT HOLDER",
+    "SWISS MILITARY MODLE MAZE",
+    "SELF ADHESIVE TIE MOUNT", "SCREW TYPE TIE MOUNT",
+    "FINISHED GOOD",
+]
+
+MATERIAL_GROUP_MAPPINGS = {
+    r"CONDUIT.*GLAND": "POLYAMIDE CONDUIT GLAND",
+    r"REVER": "REVERSE FORWARD",
+    r"REVERSE FORWORD": "REVERSE FORWARD",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def compile_exclusion(keywords=None):
+    """One case-insensitive regex matching any keyword as a substring."""
+    keywords = EXCLUDE_KEYWORDS if keywords is None else keywords
+    return re.compile("|".join(re.escape(k) for k in keywords), re.IGNORECASE)
+
+
+def compile_mappings(mappings=None) -> list:
+    mappings = MATERIAL_GROUP_MAPPINGS if mappings is None else mappings
+    return [(re.compile(pattern, re.IGNORECASE), name) for pattern, name in mappings.items()]
+
+
+_EXCLUDE = compile_exclusion()
+_MAPPINGS = compile_mappings()
+
+
+def normalize_group(value: str) -> str:
+    """Form the exclusion keywords are matched against: nbsp -> space, collapsed whitespace, upper case."""
+    return _WHITESPACE.sub(" ", value.replace("\u00a0", " ")).strip().upper()
+
+
+def resolve_group(value, mappings=None, exclusion=None) -> tuple:
+    """(keep, name) for one group value: name is the renamed value (the value itself when no rule matched)."""
+    mappings = _MAPPINGS if mappings is None else mappings
+    exclusion = _EXCLUDE if exclusion is None else exclusion
+    name = value
+    for pattern, replacement in mappings:
+        if pattern.search(str(name)):
+            name = replacement
+    return exclusion.search(normalize_group(str(name))) is None, name
+
+
+def apply_material_rules(df: pd.DataFrame, col: str, mappings=None, exclusion=None) -> pd.DataFrame:
+    """Rename df[col] by the mappings and drop excluded rows; rules run once per distinct value."""
+    if df is None or df.empty or col not in df.columns:
+        return df
+    codes, uniques = pd.factorize(df[col])
+    if len(uniques) == 0:
+        return df
+    values = list(uniques)
+    resolved = [resolve_group(v, mappings, exclusion) for v in values]
+    keep = np.fromiter((k for k, _ in resolved), dtype=bool, count=len(resolved))
+    renamed = np.fromiter((n is not v for (_, n), v in zip(resolved, values)), dtype=bool, count=len(resolved))
+    if renamed.any():
+        names = np.array([n for _, n in resolved], dtype=object)
+        rows = (codes >= 0) & renamed[codes]
+        df.loc[rows, col] = names[codes[rows]]
+    if keep.all():
+        return df
+    return df[(codes < 0) | keep[codes]]
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the legacy modules (`import config`), the backend package (`api`) and `shared` from the repo root
+_repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _path in (_repo_root, os.path.join(_repo_root, "legacy"), os.path.join(_repo_root, "backend")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    """Engine on TEST_DATABASE_URL, a scratch Postgres database whose sales_master tests replace; skipped when unset."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    try:
+        eng = sqlalchemy.create_engine(url)
+        with eng.connect():
+            pass
+    except Exception as e:
+        pytest.skip(f"TEST_DATABASE_URL unreachable: {e}")
+    yield eng
+    eng.dispose()
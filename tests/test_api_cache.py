@@ -0,0 +1,42 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from api import db, result_cache
+from api.result_cache import ResultCacheRoute, cached_result
+
+
+def _client(calls: list) -> TestClient:
+    router = APIRouter(route_class=ResultCacheRoute)
+
+    @router.get("/totals")
+    @cached_result
+    def totals(tenant_id: str = "default_elettro", states: str = ""):
+        calls.append(states)
+        return {"states": states, "n": len(calls)}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_etag_round_trips_to_304_until_data_changes():
+    """Same filters -> cached body and 304 on If-None-Match; an upload (version bump) recomputes."""
+    result_cache.clear()
+    calls = []
+    client = _client(calls)
+
+    first = client.get("/totals", params={"tenant_id": "t-etag", "states": "GOA,DELHI"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    # Filter order does not change the key; the endpoint does not run again
+    again = client.get("/totals", params={"tenant_id": "t-etag", "states": "DELHI,GOA"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert client.get("/totals", params={"tenant_id": "t-etag", "states": "GOA,DELHI"}).json() == first.json()
+    assert len(calls) == 1
+
+    db.bump_tenant_version("t-etag")
+    changed = client.get("/totals", params={"tenant_id": "t-etag", "states": "GOA,DELHI"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(calls) == 2
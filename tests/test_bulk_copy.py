@@ -0,0 +1,78 @@
+import io
+
+import pandas as pd
+from sqlalchemy import text
+
+from api import bulk_copy, db
+from api.bulk_copy import LineKeyer, line_keys
+
+from test_filter_index import sample_lines
+
+
+def _upload(n: int = 500) -> pd.DataFrame:
+    """Upload lines with many exact repeats, so occurrence numbers matter."""
+    df = sample_lines(n, seed=13).rename(columns={"ITEM_NAME_GROUP": "ITEMNAME"})
+    df["RATE"] = df["AMOUNT"] / df["QTY"]
+    return pd.concat([df, df.iloc[::3], df.iloc[::7]], ignore_index=True)
+
+
+def test_line_keyer_over_chunks_matches_whole_frame():
+    """Keying an upload chunk by chunk gives the keys line_keys gives the whole file."""
+    df = _upload()
+    keyer = LineKeyer()
+
+    chunked = pd.concat([keyer(df.iloc[start:start + 97]) for start in range(0, len(df), 97)])
+
+    expected = line_keys(df)
+    assert chunked.tolist() == expected.tolist()
+    assert expected.is_unique
+
+
+def test_line_keys_ignore_enrichment_and_label_padding():
+    """Keys depend on the source fields only, so re-processing a file with new STATE/CITY finds the same lines."""
+    df = _upload(200)
+    enriched = df.copy()
+    enriched["STATE"] = "PUNJAB"
+    enriched["CUSTOMER_NAME"] = " " + enriched["CUSTOMER_NAME"].str.lower() + " "
+
+    assert line_keys(enriched).tolist() == line_keys(df).tolist()
+
+
+def test_numeric_invoice_keys_do_not_depend_on_blank_neighbours():
+    """A blank invoice makes pandas read the column as float; the line must key the same as in an all-int chunk."""
+    csv = (
+        "INVOICE_NO,DATE,CUSTOMER_NAME,ITEMNAME,QTY,RATE,AMOUNT\n"
+        "1001,2024-05-02,ACME,GLAND,2,5,10\n"
+        ",2024-05-02,ACME,GLAND,1,5,5\n"
+    )
+    with_blank = pd.read_csv(io.StringIO(csv))
+    alone = pd.read_csv(io.StringIO(csv), nrows=1)
+    assert with_blank["INVOICE_NO"].dtype != alone["INVOICE_NO"].dtype
+
+    assert line_keys(with_blank).iloc[0] == line_keys(alone).iloc[0]
+    # Read back from a text column the float upload wrote
+    stored = alone.assign(INVOICE_NO="1001.0")
+    assert line_keys(stored).iloc[0] == line_keys(alone).iloc[0]
+
+
+def test_existing_table_gets_the_line_key_index_and_uploads_dedupe(pg_engine, monkeypatch):
+    """A sales_master the legacy ETL created (no LINE_KEY, a leftover INVALID index) is migrated, not refused."""
+    df = _upload(200)
+    legacy = df.iloc[:100].copy()
+    legacy.insert(0, "tenant_id", "t-legacy")
+    legacy.to_sql("sales_master", pg_engine, if_exists="replace", index=False)
+    with pg_engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX {bulk_copy.LINE_KEY_INDEX} ON sales_master (tenant_id)"))
+        conn.execute(text(f"UPDATE pg_index SET indisvalid = false WHERE indexrelid = '{bulk_copy.LINE_KEY_INDEX}'::regclass"))
+    monkeypatch.setattr(db, "_engine", pg_engine)
+    monkeypatch.setattr(bulk_copy, "_index_ready", False)
+
+    assert bulk_copy.ensure_line_key_index(pg_engine)
+    assert bulk_copy._line_key_index_state(pg_engine) == (True, True)
+
+    first = db.SalesUpload("t-legacy")
+    first.add(df.copy())
+    assert first.finish() == {"inserted": len(df) - 100, "skipped": 100}
+    again = db.SalesUpload("t-legacy")
+    again.add(df.copy())
+    assert again.finish() == {"inserted": 0, "skipped": len(df)}
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from api import customer_master, db, tenant_snapshot
+
+TENANT = "t-master"
+INTRA = {"MAHARASHTRA", "UNKNOWN", "STATE NOT FOUND"}
+RATE = 0.18
+
+
+@pytest.fixture
+def eng(pg_engine, monkeypatch):
+    monkeypatch.setattr(db, "_engine", pg_engine)
+    monkeypatch.setattr(customer_master, "get_engine", lambda: pg_engine)
+    customer_master.save_master(TENANT, pd.DataFrame({
+        "CUSTOMER_NAME": ["ACME", "GAMMA", "DELTA"],
+        "STATE": ["GOA", "MAHARASHTRA", None],
+        "CITY": ["PANAJI", "PUNE", "NAGPUR"],
+    }))
+    yield pg_engine
+    db.invalidate_tenant_cache(TENANT)
+
+
+def _store(eng, tax_columns) -> None:
+    rows = pd.DataFrame({
+        "tenant_id": [TENANT, TENANT, TENANT, TENANT, "t-other"],
+        "CUSTOMER_NAME": ["ACME", "GAMMA", "DELTA", "OMEGA", "ACME"],
+        "STATE": ["MAHARASHTRA", "GOA", "DELHI", "KERALA", "MAHARASHTRA"],
+        "CITY": ["MUMBAI", "PANAJI", "DELHI", "KOCHI", "MUMBAI"],
+        "AMOUNT": [100.0, 200.0, 300.0, 400.0, 500.0],
+    })
+    for col in tax_columns:
+        rows[col] = -1.0
+    rows.to_sql("sales_master", eng, if_exists="replace", index=False)
+
+
+def _rows(eng) -> pd.DataFrame:
+    with eng.connect() as conn:
+        df = pd.read_sql(text('SELECT * FROM sales_master ORDER BY tenant_id, "CUSTOMER_NAME"'), conn)
+    return df.set_index(["tenant_id", "CUSTOMER_NAME"])
+
+
+@pytest.mark.parametrize("tax_columns", [["IGST", "CGST", "SGST", "TAX", "TOTALAMOUNT"], ["TAX", "TOTALAMOUNT"], []])
+def test_reenrich_sales_applies_master_and_taxes(eng, tax_columns):
+    """STATE / CITY come from the master, taxes follow the new STATE, other customers and tenants are untouched."""
+    _store(eng, tax_columns)
+    with eng.connect() as conn:
+        before = tenant_snapshot.revision(conn, TENANT)
+
+    assert customer_master.reenrich_sales(TENANT, INTRA, RATE) == 3
+
+    got = _rows(eng)
+    assert got.loc[(TENANT, "ACME"), ["STATE", "CITY"]].tolist() == ["GOA", "PANAJI"]
+    assert got.loc[(TENANT, "GAMMA"), ["STATE", "CITY"]].tolist() == ["MAHARASHTRA", "PUNE"]
+    # No STATE in the master: the stored one stays
+    assert got.loc[(TENANT, "DELTA"), ["STATE", "CITY"]].tolist() == ["DELHI", "NAGPUR"]
+    assert got.loc[(TENANT, "OMEGA"), "STATE"] == "KERALA"
+    assert got.loc[("t-other", "ACME"), "STATE"] == "MAHARASHTRA"
+    expected = {
+        # customer: (IGST, CGST, SGST) for the new STATE
+        "ACME": (100 * RATE, 0, 0),
+        "GAMMA": (0, 200 * RATE / 2, 200 * RATE / 2),
+        "DELTA": (300 * RATE, 0, 0),
+    }
+    for name, (igst, cgst, sgst) in expected.items():
+        row = got.loc[(TENANT, name)]
+        for col, value in {"IGST": igst, "CGST": cgst, "SGST": sgst}.items():
+            if col in tax_columns:
+                assert row[col] == pytest.approx(value), (name, col)
+        if "TAX" in tax_columns:
+            assert row["TAX"] == pytest.approx(row["AMOUNT"] * RATE)
+            assert row["TOTALAMOUNT"] == pytest.approx(row["AMOUNT"] * (1 + RATE))
+    for col in tax_columns:
+        assert got.loc[(TENANT, "OMEGA"), col] == -1.0
+    with eng.connect() as conn:
+        assert tenant_snapshot.revision(conn, TENANT) == before + 1
+
+    # Nothing left to change: no update, no revision bump
+    assert customer_master.reenrich_sales(TENANT, INTRA, RATE) == 0
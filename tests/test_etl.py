@@ -57,4 +57,18 @@ def test_missing_state_fallback():
     merged_df = merge_customer_master(df)
     
     assert merged_df.loc[0, "STATE"] == "MAHARASHTRA", "Mumbai should map to Maharashtra"
-    assert "NOT FOUND" in merged_df.loc[1, "STATE"], "Unknown city should trigger fallback warning"
+    assert "NOT FOUND" in merged_df.loc[1, "STATE"].upper(), "Unknown city should trigger fallback warning"
+
+def test_city_state_resolution():
+    """Missing states are filled from the shared city index; typos only match with fuzzy matching on."""
+    from shared.geo_resolver import fill_missing_states
+
+    df = pd.DataFrame({
+        "CITY": [" new  delhi. ", "Hosur", "AHMEDABD", "PUNE"],
+        "STATE": [None, "", "State Not Found", "GUJARAT"],
+    })
+    exact = fill_missing_states(df.copy())
+    assert exact["STATE"].tolist() == ["DELHI", "TAMIL NADU", "State Not Found", "GUJARAT"]
+
+    fuzzy = fill_missing_states(df.copy(), fuzzy_cutoff=0.85)
+    assert fuzzy.loc[2, "STATE"] == "GUJARAT", "Close misspelling should resolve with fuzzy matching"
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.db import _normalize_tenant_frame, date_range_positions
+from api.filter_index import FilterIndex
+
+
+def sample_lines(n: int = 600, seed: int = 7) -> pd.DataFrame:
+    """Raw tenant lines with missing labels, padded labels and undated rows."""
+    rng = np.random.default_rng(seed)
+
+    def pick(values):
+        return [values[i] for i in rng.integers(0, len(values), n)]
+
+    dates = pd.Series(pd.to_datetime("2023-01-01") + pd.to_timedelta(rng.integers(0, 900, n), unit="D"))
+    dates[rng.random(n) < 0.05] = pd.NaT
+    return pd.DataFrame({
+        "DATE": dates,
+        "STATE": pick(["GOA", " GOA ", "DELHI", None, "KERALA ", "State Not Found"]),
+        "CITY": pick(["PANAJI", "NEW DELHI", " KOCHI", None, "MARGAO"]),
+        "CUSTOMER_NAME": pick(["ACME", "ACME ", "BETA TRADERS", "GAMMA", None]),
+        "ITEM_NAME_GROUP": pick(["CABLE TIE", "GLAND", " GLAND", None]),
+        "INVOICE_NO": [f"INV{i}" for i in rng.integers(0, n // 3, n)],
+        "AMOUNT": rng.integers(1, 1000, n).astype(float),
+        "QTY": rng.integers(1, 50, n),
+    })
+
+
+def _items(value) -> list:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+def reference_filter(df, start_date=None, end_date=None, states=None, cities=None, customers=None,
+                     material_groups=None, fiscal_years=None, months=None) -> pd.DataFrame:
+    """Boolean-mask filtering as routes.apply_filters / get_tenant_data did before the index."""
+    mask = pd.Series(True, index=df.index)
+    if start_date:
+        mask &= df["DATE"] >= pd.to_datetime(start_date)
+    if end_date:
+        mask &= df["DATE"] < pd.to_datetime(end_date) + pd.Timedelta(days=1)
+    for value, col in ((states, "STATE"), (cities, "CITY"), (customers, "CUSTOMER_NAME"),
+                       (material_groups, "ITEM_NAME_GROUP"), (months, "MONTH")):
+        if _items(value):
+            mask &= df[col].isin(_items(value))
+    if _items(fiscal_years):
+        fy_set = set()
+        for f in _items(fiscal_years):
+            fy_set.add(f)
+            fy_set.add(f[2:].strip() if f.upper().startswith("FY") and len(f) > 2 else "FY" + f)
+        mask &= df["FINANCIAL_YEAR"].astype(str).str.strip().isin(fy_set)
+    return df[mask.to_numpy()]
+
+
+CASES = [
+    {},
+    {"states": "GOA"},
+    {"states": " GOA , DELHI ,", "cities": "PANAJI,NEW DELHI"},
+    {"states": "State Not Found", "customers": "ACME"},
+    {"customers": "ACME,GAMMA", "material_groups": "GLAND", "months": "MAR-24,APR-24"},
+    {"fiscal_years": "24-25", "states": "KERALA"},
+    {"fiscal_years": "FY23-24,24-25", "cities": "KOCHI"},
+    {"fiscal_years": "UNKNOWN"},
+    {"states": "NOWHERE"},
+    {"states": " , ", "cities": ""},
+    {"start_date": "2023-06-01", "end_date": "2024-02-29", "states": "GOA,DELHI"},
+    {"start_date": "2024-03-15", "material_groups": "CABLE TIE"},
+    {"end_date": "2023-12-31", "fiscal_years": "FY23-24"},
+]
+
+
+@pytest.mark.parametrize("filters", CASES)
+def test_index_matches_boolean_masks(filters):
+    """FilterIndex rows equal the pandas masks on the normalized cache frame (NaN, NaT, padded labels)."""
+    df = _normalize_tenant_frame(sample_lines())
+    dates = {k: filters.pop(k) for k in ("start_date", "end_date") if k in filters}
+    lo, hi = date_range_positions(df["DATE"].to_numpy(), dates.get("start_date"), dates.get("end_date"))
+
+    got = FilterIndex(df).take(df, lo, hi, **filters)
+    expected = reference_filter(df, **dates, **filters)
+
+    pd.testing.assert_frame_equal(got, expected)
+
+
+@pytest.mark.parametrize("filters", [c for c in CASES if "start_date" not in c and "end_date" not in c])
+def test_index_matches_boolean_masks_on_raw_labels(filters):
+    """Unnormalized object columns: padded labels only match themselves, exactly like isin()."""
+    df = sample_lines()
+    df["MONTH"] = df["DATE"].dt.strftime("%b-%y").str.upper()
+    df["FINANCIAL_YEAR"] = np.where(
+        df["DATE"].isna(), "UNKNOWN",
+        "FY" + (df["DATE"].dt.year - (df["DATE"].dt.month < 4)).astype("Int64").astype(str).str[-2:]
+        + "-" + (df["DATE"].dt.year + (df["DATE"].dt.month >= 4)).astype("Int64").astype(str).str[-2:],
+    )
+
+    got = FilterIndex(df).take(df, **filters)
+    expected = reference_filter(df, **filters)
+
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_fiscal_year_prefix_is_case_insensitive():
+    """The one intended difference from the masks: "fy24-25" selects the "FY24-25" rows like "24-25" does."""
+    df = _normalize_tenant_frame(sample_lines())
+    index = FilterIndex(df)
+
+    pd.testing.assert_frame_equal(index.take(df, fiscal_years="fy24-25"), reference_filter(df, fiscal_years="24-25"))
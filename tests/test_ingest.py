@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from api import ingest
+
+CSV = (
+    "Invoice No,Date,Customer,Amount\n"
+    "1001,13/05/2024,ACME,100\n"
+    "1002,02/05/2024,BETA,250.5\n"
+    ",15/06/2024,GAMMA,75\n"
+    "1004,02/05/2024,ACME,20\n"
+    "INV-5,15/06/2024,BETA,10\n"
+)
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text(CSV)
+    return str(path)
+
+
+def _read(path: str, chunk_rows: int) -> pd.DataFrame:
+    dates = ingest.DateParser()
+    frames = []
+    for frame in ingest.iter_upload_frames(path, "sales.csv", chunk_rows=chunk_rows):
+        frame["Date"] = dates(frame["Date"])
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3])
+def test_chunks_parse_dates_like_the_whole_file(upload, chunk_rows):
+    """The whole-file format (day first, from "13/05/2024") applies to every chunk."""
+    whole = _read(upload, 100)
+    assert whole["Date"].tolist() == [pd.Timestamp(d) for d in ("2024-05-13", "2024-05-02", "2024-06-15", "2024-05-02", "2024-06-15")]
+
+    assert _read(upload, chunk_rows)["Date"].tolist() == whole["Date"].tolist()
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3])
+def test_chunks_keep_the_first_chunks_numeric_columns(upload, chunk_rows):
+    """Blank invoices do not turn the column into float; a text invoice keeps its value."""
+    chunked = _read(upload, chunk_rows)
+
+    assert chunked["Amount"].astype("float64").tolist() == [100.0, 250.5, 75.0, 20.0, 10.0]
+    invoices = [None if pd.isna(v) else str(v) for v in chunked["Invoice No"]]
+    assert invoices == ["1001", "1002", None, "1004", "INV-5"]
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.db import _normalize_tenant_frame, date_range_positions
+from api.sales_cube import SalesCube, aggregate, rollup
+
+from test_filter_index import reference_filter, sample_lines
+
+AGGS = dict(
+    total=("AMOUNT", "sum"),
+    qty=("QTY", "sum"),
+    avg=("AMOUNT", "mean"),
+    lines=("AMOUNT", "size"),
+    orders=("INVOICE_NO", "nunique"),
+)
+
+CASES = [
+    {},
+    {"states": "GOA,DELHI"},
+    {"customers": "ACME", "material_groups": "GLAND,CABLE TIE"},
+    {"fiscal_years": "FY24-25", "cities": "PANAJI,KOCHI"},
+    {"start_date": "2023-04-01", "end_date": "2024-03-31"},
+    {"start_date": "2024-01-01", "end_date": "2024-06-30", "states": "KERALA,State Not Found"},
+    {"states": "NOWHERE"},
+]
+
+
+@pytest.fixture(scope="module")
+def lines():
+    return _normalize_tenant_frame(sample_lines(2000, seed=11))
+
+
+def _slice(cube, filters):
+    filters = dict(filters)
+    dates = [filters.pop(k, None) for k in ("start_date", "end_date")]
+    lo, hi = date_range_positions(cube.cells["DATE"].to_numpy(), *dates)
+    return cube.slice(lo, hi, **filters)
+
+
+@pytest.mark.parametrize("by", ["STATE", "MONTH", ["FINANCIAL_YEAR", "CUSTOMER_NAME"]])
+@pytest.mark.parametrize("filters", CASES)
+def test_rollup_matches_groupby_on_lines(lines, filters, by):
+    """Cube rollups over month-aligned ranges equal the groupby over the filtered raw lines."""
+    got = rollup(_slice(SalesCube(lines), filters), by, **AGGS)
+    expected = reference_filter(lines, **filters).groupby(by, observed=True).agg(**AGGS)
+
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("filters", CASES)
+def test_aggregate_matches_lines(lines, filters):
+    """Grand totals, distinct invoices and distinct customers equal the raw-line answers."""
+    aggs = dict(total=("AMOUNT", "sum"), qty=("QTY", "sum"), orders=("INVOICE_NO", "nunique"),
+                customers=("CUSTOMER_NAME", "nunique"))
+    got = aggregate(_slice(SalesCube(lines), filters), **aggs)
+    expected = aggregate(reference_filter(lines, **filters), **aggs)
+
+    assert got.keys() == expected.keys()
+    for name in aggs:
+        assert np.isclose(got[name], expected[name]), name
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from shared.date_enrichment import add_date_columns
+
+
+def _reference_fy(date):
+    """Per-row FINANCIAL_YEAR as the ETL computed it before shared.date_enrichment."""
+    if pd.isna(date):
+        return "UNKNOWN"
+    if date.month >= 4:
+        return f"FY{date.year % 100}-{(date.year + 1) % 100}"
+    return f"FY{(date.year - 1) % 100}-{date.year % 100}"
+
+
+def test_date_columns_match_per_row_labels():
+    """Vectorized FINANCIAL_YEAR / MONTH equal the old apply(calculate_fy) / strftime labels, NaT included."""
+    from etl_pipeline import calculate_fy
+
+    dates = pd.Series(pd.to_datetime([
+        "1999-03-31", "1999-04-01", "2000-01-15", "2009-12-31", "2024-03-31", "2024-04-01", None, "2025-11-30",
+    ]))
+    df = add_date_columns(pd.DataFrame({"DATE": dates}))
+
+    assert df["FINANCIAL_YEAR"].tolist() == [_reference_fy(d) for d in dates]
+    assert [calculate_fy(d) for d in dates] == [_reference_fy(d) for d in dates]
+    expected_month = dates.dt.strftime("%b-%y").str.upper()
+    assert df["MONTH"].isna().tolist() == expected_month.isna().tolist()
+    assert df["MONTH"].dropna().tolist() == expected_month.dropna().tolist()
+
+
+def _reference_material_rules(df, col, mappings, keywords):
+    """Backend upload rules before shared.material_rules: one str.contains pass per mapping / keyword."""
+    for pattern, replacement in mappings.items():
+        df.loc[df[col].astype(str).str.contains(pattern, case=False, na=False), col] = replacement
+    norm = df[col].astype(str).str.replace("\u00a0", " ", regex=False).str.replace(r"\s+", " ", regex=True).str.strip().str.upper()
+    mask = pd.Series(False, index=df.index)
+    for keyword in keywords:
+        mask = mask | norm.str.contains(keyword, case=False, na=False)
+    return df[~mask]
+
+
+def test_material_rules_match_legacy_config():
+    """Legacy config re-exports the shared rules; one pass per distinct value equals the per-keyword passes."""
+    import config
+    from shared.material_rules import EXCLUDE_KEYWORDS, MATERIAL_GROUP_MAPPINGS, apply_material_rules
+
+    assert config.EXCLUDE_KEYWORDS is EXCLUDE_KEYWORDS
+    assert config.MATERIAL_GROUP_MAPPINGS is MATERIAL_GROUP_MAPPINGS
+
+    groups = ["Cable Tie", "conduit  gland", "Rever switch", "AIR  VENT", "AIR\u00a0VENT", "brass insert", "semi finished",
+              None, np.nan, "  panel ", "MCB", "Nyloan", "finished goods", 5]
+    df = pd.DataFrame({"GRP": groups * 3, "N": range(len(groups) * 3)})
+    expected = _reference_material_rules(df.copy(), "GRP", config.MATERIAL_GROUP_MAPPINGS, config.EXCLUDE_KEYWORDS)
+    pd.testing.assert_frame_equal(apply_material_rules(df.copy(), "GRP"), expected)
+
+
+def test_legacy_etl_renames_before_excluding():
+    """clean_and_transform follows the backend order: a renamed group is kept even if its raw name has a keyword."""
+    from etl_pipeline import clean_and_transform
+
+    df = pd.DataFrame({
+        "MATERIAL GROUP": ["REVERSE BRASS", "BRASS INSERT", "Conduit Gland", "CABLE TIE"],
+        "AMOUNT": [1.0, 2.0, 3.0, 4.0],
+    })
+    out = clean_and_transform(df)
+    assert out["MATERIAL_GROUP"].tolist() == ["REVERSE FORWARD", "POLYAMIDE CONDUIT GLAND", "CABLE TIE"]
+
+
+def test_dict_encoding_matches_elementwise():
+    """map_unique / mask_unique / clean_text equal element-wise apply, with NaN, None and mixed numbers."""
+    from shared.dict_encoding import clean_text, map_unique, mask_unique
+
+    s = pd.Series([" Pune ", None, np.nan, 5, 5.0, True, 1, "pune", " Pune ", ""], dtype=object)
+    expected = s.fillna("").astype(str).str.strip()
+    pd.testing.assert_series_equal(clean_text(s), expected)
+    pd.testing.assert_series_equal(clean_text(s, "Unknown", upper=True), s.fillna("Unknown").astype(str).str.strip().str.upper())
+
+    fn = lambda v: "missing" if pd.isna(v) else repr(v)
+    assert map_unique(s, fn).tolist() == [fn(v) for v in s.astype(str).where(s.notna(), None)]
+
+    predicate = lambda v: pd.isna(v) or str(v).strip() == ""
+    assert mask_unique(s, predicate).tolist() == [predicate(v) for v in s]
+
+    strings = pd.Series(["b", None, "a", "b"], dtype="str")
+    pd.testing.assert_series_equal(clean_text(strings, upper=True), strings.fillna("").astype(str).str.strip().str.upper())
+    assert mask_unique(pd.Series([], dtype=object), bool).tolist() == []
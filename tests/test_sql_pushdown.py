@@ -0,0 +1,85 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import db, sql_pushdown
+from api.routes import BATCH_WIDGETS, router
+
+from test_filter_index import sample_lines
+
+TENANT = "t-pushdown"
+
+ENDPOINTS = [
+    "/filters/options", "/metrics/summary", "/charts/trend", "/charts/material-groups", "/charts/top-customers",
+    "/sales/monthly", "/sales/daily", "/sales/growth", "/customers/all", "/customers/rfm",
+    "/geographic/states", "/geographic/cities", "/materials/performance", "/materials/pareto", "/data/health",
+]
+
+FILTERS = [
+    {},
+    {"states": "GOA,DELHI", "start_date": "2023-06-01", "end_date": "2024-02-29"},
+    {"fiscal_years": "FY24-25", "material_groups": "GLAND"},
+    {"customers": "ACME,GAMMA", "months": "MAR-24,APR-24,MAY-24"},
+]
+
+
+@pytest.fixture(scope="module")
+def engine(pg_engine):
+    rows = sample_lines(3000, seed=13)
+    # Enough customers for the RFM quartiles
+    dealers = rows.index % 2 == 1
+    rows.loc[dealers, "CUSTOMER_NAME"] = [f"DEALER {i % 37:02d}" for i in rows.index[dealers]]
+    rows.insert(0, "tenant_id", TENANT)
+    rows.to_sql(sql_pushdown.TABLE, pg_engine, if_exists="replace", index=False)
+    db.invalidate_tenant_cache(TENANT)
+    return pg_engine
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    monkeypatch.setattr(db, "_engine", engine)
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    yield TestClient(app)
+    db.invalidate_tenant_cache(TENANT)
+
+
+def _responses(client, monkeypatch, min_rows: int) -> dict:
+    monkeypatch.setenv("SQL_PUSHDOWN_MIN_ROWS", str(min_rows))
+    db.invalidate_tenant_cache(TENANT)
+    out = {}
+    for filters in FILTERS:
+        for path in ENDPOINTS:
+            resp = client.get(f"/api{path}", params={"tenant_id": TENANT, **filters})
+            out[path, tuple(sorted(filters.items()))] = (resp.status_code, resp.json())
+        resp = client.post("/api/query/batch", json={"tenant_id": TENANT, **filters, "widgets": sorted(BATCH_WIDGETS)})
+        out["/query/batch", tuple(sorted(filters.items()))] = (resp.status_code, resp.json())
+    resp = client.get("/api/v1/data", params={"tenant_id": TENANT, "columns": "DATE,STATE,INVOICE_NO,AMOUNT"})
+    out["/v1/data", ()] = (resp.status_code, resp.text)
+    return out
+
+
+def _same(got, expected) -> bool:
+    """JSON equality, with float sums compared approximately (Postgres and pandas add in different orders)."""
+    if isinstance(expected, float) or isinstance(got, float):
+        return got == pytest.approx(expected, rel=1e-9)
+    if isinstance(expected, dict):
+        return isinstance(got, dict) and got.keys() == expected.keys() and all(_same(got[k], expected[k]) for k in expected)
+    if isinstance(expected, list):
+        return isinstance(got, list) and len(got) == len(expected) and all(_same(g, e) for g, e in zip(got, expected))
+    return got == expected
+
+
+def test_pushdown_responses_equal_the_in_memory_path(client, monkeypatch):
+    """Every pushdown endpoint answers like the cached frame, and the tenant is never loaded into the cache."""
+    expected = _responses(client, monkeypatch, min_rows=0)
+    got = _responses(client, monkeypatch, min_rows=1)
+
+    assert isinstance(db.get_sql_pushdown(TENANT), sql_pushdown.SqlAggregates)
+    assert db._cache_get(TENANT) is None
+    assert got.keys() == expected.keys()
+    for key in expected:
+        assert expected[key][0] == 200, key
+        if key[0] == "/query/batch":
+            assert expected[key][1]["errors"] == {}, key
+        assert _same(got[key], expected[key]), key
@@ -0,0 +1,86 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from api import db, tenant_snapshot
+from api.db import TenantFrame, _append_rows, _normalize_tenant_frame
+from api.sales_cube import rollup
+
+from test_filter_index import sample_lines
+
+
+def _split_upload(seed: int = 3):
+    """(cached lines, uploaded lines): the upload brings undated rows and a state the cache has never seen."""
+    raw = sample_lines(900, seed=seed)
+    old, new = raw.iloc[:700].copy(), raw.iloc[700:].copy()
+    new.loc[new.index[:7], "STATE"] = "PUNJAB"
+    return old, new
+
+
+def test_append_rows_equals_full_reload():
+    """Cached frame + appended upload is the frame a full reload of old + new rows would build."""
+    old, new = _split_upload()
+    reloaded = _normalize_tenant_frame(pd.concat([old, new], ignore_index=True))
+
+    patched = _append_rows(_normalize_tenant_frame(old.copy()), new.copy())
+
+    assert patched.attrs["sorted_by"] == "DATE"
+    # Non-dimension categories are appended rather than re-sorted, so compare values, not category order
+    pd.testing.assert_frame_equal(patched, reloaded, check_categorical=False)
+    assert list(patched["STATE"].cat.categories) == list(reloaded["STATE"].cat.categories)
+
+
+def test_only_dimensions_and_item_names_are_categorical():
+    """Repeating text outside the dashboard dimensions (INVOICE_NO, free-form columns) stays as strings."""
+    raw = sample_lines(300, seed=5)
+    raw["ITEMNAME"] = raw["ITEM_NAME_GROUP"]
+    raw["REMARKS"] = "OK"
+    raw["tenant_id"] = "t-dtypes"
+
+    df = _normalize_tenant_frame(raw)
+
+    categorical = {c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+    assert categorical == {"STATE", "CITY", "CUSTOMER_NAME", "ITEM_NAME_GROUP", "ITEMNAME", "MONTH", "FINANCIAL_YEAR"}
+    assert df["INVOICE_NO"].tolist() == raw.sort_values("DATE", kind="stable", na_position="last")["INVOICE_NO"].tolist()
+    assert "tenant_id" not in df.columns
+
+
+def test_patch_tenant_cache_serves_what_a_reload_would():
+    """After patch_tenant_cache, filtered lines and cube rollups equal those of a freshly loaded frame."""
+    tenant = "t-patch"
+    old, new = _split_upload(seed=5)
+    reloaded = TenantFrame(_normalize_tenant_frame(pd.concat([old, new], ignore_index=True)))
+    db._cache_put(tenant, TenantFrame(_normalize_tenant_frame(old.copy())), db._generations.get(tenant, 0))
+    try:
+        assert db.patch_tenant_cache(tenant, new.copy())
+        patched = db._cache_get(tenant)
+
+        filters = dict(states="PUNJAB,GOA", material_groups="GLAND")
+        pd.testing.assert_frame_equal(
+            patched.index.take(patched.df, **filters), reloaded.index.take(reloaded.df, **filters),
+            check_categorical=False,
+        )
+        pd.testing.assert_frame_equal(
+            rollup(patched.cube.slice(**filters), "STATE", total=("AMOUNT", "sum"), orders=("INVOICE_NO", "nunique")),
+            rollup(reloaded.cube.slice(**filters), "STATE", total=("AMOUNT", "sum"), orders=("INVOICE_NO", "nunique")),
+        )
+    finally:
+        db.invalidate_tenant_cache(tenant)
+
+
+def test_append_rows_rejects_schema_drift():
+    old, new = _split_upload()
+    new["NEW_COLUMN"] = "x"
+    with pytest.raises(ValueError):
+        _append_rows(_normalize_tenant_frame(old.copy()), new)
+
+
+def test_snapshot_setting_without_pyarrow_fails_startup(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setenv("TENANT_SNAPSHOT_DIR", str(tmp_path))
+    with pytest.raises(RuntimeError, match="pyarrow"):
+        tenant_snapshot.check_config()
+
+    monkeypatch.setenv("TENANT_SNAPSHOT_DIR", "")
+    tenant_snapshot.check_config()
@@ -0,0 +1,105 @@
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from api import db, tenant_snapshot
+
+from test_filter_index import sample_lines
+
+TENANT = "t-snapshot"
+
+
+@pytest.fixture
+def eng(pg_engine, monkeypatch, tmp_path):
+    """sales_master with _row_id holding one tenant, snapshots on in tmp_path."""
+    rows = sample_lines(400, seed=17)
+    rows["LINE_NO"] = range(len(rows))
+    rows.insert(0, "tenant_id", TENANT)
+    rows.to_sql("sales_master", pg_engine, if_exists="replace", index=False)
+    tenant_snapshot.forget_row_id_column()
+    assert tenant_snapshot.ensure_row_id_column(pg_engine, create=True)
+    monkeypatch.setenv("TENANT_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(db, "_engine", pg_engine)
+    yield pg_engine
+    db.invalidate_tenant_cache(TENANT)
+    tenant_snapshot.forget_row_id_column()
+
+
+def _insert(conn, line_no: int) -> None:
+    conn.execute(text(
+        'INSERT INTO sales_master (tenant_id, "DATE", "STATE", "INVOICE_NO", "AMOUNT", "QTY", "LINE_NO") '
+        "VALUES (:tid, '2024-05-02', 'GOA', :inv, 10.0, 1, :n)"
+    ), {"tid": TENANT, "inv": f"NEW{line_no}", "n": line_no})
+
+
+def _stored_lines(eng) -> list:
+    with eng.connect() as conn:
+        return sorted(r[0] for r in conn.execute(
+            text('SELECT "LINE_NO" FROM sales_master WHERE tenant_id = :tid'), {"tid": TENANT}
+        ))
+
+
+def _load() -> pd.DataFrame:
+    return db._load_tenant_frame(TENANT).df
+
+
+def _full_reload(monkeypatch) -> pd.DataFrame:
+    with monkeypatch.context() as m:
+        m.setenv("TENANT_SNAPSHOT_DIR", "")
+        return _load()
+
+
+def _commit_after_select(monkeypatch, writer):
+    """Commit writer between the loader's SELECT and everything it does with the rows."""
+    high_water = tenant_snapshot.high_water
+
+    def commit_then(raw):
+        writer.commit()
+        return high_water(raw)
+    monkeypatch.setattr(tenant_snapshot, "high_water", commit_then)
+
+
+def test_snapshot_plus_delta_equals_full_reload(eng, monkeypatch):
+    _load()
+    assert os.path.exists(tenant_snapshot.snapshot_path(TENANT))
+    with eng.begin() as conn:
+        for n in (1000, 1001, 1002):
+            _insert(conn, n)
+
+    reads = []
+    read = tenant_snapshot.read
+    monkeypatch.setattr(tenant_snapshot, "read", lambda *a: reads.append(read(*a)) or reads[-1])
+    patched = _load()
+
+    assert reads and reads[0] is not None, "expected the snapshot + delta path"
+    pd.testing.assert_frame_equal(patched, _full_reload(monkeypatch), check_categorical=False)
+
+
+def test_in_place_update_discards_the_snapshot(eng, monkeypatch):
+    _load()
+    with eng.begin() as conn:
+        conn.execute(text('UPDATE sales_master SET "AMOUNT" = "AMOUNT" + 1 WHERE tenant_id = :tid'), {"tid": TENANT})
+        tenant_snapshot.bump_revision(conn, TENANT)
+
+    with eng.connect() as conn:
+        assert tenant_snapshot.read(conn, TENANT, 0) is None
+    pd.testing.assert_frame_equal(_load(), _full_reload(monkeypatch), check_categorical=False)
+
+
+@pytest.mark.parametrize("from_snapshot", [False, True])
+def test_row_committed_below_the_high_water_mark_is_not_lost(eng, monkeypatch, from_snapshot):
+    """A lower _row_id committing after the load's SELECT must not leave a snapshot that skips it forever."""
+    if from_snapshot:
+        _load()
+    with eng.connect() as writer:
+        writer.begin()
+        _insert(writer, 2001)  # takes the lower _row_id, commits late
+        with eng.begin() as conn:
+            _insert(conn, 2002)
+        with monkeypatch.context() as m:
+            _commit_after_select(m, writer)
+            _load()
+
+    assert sorted(_load()["LINE_NO"]) == _stored_lines(eng)
@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+
+from api import db, ingest, jobs
+from api.routes import _transform_upload_files, _upload_job
+
+
+def _wait(job: "jobs.Job", timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while job.to_dict()["status"] not in jobs.FINISHED and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return job.to_dict()
+
+
+def test_failed_upload_reports_committed_counts(tmp_path, monkeypatch):
+    """A load failure fails the job with the counts already committed in its error and result."""
+    path = tmp_path / "sales.csv"
+    path.write_text(
+        "Invoice No,Date,Customer Name,Item Name,Qty,Rate,Amount,State,City\n"
+        "INV1,2024-05-02,ACME,CABLE TIE,10,2.5,25,GOA,PANAJI\n"
+        "INV2,2024-05-03,BETA TRADERS,GLAND,4,10,40,DELHI,NEW DELHI\n"
+    )
+
+    # No database engine: the first chunk cannot be loaded
+    monkeypatch.setattr(db, "get_engine", lambda: None)
+    job = jobs.submit("upload", "t-partial", _upload_job, [(str(path), "sales.csv")], "t-partial", False)
+    state = _wait(job)
+
+    assert state["status"] == jobs.FAILED
+    assert "0 rows were inserted" in state["error"]
+    assert state["result"]["rows_inserted"] == 0
+    assert state["result"]["files"][0]["filename"] == "sales.csv"
+    assert state["result"]["files"][0]["rows_read"] == 2
+    assert not path.exists()
+
+
+def test_parse_pool_is_off_by_default_and_shut_down_after_a_batch(tmp_path, monkeypatch):
+    """Parallel parsing is opt-in; the batch's workers exit with it and the frames match in-thread parsing."""
+    spooled = []
+    for i in range(2):
+        path = tmp_path / f"sales{i}.csv"
+        path.write_text(
+            "Invoice No,Date,Customer Name,Item Name,Qty,Rate,Amount,State,City\n"
+            f"INV{i},2024-05-0{i + 1},ACME,CABLE TIE,10,2.5,25,GOA,PANAJI\n"
+        )
+        spooled.append((str(path), path.name))
+    progress = lambda **kwargs: None
+    monkeypatch.delenv("UPLOAD_PARSE_PROCESSES", raising=False)
+    assert ingest.parse_pool(len(spooled)) is None
+    in_thread = _transform_upload_files(spooled, "t-pool", progress)
+
+    monkeypatch.setenv("UPLOAD_PARSE_PROCESSES", "4")
+    parallel = _transform_upload_files(spooled, "t-pool", progress)
+
+    assert multiprocessing.active_children() == []
+    for (rows, df), (expected_rows, expected) in zip(parallel, in_thread):
+        assert rows == expected_rows
+        assert df.equals(expected)
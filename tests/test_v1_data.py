@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import db
+from api.db import TenantFrame, _normalize_tenant_frame
+from api.routes import router
+
+from test_filter_index import sample_lines
+
+TENANT = "t-cursor"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    yield TestClient(app)
+    db.invalidate_tenant_cache(TENANT)
+
+
+def _load(df: pd.DataFrame) -> None:
+    """Cache df as the tenant's frame, as a (re)load from the database would."""
+    db._cache_put(TENANT, TenantFrame(df), db._generations.get(TENANT, 0))
+
+
+def _page(client, cursor=None):
+    params = {"tenant_id": TENANT, "limit": 150, "columns": "DATE,INVOICE_NO,AMOUNT"}
+    if cursor:
+        params["cursor"] = cursor
+    return client.get("/api/v1/data", params=params)
+
+
+def test_cursor_pages_through_all_rows_across_identical_reloads(client):
+    """Pages concatenate to the whole frame; a reload with the same rows (new cache entry) keeps the cursor valid."""
+    raw = sample_lines(500, seed=21)
+    _load(_normalize_tenant_frame(raw.copy()))
+    full = client.get("/api/v1/data", params={"tenant_id": TENANT, "columns": "DATE,INVOICE_NO,AMOUNT"}).json()
+
+    rows, cursor = [], None
+    while True:
+        response = _page(client, cursor)
+        assert response.status_code == 200
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        # Background refresh / TTL reload of unchanged data
+        _load(_normalize_tenant_frame(raw.copy()))
+
+    assert len(rows) == len(raw)
+    assert rows == full
+
+
+def test_cursor_is_refused_once_the_data_changed(client):
+    raw = sample_lines(500, seed=22)
+    _load(_normalize_tenant_frame(raw.copy()))
+    first = _page(client)
+    cursor = first.headers["X-Next-Cursor"]
+
+    assert db.patch_tenant_cache(TENANT, sample_lines(20, seed=23))
+
+    assert _page(client, cursor).status_code == 409
+    assert _page(client, "not-a-cursor").status_code == 400